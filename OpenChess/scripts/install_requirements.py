@@ -55,6 +55,11 @@ def install_numpy():
     print("正在安装NumPy...")
     return install_package("numpy")
 
+def install_mss():
+    """安装mss（快速截图后端）"""
+    print("正在安装mss...")
+    return install_package("mss")
+
 def check_tesseract():
     """检查Tesseract是否安装"""
     try:
@@ -251,7 +256,8 @@ def main():
         ("OpenCV", install_opencv),
         ("PyAutoGUI", install_pyautogui),
         ("Pytesseract", install_pytesseract),
-        ("Pillow", install_pillow)
+        ("Pillow", install_pillow),
+        ("mss", install_mss)
     ]
     
     success_count = 0
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+攻击表模块
+统计每个格子被红黑双方各多少个棋子攻击：格子上的棋子被对方攻击的次数即受到的威胁，
+被己方攻击的次数即受到的保护。攻击表按走法表计算，只计数不生成走法，顺带得到双方的伪合法走法数。
+每个局面只算一次并按Zobrist哈希键缓存，威胁分析、吃子机会分析、王安全和机动性评估共用；
+只关心一个格子时count_attackers()反查走法表，不计算整张攻击表。
+批量评估时batch_attack_counts()用NumPy查表一次算出多个局面的结果
+"""
+
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+
+from .compact_board import (
+    BOARD_COLS, BOARD_ROWS, BOARD_SQUARES, CODE_COUNT, COLOR_MASK, KIND_MASK, RED, BLACK,
+    KING, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, PAWN,
+    SQUARE_ROWS, SQUARE_COLS, BoardLike, as_compact,
+)
+from .move_generator import (
+    Masks, KING_TARGETS, ADVISOR_TARGETS, ELEPHANT_TARGETS, HORSE_TARGETS, PAWN_TARGETS,
+    CHARIOT_FILE_SLIDES, CHARIOT_RANK_SLIDES, CANNON_FILE_SLIDES, CANNON_RANK_SLIDES,
+)
+from ...utils.config import AI_ATTACK_MAP_CACHE_SIZE
+
+
+class AttackMap:
+    """一个局面的攻击表
+    
+    有棋子的格子上的计数为能吃到该格的棋子数（不区分该格棋子的颜色，己方棋子即为保护）；
+    空格上的计数为能走到该格的棋子数，炮按不吃子的走法计
+    """
+    
+    __slots__ = ('key', 'counts', 'move_counts')
+    
+    def __init__(self, key: int, red: bytearray, black: bytearray, red_moves: int, black_moves: int):
+        """初始化攻击表
+        
+        Args:
+            key: 局面的Zobrist哈希键
+            red: 每个格子被红方攻击的次数
+            black: 每个格子被黑方攻击的次数
+            red_moves: 红方伪合法走法数
+            black_moves: 黑方伪合法走法数
+        """
+        self.key = key
+        self.counts = {RED: red, BLACK: black}
+        self.move_counts = {RED: red_moves, BLACK: black_moves}
+    
+    def attackers(self, square: int, color: int) -> int:
+        """格子被color一方攻击的次数"""
+        return self.counts[color][square]
+    
+    def is_attacked(self, square: int, color: int) -> bool:
+        """格子是否被color一方攻击"""
+        return self.counts[color][square] > 0
+    
+    def move_count(self, color: int) -> int:
+        """color一方的伪合法走法数，与len(generate_moves(board, color))相同"""
+        return self.move_counts[color]
+
+
+def build_attack_map(squares: bytearray, ranks: Masks, files: Masks, key: int = 0) -> AttackMap:
+    """从头计算攻击表
+    
+    Args:
+        squares: 90个棋子编码
+        ranks: 每行的占用掩码
+        files: 每列的占用掩码
+        key: 局面的Zobrist哈希键
+    
+    Returns:
+        攻击表
+    """
+    counts = {RED: bytearray(BOARD_SQUARES), BLACK: bytearray(BOARD_SQUARES)}
+    occupied = {RED: [], BLACK: []}
+    
+    for square, code in enumerate(squares):
+        if not code:
+            continue
+        color = code & COLOR_MASK
+        kind = code & KIND_MASK
+        attacked = counts[color]
+        occupied[color].append(square)
+        
+        if kind == CHARIOT or kind == CANNON:
+            row, col = SQUARE_ROWS[square], SQUARE_COLS[square]
+            if kind == CHARIOT:
+                offsets = CHARIOT_FILE_SLIDES[row][files[col]] + CHARIOT_RANK_SLIDES[col][ranks[row]]
+            else:
+                offsets = CANNON_FILE_SLIDES[row][files[col]] + CANNON_RANK_SLIDES[col][ranks[row]]
+            for offset in offsets:
+                attacked[square + offset] += 1
+        elif kind == HORSE:
+            for target, leg in HORSE_TARGETS[square].items():
+                if not squares[leg]:
+                    attacked[target] += 1
+        elif kind == PAWN:
+            for target in PAWN_TARGETS[color][square]:
+                attacked[target] += 1
+        elif kind == ELEPHANT:
+            for target, eye in ELEPHANT_TARGETS[color][square].items():
+                if not squares[eye]:
+                    attacked[target] += 1
+        elif kind == ADVISOR:
+            for target in ADVISOR_TARGETS[color][square]:
+                attacked[target] += 1
+        elif kind == KING:
+            targets = KING_TARGETS[color][square]
+            for target in targets:
+                attacked[target] += 1
+            # 飞将：同列第一个棋子是对方将帅（相邻时已按走一步计过）
+            enemy_king = (color ^ COLOR_MASK) | KING
+            for offset in CHARIOT_FILE_SLIDES[SQUARE_ROWS[square]][files[SQUARE_COLS[square]]]:
+                target = square + offset
+                if squares[target] == enemy_king and target not in targets:
+                    attacked[target] += 1
+    
+    # 走法数为攻击到的格子总数减去落在己方棋子上的部分（保护不是走法）
+    move_counts = {}
+    for color in (RED, BLACK):
+        attacked = counts[color]
+        move_counts[color] = sum(attacked) - sum(attacked[square] for square in occupied[color])
+    
+    return AttackMap(key, counts[RED], counts[BLACK], move_counts[RED], move_counts[BLACK])
+
+
+def _build_attacker_table():
+    """把帅、仕、相、马、兵的走法表反过来，按目标格列出能走一步到达该格的棋子
+    
+    Returns:
+        table[颜色][目标格]为((棋子所在格, 棋子编码, 马腿/象眼格，没有为-1), ...)
+    """
+    table = {}
+    for color in (RED, BLACK):
+        attackers = [[] for _ in range(BOARD_SQUARES)]
+        for square in range(BOARD_SQUARES):
+            for target in KING_TARGETS[color][square]:
+                attackers[target].append((square, color | KING, -1))
+            for target in ADVISOR_TARGETS[color][square]:
+                attackers[target].append((square, color | ADVISOR, -1))
+            for target, eye in ELEPHANT_TARGETS[color][square].items():
+                attackers[target].append((square, color | ELEPHANT, eye))
+            for target, leg in HORSE_TARGETS[square].items():
+                attackers[target].append((square, color | HORSE, leg))
+            for target in PAWN_TARGETS[color][square]:
+                attackers[target].append((square, color | PAWN, -1))
+        table[color] = [tuple(entries) for entries in attackers]
+    return table
+
+
+STEP_ATTACKERS = _build_attacker_table()
+
+# 每种棋子在任何局面下最多能攻击到的格子数：车、炮为所在行列的其余格子，帅另加飞将
+MAX_TARGETS = {
+    KING: max(len(targets) for targets in KING_TARGETS[RED]) + 1,
+    ADVISOR: max(len(targets) for targets in ADVISOR_TARGETS[RED]),
+    ELEPHANT: max(len(targets) for targets in ELEPHANT_TARGETS[RED]),
+    HORSE: max(len(targets) for targets in HORSE_TARGETS),
+    CHARIOT: BOARD_ROWS + BOARD_COLS - 2,
+    CANNON: BOARD_ROWS + BOARD_COLS - 2,
+    PAWN: max(len(targets) for targets in PAWN_TARGETS[RED]),
+}
+
+
+def count_attackers(squares: bytearray, ranks: Masks, files: Masks, square: int, color: int) -> int:
+    """统计有棋子的格子被color一方多少个棋子攻击，与build_attack_map()的计数相同
+    
+    车、炮沿线的关系是对称的，从目标格按滑动表查到的格子就是能吃到它的车、炮所在的格子。
+    炮的滑动表中空格是不吃子的走法，只对有棋子的目标格成立
+    
+    Args:
+        squares: 90个棋子编码
+        ranks: 每行的占用掩码
+        files: 每列的占用掩码
+        square: 目标格（须有棋子）
+        color: 攻击方颜色
+    
+    Returns:
+        攻击该格的棋子数
+    """
+    count = 0
+    for origin, code, block in STEP_ATTACKERS[color][square]:
+        if squares[origin] == code and (block < 0 or not squares[block]):
+            count += 1
+    
+    row, col = SQUARE_ROWS[square], SQUARE_COLS[square]
+    file_offsets = CHARIOT_FILE_SLIDES[row][files[col]]
+    chariot = color | CHARIOT
+    for offset in file_offsets + CHARIOT_RANK_SLIDES[col][ranks[row]]:
+        if squares[square + offset] == chariot:
+            count += 1
+    cannon = color | CANNON
+    for offset in CANNON_FILE_SLIDES[row][files[col]] + CANNON_RANK_SLIDES[col][ranks[row]]:
+        if squares[square + offset] == cannon:
+            count += 1
+    
+    # 飞将：目标格是对方将帅，同列第一个棋子是己方将帅（相邻时已按走一步计过）
+    if squares[square] == (color ^ COLOR_MASK) | KING:
+        king = color | KING
+        for offset in file_offsets:
+            origin = square + offset
+            if squares[origin] == king and square not in KING_TARGETS[color][origin]:
+                count += 1
+    return count
+
+
+class AttackMapCache:
+    """按局面哈希键缓存攻击表，超出容量时淘汰最久未使用的"""
+    
+    def __init__(self, capacity: int = AI_ATTACK_MAP_CACHE_SIZE):
+        """初始化缓存
+        
+        Args:
+            capacity: 最多缓存的局面数
+        """
+        self.capacity = max(1, capacity)
+        self._maps: 'OrderedDict[int, AttackMap]' = OrderedDict()
+        
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, board: BoardLike) -> AttackMap:
+        """取得局面的攻击表，缓存中没有时计算
+        
+        Args:
+            board: 棋盘（CompactBoard直接使用增量维护的哈希键和占用掩码）
+        """
+        board = as_compact(board)
+        maps = self._maps
+        attack_map = maps.get(board.key)
+        if attack_map is not None:
+            self.hits += 1
+            maps.move_to_end(board.key)
+            return attack_map
+        
+        self.misses += 1
+        attack_map = build_attack_map(board.squares, board.ranks, board.files, board.key)
+        maps[board.key] = attack_map
+        if len(maps) > self.capacity:
+            maps.popitem(last=False)
+        return attack_map
+    
+    def clear(self):
+        """清空缓存"""
+        self._maps.clear()
+        self.hits = self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._maps)
+
+
+# 批量计算使用的"无格子"序号：每个局面末尾补一个恒为空的格子，无效的目标格和阻挡格都指向它
+PAD_SQUARE = BOARD_SQUARES
+
+# 每个棋子最多的非滑动目标格数（马为8）
+_MAX_STEPS = 8
+
+# 按走法表逐个目标格走子的兵种及其最多的目标格数，分组计算以免按马的8个目标格补齐
+_STEP_GROUPS = ((HORSE,), (KING, ADVISOR, ELEPHANT, PAWN))
+_STEP_WIDTHS = (8, 4)
+
+
+def _build_step_arrays() -> Tuple[np.ndarray, np.ndarray]:
+    """把帅、仕、相、马、兵的走法表整理为按(编码, 格子)索引的目标格和阻挡格数组
+    
+    Returns:
+        (targets, blocks)：形状均为(CODE_COUNT, 90, 8)，不足8个的位置和没有阻挡格的位置为PAD_SQUARE
+    """
+    targets = np.full((CODE_COUNT, BOARD_SQUARES, _MAX_STEPS), PAD_SQUARE, dtype=np.int32)
+    blocks = np.full((CODE_COUNT, BOARD_SQUARES, _MAX_STEPS), PAD_SQUARE, dtype=np.int32)
+    for color in (RED, BLACK):
+        tables = {
+            KING: KING_TARGETS[color],
+            ADVISOR: ADVISOR_TARGETS[color],
+            ELEPHANT: ELEPHANT_TARGETS[color],
+            HORSE: HORSE_TARGETS,
+            PAWN: PAWN_TARGETS[color],
+        }
+        for kind, table in tables.items():
+            for square, entry in enumerate(table):
+                pairs = entry.items() if isinstance(entry, dict) else ((target, PAD_SQUARE) for target in entry)
+                for index, (target, block) in enumerate(pairs):
+                    targets[color | kind, square, index] = target
+                    blocks[color | kind, square, index] = block
+    return targets, blocks
+
+
+def _build_blocker_table(length: int) -> np.ndarray:
+    """按线上位置和占用掩码列出两个方向上第一个和第二个棋子的位置
+    
+    Returns:
+        table[位置, 掩码, k]：k为0/1时是负/正方向的第一个棋子，2/3时是负/正方向的第二个棋子，没有为-1
+    """
+    table = np.full((length, 1 << length, 4), -1, dtype=np.int32)
+    for position in range(length):
+        for mask in range(1 << length):
+            for direction_index, direction in enumerate((-1, 1)):
+                found = 0
+                index = position + direction
+                while 0 <= index < length and found < 2:
+                    if (mask >> index) & 1:
+                        table[position, mask, direction_index + 2 * found] = index
+                        found += 1
+                    index += direction
+    return table
+
+
+STEP_TARGETS, STEP_BLOCKS = _build_step_arrays()
+_STEP_TABLES = {
+    width: (np.ascontiguousarray(STEP_TARGETS[..., :width]), np.ascontiguousarray(STEP_BLOCKS[..., :width]))
+    for width in _STEP_WIDTHS
+}
+
+# FILE_BLOCKERS[row, files[col]]为沿列的第一、二个棋子所在行，RANK_BLOCKERS[col, ranks[row]]为沿行的所在列
+FILE_BLOCKERS = _build_blocker_table(BOARD_ROWS)
+RANK_BLOCKERS = _build_blocker_table(BOARD_COLS)
+
+# 车、炮滑动表中的目标格数（含己方棋子所在的格子），索引同滑动表
+SLIDE_COUNTS = {
+    name: np.array([[len(offsets) for offsets in row] for row in table], dtype=np.int32)
+    for name, table in (
+        ('chariot_file', CHARIOT_FILE_SLIDES), ('chariot_rank', CHARIOT_RANK_SLIDES),
+        ('cannon_file', CANNON_FILE_SLIDES), ('cannon_rank', CANNON_RANK_SLIDES),
+    )
+}
+
+
+def _line_blockers(squares: np.ndarray, boards: np.ndarray, ranks: np.ndarray,
+                   files: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """批量查出棋子所在列和行上两个方向的第一、二个棋子
+    
+    Args:
+        squares: 棋子所在格子
+        boards: 棋子所在局面的序号
+        ranks: (N, 10)的行占用掩码
+        files: (N, 9)的列占用掩码
+    
+    Returns:
+        (file_squares, rank_squares, file_masks, rank_masks)：前两者为(P, 4)的格子序号，
+        列顺序同FILE_BLOCKERS，没有棋子时为PAD_SQUARE；后两者为棋子所在列和行的占用掩码
+    """
+    rows, cols = squares // BOARD_COLS, squares % BOARD_COLS
+    file_masks = files[boards, cols]
+    rank_masks = ranks[boards, rows]
+    file_rows = FILE_BLOCKERS[rows, file_masks]
+    rank_cols = RANK_BLOCKERS[cols, rank_masks]
+    file_squares = np.where(file_rows >= 0, file_rows * BOARD_COLS + cols[:, None], PAD_SQUARE)
+    rank_squares = np.where(rank_cols >= 0, rows[:, None] * BOARD_COLS + rank_cols, PAD_SQUARE)
+    return file_squares, rank_squares, file_masks, rank_masks
+
+
+def batch_attack_counts(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """用NumPy批量统计双方的伪合法走法数和王受到的攻击数，结果与逐个局面的build_attack_map()相同
+    
+    车取每条线上的第一个棋子、炮取第二个棋子，帅/将另外检查飞将，
+    其余棋子按(编码, 格子)取出目标格和马腿/象眼，阻挡格为空时该目标格受到攻击。
+    走法数为攻击到的格子数减去其中的己方棋子
+    
+    Args:
+        codes: (N, 90)的棋子编码
+    
+    Returns:
+        (move_counts, king_attackers)：均为(N, 2)的数组。move_counts第0/1列为红方/黑方的走法数；
+        king_attackers第0列为红帅被黑方攻击的次数，第1列为黑将被红方攻击的次数，没有王时为0
+    """
+    count = len(codes)
+    padded = np.zeros((count, BOARD_SQUARES + 1), dtype=np.int32)
+    padded[:, :BOARD_SQUARES] = codes
+    occupied = (codes != 0).reshape(count, BOARD_ROWS, BOARD_COLS).astype(np.int32)
+    ranks = occupied @ (1 << np.arange(BOARD_COLS, dtype=np.int32))
+    files = (1 << np.arange(BOARD_ROWS, dtype=np.int32)) @ occupied
+    
+    # 每个局面中双方王的格子，没有王时为-1
+    king_squares = {}
+    for color in (RED, BLACK):
+        is_king = codes == (color | KING)
+        king_squares[color] = np.where(is_king.any(axis=1), is_king.argmax(axis=1), -1)
+    
+    boards, squares = np.nonzero(codes)
+    piece_codes = padded[boards, squares]
+    colors = piece_codes & COLOR_MASK
+    kinds = piece_codes & KIND_MASK
+    enemy_kings = np.where(colors == RED, king_squares[BLACK][boards], king_squares[RED][boards])
+    moves = np.zeros(len(boards), dtype=np.int32)
+    attacks = np.zeros(len(boards), dtype=np.int32)
+    
+    # 按展平后的序号取格子上的棋子编码
+    flat = padded.ravel()
+    bases = boards * (BOARD_SQUARES + 1)
+    
+    # 帅、仕、相、马、兵：阻挡格为空的目标格
+    for group, width in zip(_STEP_GROUPS, _STEP_WIDTHS):
+        steps = np.nonzero(np.isin(kinds, group))[0]
+        step_codes, step_squares, step_bases = piece_codes[steps], squares[steps], bases[steps, None]
+        targets_table, blocks_table = _STEP_TABLES[width]
+        step_targets = targets_table[step_codes, step_squares]
+        step_valid = (step_targets != PAD_SQUARE) & (flat[step_bases + blocks_table[step_codes, step_squares]] == 0)
+        step_own = (flat[step_bases + step_targets] & colors[steps, None]) != 0
+        moves[steps] = (step_valid & ~step_own).sum(axis=1)
+        attacks[steps] = (step_valid & (step_targets == enemy_kings[steps, None])).sum(axis=1)
+    
+    # 车、炮：沿列和沿行的第一、二个棋子
+    slides = np.nonzero((kinds == CHARIOT) | (kinds == CANNON))[0]
+    file_squares, rank_squares, file_masks, rank_masks = _line_blockers(squares[slides], boards[slides], ranks, files)
+    first = np.concatenate([file_squares[:, :2], rank_squares[:, :2]], axis=1)
+    second = np.concatenate([file_squares[:, 2:], rank_squares[:, 2:]], axis=1)
+    rows, cols = squares[slides] // BOARD_COLS, squares[slides] % BOARD_COLS
+    chariots = kinds[slides] == CHARIOT
+    
+    # 车走到第一个棋子为止，炮吃第二个棋子；落在己方棋子上的不是走法
+    captures = np.where(chariots[:, None], first, second)
+    slide_counts = np.where(
+        chariots,
+        SLIDE_COUNTS['chariot_file'][rows, file_masks] + SLIDE_COUNTS['chariot_rank'][cols, rank_masks],
+        SLIDE_COUNTS['cannon_file'][rows, file_masks] + SLIDE_COUNTS['cannon_rank'][cols, rank_masks],
+    )
+    capture_own = (flat[bases[slides, None] + captures] & colors[slides, None]) != 0
+    moves[slides] = slide_counts - capture_own.sum(axis=1)
+    attacks[slides] = (captures == enemy_kings[slides, None]).sum(axis=1)
+    
+    # 飞将：同列第一个棋子是对方将帅，且不是走一步就能到的格子
+    kings = np.nonzero(kinds == KING)[0]
+    flying = _line_blockers(squares[kings], boards[kings], ranks, files)[0][:, :2]
+    king_steps = STEP_TARGETS[piece_codes[kings], squares[kings]]
+    flying_valid = ~(flying[:, :, None] == king_steps[:, None, :]).any(axis=2)
+    enemy_king_codes = (colors[kings] ^ COLOR_MASK) | KING
+    moves[kings] += (flying_valid & (flat[bases[kings, None] + flying] == enemy_king_codes[:, None])).sum(axis=1)
+    attacks[kings] += (flying_valid & (flying == enemy_kings[kings, None])).sum(axis=1)
+    
+    # 按局面和颜色汇总；黑方的攻击落在红帅上，红方的攻击落在黑将上
+    move_counts = np.zeros((count, 2), dtype=np.int64)
+    king_attackers = np.zeros((count, 2), dtype=np.int64)
+    for column, color in enumerate((RED, BLACK)):
+        mine = colors == color
+        move_counts[:, column] = np.bincount(boards, weights=moves * mine, minlength=count)
+        king_attackers[:, 1 - column] = np.bincount(boards, weights=attacks * mine, minlength=count)
+    return move_counts, king_attackers
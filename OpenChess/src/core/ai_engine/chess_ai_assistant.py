@@ -5,13 +5,31 @@
 整合走法检测、局面评估和AI决策功能
 """
 
-import copy
 from typing import Dict, List, Tuple, Optional, NamedTuple
 import time
 import random
 
+import numpy as np
+
 from .move_detector import MoveDetector, Move
 from .position_evaluator import PositionEvaluator
+from .attack_map import AttackMap
+from .compact_board import (
+    CompactBoard, BoardLike, BOARD_COLS, BOARD_ROWS, COLOR_CODES, CODE_NAMES, KING,
+    as_code, as_squares, encode_move, piece_code, position_of, square_of,
+)
+from .search_engine import SearchEngine, SearchResult, RootMove
+from .move_generator import (
+    board_state, generate_moves, generate_piece_moves,
+    generate_king_moves, generate_advisor_moves, generate_elephant_moves, generate_horse_moves,
+    generate_chariot_moves, generate_cannon_moves, generate_pawn_moves,
+)
+from ...utils.config import (
+    AI_SEARCH_DEPTH, AI_MAX_SEARCH_DEPTH, AI_THINKING_TIME, AI_NODE_LIMIT, MAX_RECOMMENDATIONS
+)
+
+# 思考时间已被准备工作用完时留给搜索的最短时间（秒）
+MIN_SEARCH_TIME = 0.001
 
 class Recommendation(NamedTuple):
     """推荐走法数据结构"""
@@ -50,12 +68,24 @@ class ChessAIAssistant:
         
         # 游戏状态
         self.current_board: Optional[List[List[Optional[str]]]] = None
+        # 当前棋盘的紧凑表示，分析时在整数上运行
+        self.current_compact: Optional[CompactBoard] = None
         self.game_phase = 'opening'  # opening, middlegame, endgame
         self.move_count = 0
         
         # AI设置
-        self.search_depth = 3  # 搜索深度
-        self.max_recommendations = 5  # 最多推荐走法数
+        self.search_depth = AI_SEARCH_DEPTH  # 不限时（thinking_time为0）时的固定搜索深度
+        self.max_search_depth = AI_MAX_SEARCH_DEPTH  # 限时搜索时迭代加深的最大深度
+        self.thinking_time = AI_THINKING_TIME  # 每次分析的思考时间（秒）
+        self.max_recommendations = MAX_RECOMMENDATIONS  # 最多推荐走法数
+        
+        # 搜索引擎与最近一次搜索结果
+        self.search_engine = SearchEngine(
+            self.position_evaluator, self.search_depth, self.thinking_time, AI_NODE_LIMIT
+        )
+        self.last_search: Optional[SearchResult] = None
+        # 当前局面静态分数的缓存：((哈希键, 玩家颜色), 分数)
+        self._current_score_cache: Optional[Tuple[Tuple[int, str], float]] = None
         
         # 分析历史
         self.analysis_history: List[GameAnalysis] = []
@@ -69,11 +99,15 @@ class ChessAIAssistant:
         Returns:
             游戏分析结果
         """
+        # 思考时间从收到棋盘时算起，走法检测、静态排序和威胁分析的耗时都计入其中
+        started = time.time()
+        
         # 检测走法变化
         detected_move = self.move_detector.update_board(new_board)
         
         # 更新当前棋盘
-        self.current_board = copy.deepcopy(new_board)
+        self.current_board = [list(row) for row in new_board]
+        self.current_compact = CompactBoard.from_grid(new_board)
         
         # 如果检测到对手走法，增加计数
         if detected_move and self.opponent_color in detected_move.piece:
@@ -81,7 +115,7 @@ class ChessAIAssistant:
             self._update_game_phase()
         
         # 进行局面分析
-        analysis = self._analyze_position()
+        analysis = self._analyze_position(started)
         
         # 添加到历史记录
         self.analysis_history.append(analysis)
@@ -97,9 +131,12 @@ class ChessAIAssistant:
         else:
             self.game_phase = 'endgame'
     
-    def _analyze_position(self) -> GameAnalysis:
+    def _analyze_position(self, started: Optional[float] = None) -> GameAnalysis:
         """分析当前局面
         
+        Args:
+            started: 本次分析的开始时间，None表示从现在算起
+        
         Returns:
             游戏分析结果
         """
@@ -108,19 +145,19 @@ class ChessAIAssistant:
         
         # 评估当前局面
         current_evaluation = self.position_evaluator.evaluate_position(
-            self.current_board, self.player_color
+            self.current_compact, self.player_color
         )
         
         # 获取对手最后一步
         opponent_last_move = self.move_detector.get_last_move()
         
-        # 生成推荐走法
-        recommendations = self._generate_recommendations()
-        
-        # 分析威胁和机会
+        # 分析威胁和机会（先于搜索，搜索使用剩余的思考时间）
         threats = self._analyze_threats()
         opportunities = self._analyze_opportunities()
         
+        # 生成推荐走法
+        recommendations = self._generate_recommendations(started)
+        
         return GameAnalysis(
             current_evaluation=current_evaluation,
             opponent_last_move=opponent_last_move,
@@ -129,492 +166,217 @@ class ChessAIAssistant:
             opportunities=opportunities
         )
     
-    def _generate_recommendations(self) -> List[Recommendation]:
+    def _generate_recommendations(self, started: Optional[float] = None) -> List[Recommendation]:
         """生成走法推荐
         
+        对当前局面做迭代加深的Alpha-Beta搜索：设置了思考时间时在剩余的思考时间内尽量加深
+        （最多max_search_depth层），否则固定搜索search_depth层。
+        前max_recommendations个走法的分数为考虑对方应对后的精确分数
+        
+        Args:
+            started: 本次分析的开始时间，None表示从现在算起；静态排序等准备工作的耗时从思考时间中扣除
+        
         Returns:
             推荐走法列表，按评分排序
         """
-        if not self.current_board:
+        if not self.current_compact:
             return []
         
-        # 生成所有可能的走法
-        possible_moves = self._generate_all_legal_moves(self.current_board, self.player_color)
+        started = time.time() if started is None else started
+        move_order = self._static_move_order()
+        
+        timed = bool(self.thinking_time and self.thinking_time > 0)
+        time_limit = 0
+        if timed:
+            # 时间已用完时仍完成深度1的搜索（time_limit为0表示不限时，不能取0）
+            time_limit = max(self.thinking_time - (time.time() - started), MIN_SEARCH_TIME)
+        result = self.search_engine.search(
+            self.current_compact, COLOR_CODES[self.player_color],
+            depth=max(self.search_depth, self.max_search_depth) if timed else self.search_depth,
+            multi_pv=self.max_recommendations,
+            time_limit=time_limit,
+            move_order=move_order
+        )
+        self.last_search = result
         
-        # 评估每个走法
-        move_evaluations = []
-        for move in possible_moves:
-            evaluation = self._evaluate_move(move)
-            if evaluation:
-                move_evaluations.append(evaluation)
+        # 当前局面的静态分数，用于计算走法带来的改进
+        current_score = self._current_score()
         
-        # 按评分排序
-        move_evaluations.sort(key=lambda x: x.score, reverse=True)
+        return [
+            self._make_recommendation(root_move, current_score)
+            for root_move in result.root_moves[:self.max_recommendations]
+        ]
+    
+    def _static_move_order(self) -> List[int]:
+        """按走后局面的静态分数从高到低排列当前局面的所有走法
         
-        # 返回前N个推荐
-        return move_evaluations[:self.max_recommendations]
+        所有子局面放进一个(N, 10, 9)数组，由evaluate_batch()一次评估
+        
+        Returns:
+            打包的走法列表
+        """
+        board = self.current_compact
+        moves = generate_moves(board, COLOR_CODES[self.player_color])
+        if not moves:
+            return []
+        
+        children = np.empty((len(moves), BOARD_ROWS, BOARD_COLS), dtype=np.int8)
+        for index, move in enumerate(moves):
+            board.make_move(move)
+            children[index] = board.to_numpy()
+            board.unmake_move()
+        
+        scores, _ = self.position_evaluator.evaluate_batch(children, self.player_color)
+        return [moves[index] for index in np.argsort(-scores, kind='stable')]
     
-    def _generate_all_legal_moves(self, board: List[List[Optional[str]]], 
+    def _make_recommendation(self, root_move: RootMove, current_score: float) -> Recommendation:
+        """把根节点的搜索结果转换为走法推荐
+        
+        Args:
+            root_move: 根节点走法的搜索结果
+            current_score: 当前局面的静态分数
+            
+        Returns:
+            走法推荐
+        """
+        board = self.current_compact
+        move = self._to_move(board.squares, root_move.move)
+        
+        # 预计变化中对方的应对
+        expected_reply = None
+        if len(root_move.line) > 1:
+            board.make_move(root_move.move)
+            expected_reply = self._to_move(board.squares, root_move.line[1])
+            board.unmake_move()
+        
+        score = root_move.score
+        evaluation = {
+            'total_score': score,
+            'win_probability': self.position_evaluator._score_to_win_probability(score)
+        }
+        score_improvement = score - current_score
+        
+        return Recommendation(
+            move=move,
+            score=score,
+            win_probability=evaluation['win_probability'],
+            confidence=self._calculate_move_confidence(move, score_improvement),
+            reasoning=self._generate_move_reasoning(move, score_improvement, evaluation, expected_reply)
+        )
+    
+    def _generate_all_legal_moves(self, board: BoardLike, 
                                  color: str) -> List[Move]:
         """生成指定颜色的所有合法走法
         
         Args:
-            board: 棋盘状态
+            board: 棋盘状态（字符串棋盘或CompactBoard）
             color: 要生成走法的颜色
             
         Returns:
             合法走法列表
         """
-        legal_moves = []
-        
-        # 遍历棋盘找到己方棋子
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece and color in piece:
-                    # 为每个棋子生成可能的走法
-                    piece_moves = self._generate_piece_moves(board, (row, col), piece)
-                    legal_moves.extend(piece_moves)
+        squares = as_squares(board)
+        moves = generate_moves(board if isinstance(board, CompactBoard) else squares, COLOR_CODES[color])
+        return [self._to_move(squares, move) for move in moves]
+    
+    def _to_move(self, squares: bytearray, move: int) -> Move:
+        """把打包的整数走法转换为Move对象
         
-        return legal_moves
+        Args:
+            squares: 走法前的棋盘编码
+            move: encode_move()打包的走法
+            
+        Returns:
+            走法对象
+        """
+        from_square, to_square = move >> 8, move & 0xFF
+        captured = CODE_NAMES[squares[to_square]]
+        return Move(
+            from_pos=position_of(from_square),
+            to_pos=position_of(to_square),
+            piece=CODE_NAMES[squares[from_square]],
+            captured_piece=captured,
+            move_type='capture' if captured else 'normal'
+        )
     
-    def _generate_piece_moves(self, board: List[List[Optional[str]]], 
-                             from_pos: Tuple[int, int], piece: str) -> List[Move]:
+    def _generate_piece_moves(self, board: BoardLike, 
+                             from_pos: Tuple[int, int], piece) -> List[Move]:
         """为特定棋子生成所有可能的走法
         
         Args:
             board: 棋盘状态
             from_pos: 棋子位置
-            piece: 棋子类型
+            piece: 棋子类型（名称或编码）
             
         Returns:
             该棋子的可能走法列表
         """
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 根据棋子类型生成走法
-        if 'king' in piece:
-            moves.extend(self._generate_king_moves(board, from_pos, piece))
-        elif 'advisor' in piece:
-            moves.extend(self._generate_advisor_moves(board, from_pos, piece))
-        elif 'elephant' in piece:
-            moves.extend(self._generate_elephant_moves(board, from_pos, piece))
-        elif 'horse' in piece:
-            moves.extend(self._generate_horse_moves(board, from_pos, piece))
-        elif 'chariot' in piece:
-            moves.extend(self._generate_chariot_moves(board, from_pos, piece))
-        elif 'cannon' in piece:
-            moves.extend(self._generate_cannon_moves(board, from_pos, piece))
-        elif 'pawn' in piece:
-            moves.extend(self._generate_pawn_moves(board, from_pos, piece))
-        
-        return moves
-    
-    def _generate_king_moves(self, board: List[List[Optional[str]]], 
-                            from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        squares = as_squares(board)
+        moves = generate_piece_moves(board if isinstance(board, CompactBoard) else squares,
+                                     square_of(*from_pos), as_code(piece))
+        return [self._to_move(squares, move) for move in moves]
+    
+    def _generate_kind_moves(self, generator, board: BoardLike, 
+                            from_pos: Tuple[int, int], piece) -> List[Move]:
+        """用指定兵种的生成函数生成走法"""
+        squares, ranks, files = board_state(board)
+        moves: List[int] = []
+        generator(squares, square_of(*from_pos), as_code(piece), moves, ranks, files)
+        return [self._to_move(squares, move) for move in moves]
+    
+    def _generate_king_moves(self, board: BoardLike, 
+                            from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成帅/将的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 帅/将只能在九宫内移动
-        if 'red' in piece:
-            palace_rows = range(7, 10)
-            palace_cols = range(3, 6)
-        else:
-            palace_rows = range(0, 3)
-            palace_cols = range(3, 6)
-        
-        # 四个方向移动一格
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        
-        for dr, dc in directions:
-            to_row, to_col = from_row + dr, from_col + dc
-            
-            # 检查是否在九宫内
-            if to_row in palace_rows and to_col in palace_cols:
-                target_piece = board[to_row][to_col]
-                
-                # 空位或对方棋子
-                if target_piece is None or self.player_color not in target_piece:
-                    move_type = 'capture' if target_piece else 'normal'
-                    move = Move(
-                        from_pos=from_pos,
-                        to_pos=(to_row, to_col),
-                        piece=piece,
-                        captured_piece=target_piece,
-                        move_type=move_type
-                    )
-                    moves.append(move)
-        
-        return moves
-    
-    def _generate_advisor_moves(self, board: List[List[Optional[str]]], 
-                               from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        return self._generate_kind_moves(generate_king_moves, board, from_pos, piece)
+    
+    def _generate_advisor_moves(self, board: BoardLike, 
+                               from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成仕/士的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 仕/士只能在九宫内斜走
-        if 'red' in piece:
-            palace_rows = range(7, 10)
-            palace_cols = range(3, 6)
-        else:
-            palace_rows = range(0, 3)
-            palace_cols = range(3, 6)
-        
-        # 四个对角方向
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        
-        for dr, dc in directions:
-            to_row, to_col = from_row + dr, from_col + dc
-            
-            if to_row in palace_rows and to_col in palace_cols:
-                target_piece = board[to_row][to_col]
-                
-                if target_piece is None or self.player_color not in target_piece:
-                    move_type = 'capture' if target_piece else 'normal'
-                    move = Move(
-                        from_pos=from_pos,
-                        to_pos=(to_row, to_col),
-                        piece=piece,
-                        captured_piece=target_piece,
-                        move_type=move_type
-                    )
-                    moves.append(move)
-        
-        return moves
-    
-    def _generate_elephant_moves(self, board: List[List[Optional[str]]], 
-                                from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        return self._generate_kind_moves(generate_advisor_moves, board, from_pos, piece)
+    
+    def _generate_elephant_moves(self, board: BoardLike, 
+                                from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成相/象的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 相/象走田字，不能过河
-        directions = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
-        
-        for dr, dc in directions:
-            to_row, to_col = from_row + dr, from_col + dc
-            
-            # 检查是否在棋盘内且不过河
-            if 0 <= to_row < 10 and 0 <= to_col < 9:
-                if 'red' in piece and to_row >= 5:  # 红相不过河
-                    # 检查象眼是否被堵
-                    eye_row, eye_col = from_row + dr//2, from_col + dc//2
-                    if board[eye_row][eye_col] is None:
-                        target_piece = board[to_row][to_col]
-                        if target_piece is None or self.player_color not in target_piece:
-                            move_type = 'capture' if target_piece else 'normal'
-                            move = Move(
-                                from_pos=from_pos,
-                                to_pos=(to_row, to_col),
-                                piece=piece,
-                                captured_piece=target_piece,
-                                move_type=move_type
-                            )
-                            moves.append(move)
-                elif 'black' in piece and to_row <= 4:  # 黑象不过河
-                    eye_row, eye_col = from_row + dr//2, from_col + dc//2
-                    if board[eye_row][eye_col] is None:
-                        target_piece = board[to_row][to_col]
-                        if target_piece is None or self.player_color not in target_piece:
-                            move_type = 'capture' if target_piece else 'normal'
-                            move = Move(
-                                from_pos=from_pos,
-                                to_pos=(to_row, to_col),
-                                piece=piece,
-                                captured_piece=target_piece,
-                                move_type=move_type
-                            )
-                            moves.append(move)
-        
-        return moves
-    
-    def _generate_horse_moves(self, board: List[List[Optional[str]]], 
-                             from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        return self._generate_kind_moves(generate_elephant_moves, board, from_pos, piece)
+    
+    def _generate_horse_moves(self, board: BoardLike, 
+                             from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成马的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 马走日字的8个方向
-        directions = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
-        
-        # 对应的马腿位置
-        leg_positions = [
-            (-1, 0), (-1, 0), (0, -1), (0, 1),
-            (0, -1), (0, 1), (1, 0), (1, 0)
-        ]
-        
-        for i, (dr, dc) in enumerate(directions):
-            to_row, to_col = from_row + dr, from_col + dc
-            
-            if 0 <= to_row < 10 and 0 <= to_col < 9:
-                # 检查马腿是否被堵
-                leg_dr, leg_dc = leg_positions[i]
-                leg_row, leg_col = from_row + leg_dr, from_col + leg_dc
-                
-                if board[leg_row][leg_col] is None:
-                    target_piece = board[to_row][to_col]
-                    if target_piece is None or self.player_color not in target_piece:
-                        move_type = 'capture' if target_piece else 'normal'
-                        move = Move(
-                            from_pos=from_pos,
-                            to_pos=(to_row, to_col),
-                            piece=piece,
-                            captured_piece=target_piece,
-                            move_type=move_type
-                        )
-                        moves.append(move)
-        
-        return moves
-    
-    def _generate_chariot_moves(self, board: List[List[Optional[str]]], 
-                               from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        return self._generate_kind_moves(generate_horse_moves, board, from_pos, piece)
+    
+    def _generate_chariot_moves(self, board: BoardLike, 
+                               from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成车的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 车可以横走和竖走
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        
-        for dr, dc in directions:
-            for distance in range(1, 10):  # 最大距离
-                to_row, to_col = from_row + dr * distance, from_col + dc * distance
-                
-                if not (0 <= to_row < 10 and 0 <= to_col < 9):
-                    break
-                
-                target_piece = board[to_row][to_col]
-                
-                if target_piece is None:
-                    # 空位，可以移动
-                    move = Move(
-                        from_pos=from_pos,
-                        to_pos=(to_row, to_col),
-                        piece=piece,
-                        move_type='normal'
-                    )
-                    moves.append(move)
-                elif self.player_color not in target_piece:
-                    # 对方棋子，可以吃掉，然后停止
-                    move = Move(
-                        from_pos=from_pos,
-                        to_pos=(to_row, to_col),
-                        piece=piece,
-                        captured_piece=target_piece,
-                        move_type='capture'
-                    )
-                    moves.append(move)
-                    break
-                else:
-                    # 己方棋子，不能走，停止
-                    break
-        
-        return moves
-    
-    def _generate_cannon_moves(self, board: List[List[Optional[str]]], 
-                              from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        return self._generate_kind_moves(generate_chariot_moves, board, from_pos, piece)
+    
+    def _generate_cannon_moves(self, board: BoardLike, 
+                              from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成炮的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        # 炮可以横走和竖走
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        
-        for dr, dc in directions:
-            # 第一阶段：找到炮架或边界
-            cannon_mount_found = False
-            
-            for distance in range(1, 10):
-                to_row, to_col = from_row + dr * distance, from_col + dc * distance
-                
-                if not (0 <= to_row < 10 and 0 <= to_col < 9):
-                    break
-                
-                target_piece = board[to_row][to_col]
-                
-                if not cannon_mount_found:
-                    if target_piece is None:
-                        # 空位，正常移动
-                        move = Move(
-                            from_pos=from_pos,
-                            to_pos=(to_row, to_col),
-                            piece=piece,
-                            move_type='normal'
-                        )
-                        moves.append(move)
-                    else:
-                        # 找到炮架
-                        cannon_mount_found = True
-                else:
-                    # 已经有炮架，寻找目标
-                    if target_piece is not None and self.player_color not in target_piece:
-                        # 找到对方棋子，可以吃掉
-                        move = Move(
-                            from_pos=from_pos,
-                            to_pos=(to_row, to_col),
-                            piece=piece,
-                            captured_piece=target_piece,
-                            move_type='capture'
-                        )
-                        moves.append(move)
-                        break
-                    elif target_piece is not None:
-                        # 己方棋子，不能吃，停止
-                        break
-        
-        return moves
-    
-    def _generate_pawn_moves(self, board: List[List[Optional[str]]], 
-                            from_pos: Tuple[int, int], piece: str) -> List[Move]:
+        return self._generate_kind_moves(generate_cannon_moves, board, from_pos, piece)
+    
+    def _generate_pawn_moves(self, board: BoardLike, 
+                            from_pos: Tuple[int, int], piece) -> List[Move]:
         """生成兵/卒的走法"""
-        moves = []
-        from_row, from_col = from_pos
-        
-        if 'red' in piece:  # 红兵
-            # 未过河：只能向前
-            if from_row > 4:
-                to_row, to_col = from_row - 1, from_col
-                if 0 <= to_row < 10:
-                    target_piece = board[to_row][to_col]
-                    if target_piece is None or self.player_color not in target_piece:
-                        move_type = 'capture' if target_piece else 'normal'
-                        move = Move(
-                            from_pos=from_pos,
-                            to_pos=(to_row, to_col),
-                            piece=piece,
-                            captured_piece=target_piece,
-                            move_type=move_type
-                        )
-                        moves.append(move)
-            # 已过河：可以向前或左右
-            else:
-                directions = [(-1, 0), (0, -1), (0, 1)]
-                for dr, dc in directions:
-                    to_row, to_col = from_row + dr, from_col + dc
-                    if 0 <= to_row < 10 and 0 <= to_col < 9:
-                        target_piece = board[to_row][to_col]
-                        if target_piece is None or self.player_color not in target_piece:
-                            move_type = 'capture' if target_piece else 'normal'
-                            move = Move(
-                                from_pos=from_pos,
-                                to_pos=(to_row, to_col),
-                                piece=piece,
-                                captured_piece=target_piece,
-                                move_type=move_type
-                            )
-                            moves.append(move)
-        
-        else:  # 黑卒
-            # 未过河：只能向前
-            if from_row < 5:
-                to_row, to_col = from_row + 1, from_col
-                if 0 <= to_row < 10:
-                    target_piece = board[to_row][to_col]
-                    if target_piece is None or self.player_color not in target_piece:
-                        move_type = 'capture' if target_piece else 'normal'
-                        move = Move(
-                            from_pos=from_pos,
-                            to_pos=(to_row, to_col),
-                            piece=piece,
-                            captured_piece=target_piece,
-                            move_type=move_type
-                        )
-                        moves.append(move)
-            # 已过河：可以向前或左右
-            else:
-                directions = [(1, 0), (0, -1), (0, 1)]
-                for dr, dc in directions:
-                    to_row, to_col = from_row + dr, from_col + dc
-                    if 0 <= to_row < 10 and 0 <= to_col < 9:
-                        target_piece = board[to_row][to_col]
-                        if target_piece is None or self.player_color not in target_piece:
-                            move_type = 'capture' if target_piece else 'normal'
-                            move = Move(
-                                from_pos=from_pos,
-                                to_pos=(to_row, to_col),
-                                piece=piece,
-                                captured_piece=target_piece,
-                                move_type=move_type
-                            )
-                            moves.append(move)
-        
-        return moves
-    
-    def _evaluate_move(self, move: Move) -> Optional[Recommendation]:
-        """评估单个走法
-        
-        Args:
-            move: 要评估的走法
-            
-        Returns:
-            走法推荐，如果走法无效则返回None
-        """
-        if not self.current_board:
-            return None
-        
-        # 模拟走法后的棋盘
-        board_after_move = self._simulate_move(self.current_board, move)
-        
-        # 评估走法后的局面
-        evaluation = self.position_evaluator.evaluate_position(
-            board_after_move, self.player_color
-        )
-        
-        # 计算相对于当前局面的改进
-        current_evaluation = self.position_evaluator.evaluate_position(
-            self.current_board, self.player_color
-        )
-        
-        score_improvement = evaluation['total_score'] - current_evaluation['total_score']
-        
-        # 生成推荐理由
-        reasoning = self._generate_move_reasoning(move, score_improvement, evaluation)
-        
-        # 计算置信度（基于分数改进和走法类型）
-        confidence = self._calculate_move_confidence(move, score_improvement)
-        
-        return Recommendation(
-            move=move,
-            score=evaluation['total_score'],
-            win_probability=evaluation['win_probability'],
-            confidence=confidence,
-            reasoning=reasoning
-        )
+        return self._generate_kind_moves(generate_pawn_moves, board, from_pos, piece)
     
-    def _simulate_move(self, board: List[List[Optional[str]]], move: Move) -> List[List[Optional[str]]]:
-        """模拟执行走法后的棋盘状态
-        
-        Args:
-            board: 当前棋盘
-            move: 要执行的走法
-            
-        Returns:
-            走法后的棋盘状态
-        """
-        new_board = copy.deepcopy(board)
-        
-        from_row, from_col = move.from_pos
-        to_row, to_col = move.to_pos
-        
-        # 移动棋子
-        new_board[to_row][to_col] = new_board[from_row][from_col]
-        new_board[from_row][from_col] = None
-        
-        return new_board
+    def _current_score(self) -> float:
+        """当前局面的静态总分（玩家视角），按局面哈希键缓存"""
+        cache_key = (self.current_compact.key, self.player_color)
+        if self._current_score_cache is None or self._current_score_cache[0] != cache_key:
+            score = self.position_evaluator.evaluate_score(self.current_compact, self.player_color)
+            self._current_score_cache = (cache_key, score)
+        return self._current_score_cache[1]
     
     def _generate_move_reasoning(self, move: Move, score_improvement: float, 
-                                evaluation: Dict[str, float]) -> str:
+                                evaluation: Dict[str, float],
+                                expected_reply: Optional[Move] = None) -> str:
         """生成走法推荐理由
         
         Args:
             move: 走法
             score_improvement: 分数改进
             evaluation: 局面评估
+            expected_reply: 搜索预计的对方应对
             
         Returns:
             推荐理由文本
@@ -649,6 +411,10 @@ class ChessAIAssistant:
         elif self.game_phase == 'endgame':
             reasoning_parts.append("适合残局走法")
         
+        # 搜索预计的对方应对
+        if expected_reply is not None:
+            reasoning_parts.append(f"预计对方应以{self.move_detector.format_move(expected_reply)}")
+        
         return "，".join(reasoning_parts) if reasoning_parts else "常规走法"
     
     def _calculate_move_confidence(self, move: Move, score_improvement: float) -> float:
@@ -692,7 +458,7 @@ class ChessAIAssistant:
             return threats
         
         # 检查王是否受到威胁
-        my_king_pos = self._find_king_position(self.current_board, self.player_color)
+        my_king_pos = self._find_king_position(self.current_compact, self.player_color)
         if my_king_pos and self._is_king_under_attack(my_king_pos):
             threats.append("王受到威胁！")
         
@@ -717,7 +483,7 @@ class ChessAIAssistant:
             return opportunities
         
         # 检查是否可以攻击对方王
-        opponent_king_pos = self._find_king_position(self.current_board, self.opponent_color)
+        opponent_king_pos = self._find_king_position(self.current_compact, self.opponent_color)
         if opponent_king_pos and self._can_attack_king(opponent_king_pos):
             opportunities.append("可以攻击对方王！")
         
@@ -728,7 +494,7 @@ class ChessAIAssistant:
         
         return opportunities
     
-    def _find_king_position(self, board: List[List[Optional[str]]], color: str) -> Optional[Tuple[int, int]]:
+    def _find_king_position(self, board: BoardLike, color: str) -> Optional[Tuple[int, int]]:
         """找到指定颜色的王的位置
         
         Args:
@@ -738,14 +504,27 @@ class ChessAIAssistant:
         Returns:
             王的位置，如果未找到则返回None
         """
-        king_piece = f"{color}_king"
+        square = as_squares(board).find(COLOR_CODES[color] | KING)
+        return position_of(square) if square >= 0 else None
+    
+    def _attack_map(self) -> AttackMap:
+        """当前局面的攻击表（按局面哈希键缓存，同一局面的各项分析只计算一次）"""
+        return self.position_evaluator.attack_maps.get(self.current_compact)
+    
+    def _any_piece_attacks(self, color: str, target_pos: Tuple[int, int]) -> bool:
+        """检查一方是否有棋子能攻击到目标位置
         
-        for row in range(10):
-            for col in range(9):
-                if board[row][col] == king_piece:
-                    return (row, col)
+        Args:
+            color: 攻击方颜色
+            target_pos: 目标位置
+            
+        Returns:
+            是否能攻击到目标
+        """
+        if not self.current_compact:
+            return False
         
-        return None
+        return self._attack_map().is_attacked(square_of(*target_pos), COLOR_CODES[color])
     
     def _is_king_under_attack(self, king_pos: Tuple[int, int]) -> bool:
         """检查王是否受到攻击
@@ -756,33 +535,23 @@ class ChessAIAssistant:
         Returns:
             是否受到攻击
         """
-        if not self.current_board:
-            return False
-        
         # 检查对方所有棋子是否能攻击到王
-        for row in range(10):
-            for col in range(9):
-                piece = self.current_board[row][col]
-                if piece and self.opponent_color in piece:
-                    if self._can_piece_attack_position((row, col), king_pos, piece):
-                        return True
-        
-        return False
+        return self._any_piece_attacks(self.opponent_color, king_pos)
     
     def _can_piece_attack_position(self, piece_pos: Tuple[int, int], 
-                                  target_pos: Tuple[int, int], piece: str) -> bool:
+                                  target_pos: Tuple[int, int], piece) -> bool:
         """检查棋子是否能攻击目标位置
         
         Args:
             piece_pos: 棋子位置
             target_pos: 目标位置
-            piece: 棋子类型
+            piece: 棋子类型（名称或编码）
             
         Returns:
             是否能攻击到目标
         """
         # 简化的攻击检查，可以根据需要完善
-        return self.move_detector._is_legal_move(piece_pos, target_pos, piece, self.current_board)
+        return self.move_detector._is_legal_move(piece_pos, target_pos, piece, self.current_compact)
     
     def _can_attack_king(self, king_pos: Tuple[int, int]) -> bool:
         """检查是否可以攻击对方王
@@ -793,18 +562,8 @@ class ChessAIAssistant:
         Returns:
             是否可以攻击
         """
-        if not self.current_board:
-            return False
-        
         # 检查己方棋子是否能攻击到对方王
-        for row in range(10):
-            for col in range(9):
-                piece = self.current_board[row][col]
-                if piece and self.player_color in piece:
-                    if self._can_piece_attack_position((row, col), king_pos, piece):
-                        return True
-        
-        return False
+        return self._any_piece_attacks(self.player_color, king_pos)
     
     def _find_threatened_pieces(self, piece_type: str) -> List[Tuple[int, int]]:
         """找到受威胁的指定类型棋子
@@ -817,19 +576,16 @@ class ChessAIAssistant:
         """
         threatened = []
         
-        if not self.current_board:
+        if not self.current_compact:
             return threatened
         
-        # 找到己方的该类型棋子
-        my_piece_type = f"{self.player_color}_{piece_type}"
+        # 找到己方的该类型棋子，查攻击表看是否受到对方攻击
+        my_piece_code = piece_code(f"{self.player_color}_{piece_type}")
+        enemy_attacks = self._attack_map().counts[COLOR_CODES[self.opponent_color]]
         
-        for row in range(10):
-            for col in range(9):
-                piece = self.current_board[row][col]
-                if piece == my_piece_type:
-                    # 检查是否受到威胁
-                    if self._is_position_under_attack((row, col)):
-                        threatened.append((row, col))
+        for square, code in enumerate(self.current_compact.squares):
+            if code == my_piece_code and enemy_attacks[square]:
+                threatened.append(position_of(square))
         
         return threatened
     
@@ -842,18 +598,8 @@ class ChessAIAssistant:
         Returns:
             是否受到攻击
         """
-        if not self.current_board:
-            return False
-        
         # 检查对方棋子是否能攻击到该位置
-        for row in range(10):
-            for col in range(9):
-                piece = self.current_board[row][col]
-                if piece and self.opponent_color in piece:
-                    if self._can_piece_attack_position((row, col), position, piece):
-                        return True
-        
-        return False
+        return self._any_piece_attacks(self.opponent_color, position)
     
     def _find_capture_opportunities(self) -> List[str]:
         """寻找吃子机会
@@ -863,23 +609,20 @@ class ChessAIAssistant:
         """
         opportunities = []
         
-        if not self.current_board:
+        if not self.current_compact:
             return opportunities
         
-        # 简化的吃子机会检测
+        # 简化的吃子机会检测：对方的重要棋子被己方攻击
         valuable_pieces = ['chariot', 'cannon', 'horse']
+        my_attacks = self._attack_map().counts[COLOR_CODES[self.player_color]]
         
         for piece_type in valuable_pieces:
-            opponent_piece_type = f"{self.opponent_color}_{piece_type}"
+            opponent_piece_code = piece_code(f"{self.opponent_color}_{piece_type}")
             
             # 寻找对方的该类型棋子
-            for row in range(10):
-                for col in range(9):
-                    piece = self.current_board[row][col]
-                    if piece == opponent_piece_type:
-                        # 检查是否可以吃掉
-                        if self._can_capture_piece((row, col)):
-                            opportunities.append(f"可以吃掉对方{piece_type}")
+            for square, code in enumerate(self.current_compact.squares):
+                if code == opponent_piece_code and my_attacks[square]:
+                    opportunities.append(f"可以吃掉对方{piece_type}")
         
         return opportunities
     
@@ -892,18 +635,19 @@ class ChessAIAssistant:
         Returns:
             是否可以吃掉
         """
-        if not self.current_board:
-            return False
-        
         # 检查己方棋子是否能攻击到目标位置
-        for row in range(10):
-            for col in range(9):
-                piece = self.current_board[row][col]
-                if piece and self.player_color in piece:
-                    if self._can_piece_attack_position((row, col), target_pos, piece):
-                        return True
+        return self._any_piece_attacks(self.player_color, target_pos)
+    
+    def start_analysis(self):
+        """开始新的一次分析（启动监控或手动请求推荐时调用），清除之前的停止请求"""
+        self.search_engine.reset_stop()
+    
+    def stop_analysis(self):
+        """停止搜索（可从其他线程调用），分析立即使用已完成的搜索结果
         
-        return False
+        停止请求保持到下一次start_analysis()，监控线程在停止后才开始的搜索同样立即返回
+        """
+        self.search_engine.stop()
     
     def get_game_summary(self) -> str:
         """获取游戏状态摘要
@@ -932,7 +676,9 @@ class ChessAIAssistant:
     def reset_game(self):
         """重置游戏状态"""
         self.move_detector.clear_history()
+        self.search_engine.clear_hash()
         self.current_board = None
+        self.current_compact = None
         self.game_phase = 'opening'
         self.move_count = 0
         self.analysis_history.clear()
\ No newline at end of file
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑棋盘模块
+用90字节的bytearray表示棋盘，每个格子是一个小整数棋子编码：
+低3位为兵种，0x08/0x10两位为颜色，颜色和兵种都可以用位运算取出。
+AI引擎的内层循环在整数上运行，不再做字符串子串判断和字典查找。
+棋盘同时维护64位Zobrist哈希键、每行/每列的占用掩码以及评估器挂接的子力和位置分总和，
+走子和悔棋时增量更新
+"""
+
+import random
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# 棋盘尺寸
+BOARD_ROWS = 10
+BOARD_COLS = 9
+BOARD_SQUARES = BOARD_ROWS * BOARD_COLS
+
+# 空格
+EMPTY = 0
+
+# 兵种编码（低3位），0表示颜色已知但兵种未识别的棋子（如扫描器输出的'red_piece'）
+KING = 1
+ADVISOR = 2
+ELEPHANT = 3
+HORSE = 4
+CHARIOT = 5
+CANNON = 6
+PAWN = 7
+KIND_MASK = 0x07
+
+# 颜色编码
+RED = 0x08
+BLACK = 0x10
+COLOR_MASK = RED | BLACK
+
+# 编码表的长度，所有棋子编码都小于此值
+CODE_COUNT = 32
+
+KIND_NAMES = ['piece', 'king', 'advisor', 'elephant', 'horse', 'chariot', 'cannon', 'pawn']
+COLOR_CODES = {'red': RED, 'black': BLACK}
+COLOR_NAMES = {RED: 'red', BLACK: 'black'}
+
+# 棋子名称 <-> 编码
+PIECE_CODES: Dict[str, int] = {
+    f"{color_name}_{kind_name}": color | kind
+    for color_name, color in COLOR_CODES.items()
+    for kind, kind_name in enumerate(KIND_NAMES)
+}
+CODE_NAMES: List[Optional[str]] = [None] * CODE_COUNT
+for _name, _code in PIECE_CODES.items():
+    CODE_NAMES[_code] = _name
+
+# 格子序号 -> 行、列，以及该格在行掩码（第col位）和列掩码（第row位）中的位
+SQUARE_ROWS = [square // BOARD_COLS for square in range(BOARD_SQUARES)]
+SQUARE_COLS = [square % BOARD_COLS for square in range(BOARD_SQUARES)]
+RANK_BITS = [1 << col for col in SQUARE_COLS]
+FILE_BITS = [1 << row for row in SQUARE_ROWS]
+
+# 同一行或同一列上两格之间（不含两端）的掩码，按from_square * 90 + to_square索引；不在同一线上为0
+BETWEEN_MASKS = [0] * (BOARD_SQUARES * BOARD_SQUARES)
+for _from in range(BOARD_SQUARES):
+    for _to in range(BOARD_SQUARES):
+        if SQUARE_ROWS[_from] == SQUARE_ROWS[_to]:
+            _low, _high = sorted((SQUARE_COLS[_from], SQUARE_COLS[_to]))
+        elif SQUARE_COLS[_from] == SQUARE_COLS[_to]:
+            _low, _high = sorted((SQUARE_ROWS[_from], SQUARE_ROWS[_to]))
+        else:
+            continue
+        BETWEEN_MASKS[_from * BOARD_SQUARES + _to] = ((1 << _high) - 1) & ~((1 << (_low + 1)) - 1)
+
+# 列掩码最多10位，按掩码查位数
+POPCOUNT = [bin(_mask).count('1') for _mask in range(1 << BOARD_ROWS)]
+
+# 按行掩码查该行有棋子的格子序号：RANK_SQUARES[row][ranks[row]]
+RANK_SQUARES = [
+    [tuple(_row * BOARD_COLS + _col for _col in range(BOARD_COLS) if _mask >> _col & 1)
+     for _mask in range(1 << BOARD_COLS)]
+    for _row in range(BOARD_ROWS)
+]
+
+# Zobrist哈希：每种棋子在每个格子上一个64位随机数，固定种子保证每次运行的键相同
+_zobrist_random = random.Random(0x5A0B7157)
+ZOBRIST_PIECES: List[List[int]] = [
+    [_zobrist_random.getrandbits(64) if code & COLOR_MASK else 0 for _ in range(BOARD_SQUARES)]
+    for code in range(CODE_COUNT)
+]
+# 黑方走棋时异或到哈希键上
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+# 评估器挂接到棋盘上的分值表：(按编码的子力分, 按编码和格子的位置分)，红方为正、黑方为负
+ValueTables = Tuple[List[int], List[List[int]]]
+
+BoardLike = Union['CompactBoard', bytearray, Sequence[Sequence[Optional[str]]]]
+
+
+def piece_code(piece: Optional[str]) -> int:
+    """把棋子名称转换为编码
+    
+    Args:
+        piece: 棋子名称，如'red_horse'；None表示空格
+    
+    Returns:
+        棋子编码，无法识别颜色的名称返回EMPTY
+    """
+    if piece is None:
+        return EMPTY
+    
+    code = PIECE_CODES.get(piece)
+    if code is not None:
+        return code
+    
+    # 非标准名称：按子串识别颜色和兵种
+    if 'red' in piece:
+        color = RED
+    elif 'black' in piece:
+        color = BLACK
+    else:
+        return EMPTY
+    
+    for kind in range(KING, PAWN + 1):
+        if KIND_NAMES[kind] in piece:
+            return color | kind
+    return color
+
+
+def piece_name(code: int) -> Optional[str]:
+    """把棋子编码转换为名称，空格返回None"""
+    return CODE_NAMES[code]
+
+
+def color_of(code: int) -> int:
+    """棋子颜色（RED/BLACK），空格为0"""
+    return code & COLOR_MASK
+
+
+def kind_of(code: int) -> int:
+    """棋子兵种（KING...PAWN），空格或未知兵种为0"""
+    return code & KIND_MASK
+
+
+def opponent_of(color: int) -> int:
+    """对方颜色"""
+    return color ^ COLOR_MASK
+
+
+def square_of(row: int, col: int) -> int:
+    """(row, col) -> 格子序号"""
+    return row * BOARD_COLS + col
+
+
+def position_of(square: int) -> Tuple[int, int]:
+    """格子序号 -> (row, col)"""
+    return divmod(square, BOARD_COLS)
+
+
+def encode_move(from_square: int, to_square: int) -> int:
+    """把走法打包为一个整数：高位为起点格子序号，低8位为终点格子序号"""
+    return (from_square << 8) | to_square
+
+
+def move_from(move: int) -> int:
+    """打包走法的起点格子序号"""
+    return move >> 8
+
+
+def move_to(move: int) -> int:
+    """打包走法的终点格子序号"""
+    return move & 0xFF
+
+
+def encode_board(board: Sequence[Sequence[Optional[str]]]) -> bytearray:
+    """把字符串棋盘编码为90字节的bytearray
+    
+    Args:
+        board: 10x9的字符串棋盘
+    
+    Returns:
+        按行优先排列的棋子编码
+    """
+    codes = PIECE_CODES
+    squares = bytearray(BOARD_SQUARES)
+    index = 0
+    for row in board:
+        for piece in row:
+            if piece is not None:
+                code = codes.get(piece)
+                squares[index] = code if code is not None else piece_code(piece)
+            index += 1
+    return squares
+
+
+def zobrist_key(squares: Sequence[int]) -> int:
+    """从头计算棋盘的Zobrist哈希键（不含走棋方）
+    
+    Args:
+        squares: 90个棋子编码
+    
+    Returns:
+        64位哈希键
+    """
+    key = 0
+    table = ZOBRIST_PIECES
+    for square, code in enumerate(squares):
+        if code:
+            key ^= table[code][square]
+    return key
+
+
+def occupancy_masks(squares: Sequence[int]) -> Tuple[List[int], List[int]]:
+    """从头计算每行和每列的占用掩码
+    
+    Args:
+        squares: 90个棋子编码
+    
+    Returns:
+        (ranks, files)：ranks[row]的第col位、files[col]的第row位表示该格有棋子
+    """
+    ranks = [0] * BOARD_ROWS
+    files = [0] * BOARD_COLS
+    for square, code in enumerate(squares):
+        if code:
+            ranks[SQUARE_ROWS[square]] |= RANK_BITS[square]
+            files[SQUARE_COLS[square]] |= FILE_BITS[square]
+    return ranks, files
+
+
+def decode_board(squares: Sequence[int]) -> List[List[Optional[str]]]:
+    """把棋子编码解码为字符串棋盘
+    
+    Args:
+        squares: 90个棋子编码
+    
+    Returns:
+        10x9的字符串棋盘
+    """
+    names = CODE_NAMES
+    return [
+        [names[code] for code in squares[start:start + BOARD_COLS]]
+        for start in range(0, BOARD_SQUARES, BOARD_COLS)
+    ]
+
+
+class GridView:
+    """紧凑棋盘的只读字符串视图
+    
+    支持board[row][col]形式的访问，按需解码，不复制棋盘
+    """
+    
+    __slots__ = ('_squares',)
+    
+    def __init__(self, squares: bytearray):
+        self._squares = squares
+    
+    def __len__(self) -> int:
+        return BOARD_ROWS
+    
+    def __getitem__(self, row: int) -> List[Optional[str]]:
+        if row < 0:
+            row += BOARD_ROWS
+        if not 0 <= row < BOARD_ROWS:
+            raise IndexError(row)
+        start = row * BOARD_COLS
+        names = CODE_NAMES
+        return [names[code] for code in self._squares[start:start + BOARD_COLS]]
+    
+    def __iter__(self) -> Iterator[List[Optional[str]]]:
+        for row in range(BOARD_ROWS):
+            yield self[row]
+
+
+class CompactBoard:
+    """紧凑棋盘
+    
+    squares[row * 9 + col]为该格的棋子编码，0为空格。
+    make_move()/unmake_move()原地走子和悔棋，悔棋信息保存在撤销栈中。
+    key为棋子布局的Zobrist哈希键，ranks/files为每行9位、每列10位的占用掩码；
+    挂接分值表后material/positional为红方减黑方的子力和位置分总和。
+    这些值在走子、悔棋和按格赋值时增量更新；直接修改squares或to_numpy()视图后需调用rehash()
+    """
+    
+    __slots__ = ('squares', 'key', 'ranks', 'files', 'value_tables', 'material', 'positional', '_undo')
+    
+    def __init__(self, squares: Optional[Sequence[int]] = None):
+        """初始化紧凑棋盘
+        
+        Args:
+            squares: 90个棋子编码，None表示空棋盘
+        """
+        if squares is None:
+            self.squares = bytearray(BOARD_SQUARES)
+        else:
+            self.squares = bytearray(squares)
+            if len(self.squares) != BOARD_SQUARES:
+                raise ValueError(f"棋盘必须有{BOARD_SQUARES}个格子")
+        self.key = zobrist_key(self.squares)
+        self.ranks, self.files = occupancy_masks(self.squares)
+        self.value_tables: Optional[ValueTables] = None
+        self.material = 0
+        self.positional = 0
+        
+        # 撤销栈：每步为(走法, 被吃棋子编码, 走子前的哈希键)
+        self._undo: List[Tuple[int, int, int]] = []
+    
+    @classmethod
+    def from_grid(cls, board: Sequence[Sequence[Optional[str]]]) -> 'CompactBoard':
+        """从扫描器输出的字符串棋盘创建"""
+        compact = cls.__new__(cls)
+        compact.squares = encode_board(board)
+        compact.key = zobrist_key(compact.squares)
+        compact.ranks, compact.files = occupancy_masks(compact.squares)
+        compact.value_tables = None
+        compact.material = 0
+        compact.positional = 0
+        compact._undo = []
+        return compact
+    
+    def to_grid(self) -> List[List[Optional[str]]]:
+        """转换为字符串棋盘（新建列表）"""
+        return decode_board(self.squares)
+    
+    def grid_view(self) -> GridView:
+        """不复制棋盘的字符串视图"""
+        return GridView(self.squares)
+    
+    def to_numpy(self) -> np.ndarray:
+        """共享内存的(10, 9) int8数组视图，修改数组即修改棋盘"""
+        return np.frombuffer(self.squares, dtype=np.int8).reshape(BOARD_ROWS, BOARD_COLS)
+    
+    def copy(self) -> 'CompactBoard':
+        """复制棋盘（不复制撤销栈）"""
+        return CompactBoard(self.squares)
+    
+    @property
+    def ply(self) -> int:
+        """撤销栈中尚未撤销的步数"""
+        return len(self._undo)
+    
+    def hash_key(self, color: int) -> int:
+        """棋子布局加走棋方的哈希键，用于置换表
+        
+        Args:
+            color: 走棋方（RED或BLACK）
+        """
+        return self.key ^ ZOBRIST_SIDE if color == BLACK else self.key
+    
+    def rehash(self) -> int:
+        """直接修改squares后重新计算哈希键、占用掩码和分值总和"""
+        self.key = zobrist_key(self.squares)
+        self.ranks, self.files = occupancy_masks(self.squares)
+        if self.value_tables is not None:
+            self.attach_value_tables(self.value_tables)
+        return self.key
+    
+    def attach_value_tables(self, tables: ValueTables):
+        """挂接评估器的分值表并从头计算子力和位置分总和，之后随走子增量更新
+        
+        Args:
+            tables: (values, pst)，values[code]为子力分，pst[code][square]为位置分，黑方棋子取负值
+        """
+        values, pst = tables
+        material = positional = 0
+        for square, code in enumerate(self.squares):
+            if code:
+                material += values[code]
+                positional += pst[code][square]
+        self.value_tables = tables
+        self.material = material
+        self.positional = positional
+    
+    def make_move(self, move: int) -> int:
+        """原地执行走法
+        
+        Args:
+            move: encode_move()打包的走法
+        
+        Returns:
+            被吃棋子的编码，没有吃子时为EMPTY
+        """
+        squares = self.squares
+        from_square, to_square = move >> 8, move & 0xFF
+        captured = squares[to_square]
+        piece = squares[from_square]
+        squares[to_square] = piece
+        squares[from_square] = EMPTY
+        
+        key = self.key
+        self._undo.append((move, captured, key))
+        table = ZOBRIST_PIECES[piece]
+        key ^= table[from_square] ^ table[to_square]
+        if captured:
+            key ^= ZOBRIST_PIECES[captured][to_square]
+        self.key = key
+        
+        # 起点变空；终点原来有子（吃子）时掩码不变
+        ranks, files = self.ranks, self.files
+        ranks[SQUARE_ROWS[from_square]] ^= RANK_BITS[from_square]
+        files[SQUARE_COLS[from_square]] ^= FILE_BITS[from_square]
+        if not captured:
+            ranks[SQUARE_ROWS[to_square]] ^= RANK_BITS[to_square]
+            files[SQUARE_COLS[to_square]] ^= FILE_BITS[to_square]
+        
+        # 子力和位置分只与走动和被吃的棋子有关
+        tables = self.value_tables
+        if tables is not None:
+            values, pst = tables
+            piece_pst = pst[piece]
+            self.positional += piece_pst[to_square] - piece_pst[from_square]
+            if captured:
+                self.material -= values[captured]
+                self.positional -= pst[captured][to_square]
+        return captured
+    
+    def unmake_move(self) -> int:
+        """撤销最近一次make_move()
+        
+        Returns:
+            被撤销的走法
+        """
+        move, captured, self.key = self._undo.pop()
+        squares = self.squares
+        from_square, to_square = move >> 8, move & 0xFF
+        piece = squares[to_square]
+        squares[from_square] = piece
+        squares[to_square] = captured
+        
+        ranks, files = self.ranks, self.files
+        ranks[SQUARE_ROWS[from_square]] ^= RANK_BITS[from_square]
+        files[SQUARE_COLS[from_square]] ^= FILE_BITS[from_square]
+        if not captured:
+            ranks[SQUARE_ROWS[to_square]] ^= RANK_BITS[to_square]
+            files[SQUARE_COLS[to_square]] ^= FILE_BITS[to_square]
+        
+        # 按差值撤销，分值表在走子之后才挂接时总和仍然正确
+        tables = self.value_tables
+        if tables is not None:
+            values, pst = tables
+            piece_pst = pst[piece]
+            self.positional += piece_pst[from_square] - piece_pst[to_square]
+            if captured:
+                self.material += values[captured]
+                self.positional += pst[captured][to_square]
+        return move
+    
+    def at(self, row: int, col: int) -> int:
+        """(row, col)处的棋子编码"""
+        return self.squares[row * BOARD_COLS + col]
+    
+    def find(self, code: int) -> int:
+        """查找某个棋子第一次出现的格子序号，未找到返回-1"""
+        return self.squares.find(code)
+    
+    def occupied(self) -> List[int]:
+        """有棋子的格子序号，按格子序号排列（按行掩码查表，不扫描空格）"""
+        squares = []
+        ranks = self.ranks
+        for row in range(BOARD_ROWS):
+            squares += RANK_SQUARES[row][ranks[row]]
+        return squares
+    
+    def pieces(self, color: int = COLOR_MASK) -> List[Tuple[int, int]]:
+        """列出棋盘上的棋子
+        
+        Args:
+            color: RED、BLACK或COLOR_MASK（双方）
+        
+        Returns:
+            [(格子序号, 棋子编码)]，按格子序号排列
+        """
+        squares = self.squares
+        return [(square, squares[square]) for square in self.occupied() if squares[square] & color]
+    
+    def __getitem__(self, square: int) -> int:
+        return self.squares[square]
+    
+    def __setitem__(self, square: int, code: int):
+        original = self.squares[square]
+        table = ZOBRIST_PIECES
+        self.key ^= table[original][square] ^ table[code][square]
+        if bool(original) != bool(code):
+            self.ranks[SQUARE_ROWS[square]] ^= RANK_BITS[square]
+            self.files[SQUARE_COLS[square]] ^= FILE_BITS[square]
+        if self.value_tables is not None:
+            values, pst = self.value_tables
+            self.material += values[code] - values[original]
+            self.positional += pst[code][square] - pst[original][square]
+        self.squares[square] = code
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, CompactBoard) and self.squares == other.squares
+    
+    def __repr__(self) -> str:
+        return f"CompactBoard({bytes(self.squares).hex()})"
+
+
+def pieces_between(board: Union[CompactBoard, bytearray], from_square: int, to_square: int) -> int:
+    """同一行或同一列上两格之间（不含两端）的棋子数
+    
+    CompactBoard用占用掩码查表，bytearray逐格统计；不在同一行或列时返回0
+    
+    Args:
+        board: 紧凑棋盘或棋盘编码
+        from_square: 起点格子序号
+        to_square: 终点格子序号
+    """
+    between = BETWEEN_MASKS[from_square * BOARD_SQUARES + to_square]
+    if not between:
+        return 0
+    
+    same_rank = SQUARE_ROWS[from_square] == SQUARE_ROWS[to_square]
+    if isinstance(board, CompactBoard):
+        if same_rank:
+            return POPCOUNT[board.ranks[SQUARE_ROWS[from_square]] & between]
+        return POPCOUNT[board.files[SQUARE_COLS[from_square]] & between]
+    
+    step = 1 if same_rank else BOARD_COLS
+    low, high = min(from_square, to_square), max(from_square, to_square)
+    return sum(1 for square in range(low + step, high, step) if board[square])
+
+
+def as_compact(board: BoardLike) -> CompactBoard:
+    """把各种棋盘表示统一为CompactBoard，已是CompactBoard时直接返回"""
+    if isinstance(board, CompactBoard):
+        return board
+    if isinstance(board, (bytearray, bytes)):
+        return CompactBoard(board)
+    return CompactBoard.from_grid(board)
+
+
+def as_squares(board: BoardLike) -> bytearray:
+    """取得棋盘的编码数组，CompactBoard和bytearray不复制"""
+    if isinstance(board, CompactBoard):
+        return board.squares
+    if isinstance(board, bytearray):
+        return board
+    return encode_board(board)
+
+
+def as_code(piece: Union[int, str, None]) -> int:
+    """棋子名称或编码统一为编码"""
+    if isinstance(piece, int):
+        return piece
+    return piece_code(piece)
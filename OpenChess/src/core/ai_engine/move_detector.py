@@ -7,9 +7,16 @@
 
 import numpy as np
 from typing import Dict, List, Tuple, Optional, NamedTuple
-import copy
 import time
 
+from .compact_board import (
+    BoardLike, BOARD_COLS, COLOR_MASK, KIND_MASK, KING, RED, BLACK,
+    CompactBoard, as_code, as_squares, pieces_between, position_of, square_of,
+)
+from .move_generator import (
+    KING_TARGETS, ADVISOR_TARGETS, ELEPHANT_TARGETS, HORSE_TARGETS, PAWN_TARGETS,
+)
+
 class Move(NamedTuple):
     """走法数据结构"""
     from_pos: Tuple[int, int]  # 起始位置 (row, col)
@@ -49,6 +56,18 @@ class MoveDetector:
         # 棋盘尺寸
         self.board_size = (10, 9)  # 10行9列
         
+        # 按兵种编码索引的走法验证函数
+        self._legal_checkers = [
+            None,
+            self._is_legal_king_move,
+            self._is_legal_advisor_move,
+            self._is_legal_elephant_move,
+            self._is_legal_horse_move,
+            self._is_legal_chariot_move,
+            self._is_legal_cannon_move,
+            self._is_legal_pawn_move,
+        ]
+        
     def update_board(self, new_board: List[List[Optional[str]]]) -> Optional[Move]:
         """更新棋盘状态并检测走法
         
@@ -62,14 +81,14 @@ class MoveDetector:
         if not self._is_valid_board(new_board):
             raise ValueError("无效的棋盘格式")
         
-        # 保存上一次的棋盘状态
-        self.previous_board = copy.deepcopy(self.current_board) if self.current_board else None
+        # 保存上一次的棋盘状态（current_board是自己持有的副本，之后不会被修改）
+        self.previous_board = self.current_board
         
-        # 更新当前棋盘
-        self.current_board = copy.deepcopy(new_board)
+        # 更新当前棋盘，棋子名称是不可变字符串，逐行浅复制即可
+        self.current_board = [list(row) for row in new_board]
         
         # 添加到历史记录
-        self.board_history.append(copy.deepcopy(new_board))
+        self.board_history.append(self.current_board)
         
         # 如果有上一次的棋盘状态，检测走法
         if self.previous_board is not None:
@@ -304,14 +323,14 @@ class MoveDetector:
         return None
     
     def _is_legal_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                      piece: str, board: List[List[Optional[str]]]) -> bool:
+                      piece, board: BoardLike) -> bool:
         """验证走法是否符合中国象棋规则
         
         Args:
             from_pos: 起始位置
             to_pos: 目标位置  
-            piece: 移动的棋子
-            board: 棋盘状态
+            piece: 移动的棋子（名称或编码）
+            board: 棋盘状态（字符串棋盘或CompactBoard）
             
         Returns:
             走法是否合法
@@ -326,171 +345,70 @@ class MoveDetector:
         # 位置是否在棋盘内
         if not (0 <= to_row < 10 and 0 <= to_col < 9):
             return False
+        if not (0 <= from_row < 10 and 0 <= from_col < 9):
+            return False
         
-        # 根据棋子类型验证走法
-        if 'king' in piece:  # 帅/将
-            return self._is_legal_king_move(from_pos, to_pos, piece, board)
-        elif 'advisor' in piece:  # 仕/士
-            return self._is_legal_advisor_move(from_pos, to_pos, piece, board)
-        elif 'elephant' in piece:  # 相/象
-            return self._is_legal_elephant_move(from_pos, to_pos, piece, board)
-        elif 'horse' in piece:  # 马
-            return self._is_legal_horse_move(from_pos, to_pos, piece, board)
-        elif 'chariot' in piece:  # 车
-            return self._is_legal_chariot_move(from_pos, to_pos, piece, board)
-        elif 'cannon' in piece:  # 炮
-            return self._is_legal_cannon_move(from_pos, to_pos, piece, board)
-        elif 'pawn' in piece:  # 兵/卒
-            return self._is_legal_pawn_move(from_pos, to_pos, piece, board)
-        
-        return False
+        # 根据棋子类型验证走法，棋盘和棋子只转换一次；CompactBoard保留，车炮可以使用占用掩码
+        code = as_code(piece)
+        checker = self._legal_checkers[code & KIND_MASK]
+        if checker is None:
+            return False
+        if not isinstance(board, CompactBoard):
+            board = as_squares(board)
+        return checker(from_pos, to_pos, code, board)
     
     def _is_legal_king_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                           piece: str, board: List[List[Optional[str]]]) -> bool:
-        """验证帅/将的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
-        # 只能在九宫内移动
-        if 'red' in piece:  # 红帅
-            if not (7 <= to_row <= 9 and 3 <= to_col <= 5):
-                return False
-        else:  # 黑将
-            if not (0 <= to_row <= 2 and 3 <= to_col <= 5):
-                return False
-        
-        # 只能走一格，且只能横走或竖走
-        row_diff = abs(to_row - from_row)
-        col_diff = abs(to_col - from_col)
-        
-        return (row_diff == 1 and col_diff == 0) or (row_diff == 0 and col_diff == 1)
+                           piece, board: BoardLike) -> bool:
+        """验证帅/将的走法：在九宫内横竖走一格，或与对方将帅同列且中间无子时飞将吃王"""
+        color = RED if as_code(piece) & RED else BLACK
+        from_square, to_square = square_of(*from_pos), square_of(*to_pos)
+        if to_square in KING_TARGETS[color][from_square]:
+            return True
+        return (as_squares(board)[to_square] == (color ^ COLOR_MASK) | KING
+                and from_pos[1] == to_pos[1]
+                and pieces_between(board, from_square, to_square) == 0)
     
     def _is_legal_advisor_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                              piece: str, board: List[List[Optional[str]]]) -> bool:
-        """验证仕/士的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
-        # 只能在九宫内移动
-        if 'red' in piece:  # 红仕
-            if not (7 <= to_row <= 9 and 3 <= to_col <= 5):
-                return False
-        else:  # 黑士
-            if not (0 <= to_row <= 2 and 3 <= to_col <= 5):
-                return False
-        
-        # 只能斜走一格
-        row_diff = abs(to_row - from_row)
-        col_diff = abs(to_col - from_col)
-        
-        return row_diff == 1 and col_diff == 1
+                              piece, board: BoardLike) -> bool:
+        """验证仕/士的走法：在九宫内斜走一格"""
+        color = RED if as_code(piece) & RED else BLACK
+        return square_of(*to_pos) in ADVISOR_TARGETS[color][square_of(*from_pos)]
     
     def _is_legal_elephant_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                               piece: str, board: List[List[Optional[str]]]) -> bool:
-        """验证相/象的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
-        # 不能过河
-        if 'red' in piece:  # 红相
-            if to_row < 5:
-                return False
-        else:  # 黑象
-            if to_row > 4:
-                return False
-        
-        # 必须走田字
-        row_diff = abs(to_row - from_row)
-        col_diff = abs(to_col - from_col)
-        
-        if row_diff != 2 or col_diff != 2:
-            return False
-        
-        # 检查象眼是否被堵
-        eye_row = from_row + (to_row - from_row) // 2
-        eye_col = from_col + (to_col - from_col) // 2
-        
-        return board[eye_row][eye_col] is None
+                               piece, board: BoardLike) -> bool:
+        """验证相/象的走法：走田字不过河，象眼不能被堵"""
+        color = RED if as_code(piece) & RED else BLACK
+        eye = ELEPHANT_TARGETS[color][square_of(*from_pos)].get(square_of(*to_pos))
+        return eye is not None and not as_squares(board)[eye]
     
     def _is_legal_horse_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                            piece: str, board: List[List[Optional[str]]]) -> bool:
-        """验证马的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
-        row_diff = abs(to_row - from_row)
-        col_diff = abs(to_col - from_col)
-        
-        # 马走日字
-        if not ((row_diff == 2 and col_diff == 1) or (row_diff == 1 and col_diff == 2)):
-            return False
-        
-        # 检查马腿是否被堵
-        if row_diff == 2:  # 竖走
-            leg_row = from_row + (to_row - from_row) // 2
-            leg_col = from_col
-        else:  # 横走
-            leg_row = from_row
-            leg_col = from_col + (to_col - from_col) // 2
-        
-        return board[leg_row][leg_col] is None
+                            piece, board: BoardLike) -> bool:
+        """验证马的走法：马走日字，马腿不能被堵"""
+        leg = HORSE_TARGETS[square_of(*from_pos)].get(square_of(*to_pos))
+        return leg is not None and not as_squares(board)[leg]
     
     def _is_legal_chariot_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                              piece: str, board: List[List[Optional[str]]]) -> bool:
+                              piece, board: BoardLike) -> bool:
         """验证车的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
         # 车只能直走
-        if from_row != to_row and from_col != to_col:
+        if from_pos[0] != to_pos[0] and from_pos[1] != to_pos[1]:
             return False
         
         # 检查路径是否有障碍
-        if from_row == to_row:  # 横走
-            start_col = min(from_col, to_col) + 1
-            end_col = max(from_col, to_col)
-            for col in range(start_col, end_col):
-                if board[from_row][col] is not None:
-                    return False
-        else:  # 竖走
-            start_row = min(from_row, to_row) + 1
-            end_row = max(from_row, to_row)
-            for row in range(start_row, end_row):
-                if board[row][from_col] is not None:
-                    return False
-        
-        return True
+        return pieces_between(board, square_of(*from_pos), square_of(*to_pos)) == 0
     
     def _is_legal_cannon_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                             piece: str, board: List[List[Optional[str]]]) -> bool:
+                             piece, board: BoardLike) -> bool:
         """验证炮的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
         # 炮只能直走
-        if from_row != to_row and from_col != to_col:
+        if from_pos[0] != to_pos[0] and from_pos[1] != to_pos[1]:
             return False
         
         # 计算路径上的棋子数量
-        pieces_count = 0
-        
-        if from_row == to_row:  # 横走
-            start_col = min(from_col, to_col) + 1
-            end_col = max(from_col, to_col)
-            for col in range(start_col, end_col):
-                if board[from_row][col] is not None:
-                    pieces_count += 1
-        else:  # 竖走
-            start_row = min(from_row, to_row) + 1
-            end_row = max(from_row, to_row)
-            for row in range(start_row, end_row):
-                if board[row][from_col] is not None:
-                    pieces_count += 1
-        
-        # 目标位置的情况
-        target_piece = board[to_row][to_col]
-        
-        if target_piece is None:
+        from_square, to_square = square_of(*from_pos), square_of(*to_pos)
+        pieces_count = pieces_between(board, from_square, to_square)
+        
+        if not as_squares(board)[to_square]:
             # 移动：路径上不能有棋子
             return pieces_count == 0
         else:
@@ -498,31 +416,13 @@ class MoveDetector:
             return pieces_count == 1
     
     def _is_legal_pawn_move(self, from_pos: Tuple[int, int], to_pos: Tuple[int, int], 
-                           piece: str, board: List[List[Optional[str]]]) -> bool:
-        """验证兵/卒的走法"""
-        from_row, from_col = from_pos
-        to_row, to_col = to_pos
-        
-        row_diff = to_row - from_row
-        col_diff = abs(to_col - from_col)
-        
-        if 'red' in piece:  # 红兵
-            # 未过河：只能向前
-            if from_row > 4:
-                return row_diff == -1 and col_diff == 0
-            # 已过河：可以向前或左右
-            else:
-                return (row_diff == -1 and col_diff == 0) or (row_diff == 0 and col_diff == 1)
-        else:  # 黑卒
-            # 未过河：只能向前
-            if from_row < 5:
-                return row_diff == 1 and col_diff == 0
-            # 已过河：可以向前或左右
-            else:
-                return (row_diff == 1 and col_diff == 0) or (row_diff == 0 and col_diff == 1)
+                           piece, board: BoardLike) -> bool:
+        """验证兵/卒的走法：未过河只能向前，过河后可以向前或左右"""
+        color = RED if as_code(piece) & RED else BLACK
+        return square_of(*to_pos) in PAWN_TARGETS[color][square_of(*from_pos)]
     
-    def _causes_check(self, to_pos: Tuple[int, int], piece: str, 
-                     board: List[List[Optional[str]]]) -> bool:
+    def _causes_check(self, to_pos: Tuple[int, int], piece, 
+                     board: BoardLike) -> bool:
         """检查走法是否构成将军
         
         Args:
@@ -533,32 +433,22 @@ class MoveDetector:
         Returns:
             是否构成将军
         """
-        # 找到对方的将/帅
-        opponent_king = None
-        opponent_king_pos = None
-        
-        if 'red' in piece:
-            opponent_king = 'black_king'
-        else:
-            opponent_king = 'red_king'
+        code = as_code(piece)
+        squares = as_squares(board)
         
         # 寻找对方王的位置
-        for row in range(10):
-            for col in range(9):
-                if board[row][col] == opponent_king:
-                    opponent_king_pos = (row, col)
-                    break
-            if opponent_king_pos:
-                break
+        opponent_king = ((code & COLOR_MASK) ^ COLOR_MASK) | KING
+        king_square = squares.find(opponent_king)
         
-        if not opponent_king_pos:
+        if king_square < 0:
             return False
         
         # 检查移动后的棋子是否能攻击到对方的王
-        return self._can_attack(to_pos, opponent_king_pos, piece, board)
+        return self._can_attack(to_pos, position_of(king_square), code,
+                                board if isinstance(board, CompactBoard) else squares)
     
     def _can_attack(self, from_pos: Tuple[int, int], target_pos: Tuple[int, int], 
-                   piece: str, board: List[List[Optional[str]]]) -> bool:
+                   piece, board: BoardLike) -> bool:
         """检查棋子是否能攻击到目标位置
         
         Args:
@@ -570,12 +460,22 @@ class MoveDetector:
         Returns:
             是否能攻击到目标
         """
-        # 复制棋盘并清空目标位置来测试攻击
-        test_board = copy.deepcopy(board)
-        test_board[target_pos[0]][target_pos[1]] = None
-        
-        # 测试是否是合法的攻击走法
-        return self._is_legal_move(from_pos, target_pos, piece, test_board)
+        code = as_code(piece)
+        if not isinstance(board, CompactBoard):
+            board = as_squares(board)
+        target = target_pos[0] * BOARD_COLS + target_pos[1]
+        original = board[target]
+        
+        # 目标有棋子时直接按吃子走法判断
+        if original:
+            return self._is_legal_move(from_pos, target_pos, code, board)
+        
+        # 目标为空时临时放一个对方棋子，使炮按隔子吃子的规则判断，判断后原地恢复
+        board[target] = (code & COLOR_MASK) ^ COLOR_MASK
+        try:
+            return self._is_legal_move(from_pos, target_pos, code, board)
+        finally:
+            board[target] = original
     
     def get_last_move(self) -> Optional[Move]:
         """获取最后一次走法
@@ -591,7 +491,8 @@ class MoveDetector:
         Returns:
             走法历史列表
         """
-        return copy.deepcopy(self.move_history)
+        # Move是不可变的NamedTuple，复制列表即可
+        return list(self.move_history)
     
     def clear_history(self):
         """清空历史记录"""
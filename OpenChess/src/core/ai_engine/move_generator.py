@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+走法生成模块
+在紧凑棋盘上生成伪合法走法（不检查走后是否被将军），
+走法为encode_move()打包的整数，不创建Move对象。
+帅、仕、相、马、兵的目标格和蹩腿格在导入时按格子预先算好，生成走法时只查表；
+车、炮按所在行/列的占用掩码直接查出可到达的格子
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .compact_board import (
+    BOARD_COLS, BOARD_ROWS, BOARD_SQUARES, COLOR_MASK, KIND_MASK, RED, BLACK,
+    KING, ADVISOR, ELEPHANT, HORSE, CHARIOT, CANNON, PAWN,
+    SQUARE_ROWS, SQUARE_COLS, BoardLike, CompactBoard, as_squares, occupancy_masks,
+)
+
+# 行/列占用掩码列表
+Masks = List[int]
+
+# 马走日字的8个方向及对应的马腿
+HORSE_STEPS = [
+    (-2, -1, -1, 0), (-2, 1, -1, 0), (-1, -2, 0, -1), (-1, 2, 0, 1),
+    (1, -2, 0, -1), (1, 2, 0, 1), (2, -1, 1, 0), (2, 1, 1, 0)
+]
+
+ORTHOGONAL = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+ELEPHANT_STEPS = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
+
+
+def _in_palace(color: int, row: int, col: int) -> bool:
+    """是否在该方九宫内"""
+    if not 3 <= col <= 5:
+        return False
+    return 7 <= row <= 9 if color == RED else 0 <= row <= 2
+
+
+def _on_board(row: int, col: int) -> bool:
+    """是否在棋盘内"""
+    return 0 <= row < BOARD_ROWS and 0 <= col < BOARD_COLS
+
+
+def _build_palace_table(color: int, steps: List[Tuple[int, int]]) -> List[Tuple[int, ...]]:
+    """按格子列出帅/仕走一步能到达的九宫内目标格"""
+    table = []
+    for square in range(BOARD_SQUARES):
+        row, col = divmod(square, BOARD_COLS)
+        table.append(tuple(
+            (row + dr) * BOARD_COLS + col + dc
+            for dr, dc in steps if _in_palace(color, row + dr, col + dc)
+        ))
+    return table
+
+
+def _build_elephant_table(color: int) -> List[Dict[int, int]]:
+    """按格子列出相/象不过河的目标格及对应的象眼格"""
+    table = []
+    for square in range(BOARD_SQUARES):
+        row, col = divmod(square, BOARD_COLS)
+        targets = {}
+        for dr, dc in ELEPHANT_STEPS:
+            to_row, to_col = row + dr, col + dc
+            if not _on_board(to_row, to_col):
+                continue
+            if (to_row < 5) if color == RED else (to_row > 4):
+                continue
+            targets[to_row * BOARD_COLS + to_col] = (row + dr // 2) * BOARD_COLS + col + dc // 2
+        table.append(targets)
+    return table
+
+
+def _build_horse_table() -> List[Dict[int, int]]:
+    """按格子列出马的目标格及对应的马腿格"""
+    table = []
+    for square in range(BOARD_SQUARES):
+        row, col = divmod(square, BOARD_COLS)
+        targets = {}
+        for dr, dc, leg_dr, leg_dc in HORSE_STEPS:
+            to_row, to_col = row + dr, col + dc
+            if _on_board(to_row, to_col):
+                targets[to_row * BOARD_COLS + to_col] = (row + leg_dr) * BOARD_COLS + col + leg_dc
+        table.append(targets)
+    return table
+
+
+def _build_pawn_table(color: int) -> List[Tuple[int, ...]]:
+    """按格子列出兵/卒的目标格：未过河只能向前，过河后可以向前或左右"""
+    table = []
+    for square in range(BOARD_SQUARES):
+        row, col = divmod(square, BOARD_COLS)
+        if color == RED:
+            forward, crossed = -1, row <= 4
+        else:
+            forward, crossed = 1, row >= 5
+        steps = [(forward, 0), (0, -1), (0, 1)] if crossed else [(forward, 0)]
+        table.append(tuple(
+            (row + dr) * BOARD_COLS + col + dc
+            for dr, dc in steps if _on_board(row + dr, col + dc)
+        ))
+    return table
+
+
+def _build_slide_table(length: int, stride: int, cannon: bool) -> List[List[Tuple[int, ...]]]:
+    """按线上位置和占用掩码列出车/炮沿一条线可到达格子的序号偏移
+    
+    车走到第一个棋子为止（含该棋子）；炮不吃子时走到第一个棋子之前，吃子时越过一个炮架
+    吃下一个棋子。目标格是否为己方棋子由生成函数判断
+    
+    Args:
+        length: 线的长度（行为9，列为10）
+        stride: 沿线走一格的格子序号增量（行为1，列为9）
+        cannon: 是否按炮的规则
+    
+    Returns:
+        table[位置][掩码]为先负方向、后正方向、由近及远排列的序号偏移
+    """
+    table = []
+    for position in range(length):
+        row_table = []
+        for mask in range(1 << length):
+            offsets = []
+            for direction in (-1, 1):
+                index = position + direction
+                mounted = False
+                while 0 <= index < length:
+                    occupied = (mask >> index) & 1
+                    if not cannon or not mounted:
+                        if occupied and cannon:
+                            mounted = True
+                        else:
+                            offsets.append((index - position) * stride)
+                            if occupied:
+                                break
+                    elif occupied:
+                        offsets.append((index - position) * stride)
+                        break
+                    index += direction
+            row_table.append(tuple(offsets))
+        table.append(row_table)
+    return table
+
+
+# 预先算好的走法表，按颜色和格子序号索引
+KING_TARGETS = {color: _build_palace_table(color, ORTHOGONAL) for color in (RED, BLACK)}
+ADVISOR_TARGETS = {color: _build_palace_table(color, DIAGONAL) for color in (RED, BLACK)}
+ELEPHANT_TARGETS = {color: _build_elephant_table(color) for color in (RED, BLACK)}
+HORSE_TARGETS = _build_horse_table()
+PAWN_TARGETS = {color: _build_pawn_table(color) for color in (RED, BLACK)}
+
+# 车、炮的滑动表：*_FILE_SLIDES[row][files[col]]为沿列的偏移，*_RANK_SLIDES[col][ranks[row]]为沿行的偏移
+CHARIOT_FILE_SLIDES = _build_slide_table(BOARD_ROWS, BOARD_COLS, False)
+CHARIOT_RANK_SLIDES = _build_slide_table(BOARD_COLS, 1, False)
+CANNON_FILE_SLIDES = _build_slide_table(BOARD_ROWS, BOARD_COLS, True)
+CANNON_RANK_SLIDES = _build_slide_table(BOARD_COLS, 1, True)
+
+
+def generate_king_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                        ranks: Masks, files: Masks):
+    """生成帅/将的走法，与对方将帅在同一列且中间无子时可以飞将吃王"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    for target in KING_TARGETS[color][square]:
+        if not squares[target] & color:
+            moves.append(origin | target)
+    
+    enemy_king = (color ^ COLOR_MASK) | KING
+    for offset in CHARIOT_FILE_SLIDES[SQUARE_ROWS[square]][files[SQUARE_COLS[square]]]:
+        if squares[square + offset] == enemy_king:
+            moves.append(origin | (square + offset))
+
+
+def generate_advisor_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                           ranks: Masks, files: Masks):
+    """生成仕/士的走法"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    for target in ADVISOR_TARGETS[color][square]:
+        if not squares[target] & color:
+            moves.append(origin | target)
+
+
+def generate_elephant_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                            ranks: Masks, files: Masks):
+    """生成相/象的走法（不过河，象眼被堵不能走）"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    for target, eye in ELEPHANT_TARGETS[color][square].items():
+        if not squares[eye] and not squares[target] & color:
+            moves.append(origin | target)
+
+
+def generate_horse_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                         ranks: Masks, files: Masks):
+    """生成马的走法（马腿被堵不能走）"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    for target, leg in HORSE_TARGETS[square].items():
+        if not squares[leg] and not squares[target] & color:
+            moves.append(origin | target)
+
+
+def generate_chariot_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                           ranks: Masks, files: Masks):
+    """生成车的走法"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    row, col = SQUARE_ROWS[square], SQUARE_COLS[square]
+    for offset in CHARIOT_FILE_SLIDES[row][files[col]] + CHARIOT_RANK_SLIDES[col][ranks[row]]:
+        target = square + offset
+        if not squares[target] & color:
+            moves.append(origin | target)
+
+
+def generate_cannon_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                          ranks: Masks, files: Masks):
+    """生成炮的走法：不吃子时同车，吃子时必须隔一个炮架"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    row, col = SQUARE_ROWS[square], SQUARE_COLS[square]
+    for offset in CANNON_FILE_SLIDES[row][files[col]] + CANNON_RANK_SLIDES[col][ranks[row]]:
+        target = square + offset
+        if not squares[target] & color:
+            moves.append(origin | target)
+
+
+def generate_pawn_moves(squares: bytearray, square: int, code: int, moves: List[int],
+                        ranks: Masks, files: Masks):
+    """生成兵/卒的走法：未过河只能向前，过河后可以向前或左右"""
+    color = code & COLOR_MASK
+    origin = square << 8
+    for target in PAWN_TARGETS[color][square]:
+        if not squares[target] & color:
+            moves.append(origin | target)
+
+
+# 按兵种索引的生成函数，兵种未知的棋子没有走法
+PIECE_GENERATORS = [
+    None,
+    generate_king_moves,
+    generate_advisor_moves,
+    generate_elephant_moves,
+    generate_horse_moves,
+    generate_chariot_moves,
+    generate_cannon_moves,
+    generate_pawn_moves,
+]
+
+
+def board_state(board: BoardLike) -> Tuple[bytearray, Masks, Masks]:
+    """取得棋盘编码和占用掩码
+    
+    CompactBoard直接使用增量维护的掩码，其他表示现算
+    
+    Returns:
+        (squares, ranks, files)
+    """
+    if isinstance(board, CompactBoard):
+        return board.squares, board.ranks, board.files
+    squares = as_squares(board)
+    ranks, files = occupancy_masks(squares)
+    return squares, ranks, files
+
+
+def generate_piece_moves(board: BoardLike, square: int, code: int,
+                         moves: Optional[List[int]] = None) -> List[int]:
+    """生成单个棋子的走法
+    
+    Args:
+        board: 棋盘（CompactBoard、棋盘编码或字符串棋盘，后两者需要现算占用掩码）
+        square: 棋子所在格子序号
+        code: 棋子编码
+        moves: 追加走法的列表，None时新建
+    
+    Returns:
+        打包的走法列表
+    """
+    if moves is None:
+        moves = []
+    generator = PIECE_GENERATORS[code & KIND_MASK]
+    if generator is not None:
+        squares, ranks, files = board_state(board)
+        generator(squares, square, code, moves, ranks, files)
+    return moves
+
+
+def generate_moves(board: BoardLike, color: int) -> List[int]:
+    """生成一方的所有伪合法走法
+    
+    Args:
+        board: 棋盘（CompactBoard、棋盘编码或字符串棋盘，后两者需要现算占用掩码）
+        color: RED或BLACK
+    
+    Returns:
+        打包的走法列表，按棋子所在格子序号排列
+    """
+    squares, ranks, files = board_state(board)
+    moves: List[int] = []
+    generators = PIECE_GENERATORS
+    for square, code in enumerate(squares):
+        if code & color:
+            generator = generators[code & KIND_MASK]
+            if generator is not None:
+                generator(squares, square, code, moves, ranks, files)
+    return moves
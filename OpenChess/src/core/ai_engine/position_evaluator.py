@@ -2,13 +2,41 @@
 # -*- coding: utf-8 -*-
 """
 局面评估器模块
-用于评估中国象棋局面的优劣和计算胜率
+用于评估中国象棋局面的优劣和计算胜率。
+评估时遍历一次棋子得到各项特征组成的向量，总分为特征向量与权重向量的点积；
+evaluate_batch()用NumPy一次评估多个局面，evaluate_lazy()在局面远离搜索窗口时跳过其余评估项
 """
 
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 import math
 from .move_detector import Move
+from .compact_board import (
+    BoardLike, BOARD_SQUARES, CODE_COUNT, COLOR_MASK, KIND_MASK, RED, BLACK, KING, PIECE_CODES,
+    CompactBoard, as_compact, square_of,
+)
+from .attack_map import MAX_TARGETS, AttackMapCache, batch_attack_counts, count_attackers
+from ...utils.config import AI_LAZY_EVAL
+
+# 评估特征，顺序即特征向量的顺序；evaluate_position()返回的字典键为名称加'_score'
+FEATURE_NAMES = (
+    'material', 'position', 'mobility', 'king_safety',
+    'center_control', 'development', 'attack', 'defense',
+)
+
+# 中心区域（河界附近的重要位置）：(4, 3)-(4, 5)和(5, 3)-(5, 5)
+CENTER_SQUARES = frozenset((39, 40, 41, 48, 49, 50))
+
+# 双方九宫的格子
+PALACE_SQUARES = {
+    RED: frozenset(square_of(row, col) for row in range(7, 10) for col in range(3, 6)),
+    BLACK: frozenset(square_of(row, col) for row in range(0, 3) for col in range(3, 6)),
+}
+
+
+# 分数到胜率的Sigmoid缩放因子和胜率的上下限
+WIN_PROBABILITY_SCALE = 0.002
+WIN_PROBABILITY_RANGE = (0.01, 0.99)
 
 class PositionEvaluator:
     """局面评估器类
@@ -52,6 +80,15 @@ class PositionEvaluator:
             'defense': 0.2          # 防守性权重
         }
         
+        # 按棋子编码索引的整数查找表
+        self.refresh_tables()
+        
+        # 按局面哈希键缓存的攻击表，王安全评估和助手的威胁分析共用
+        self.attack_maps = AttackMapCache()
+        
+        # 是否使用懒惰评估，False时evaluate_lazy()总是完整评估
+        self.lazy_eval = AI_LAZY_EVAL
+        
     def _init_position_values(self) -> Dict[str, np.ndarray]:
         """初始化位置价值表
         
@@ -179,351 +216,335 @@ class PositionEvaluator:
         
         return position_values
     
-    def evaluate_position(self, board: List[List[Optional[str]]], 
+    def refresh_tables(self):
+        """根据piece_values和position_values重建按棋子编码索引的查找表
+        
+        修改piece_values或position_values后需要调用
+        """
+        self._code_values = [0] * CODE_COUNT
+        self._code_pst: List[Optional[List[int]]] = [None] * CODE_COUNT
+        
+        for piece, code in PIECE_CODES.items():
+            self._code_values[code] = self.piece_values.get(piece, 0)
+            if piece in self.position_values:
+                self._code_pst[code] = [int(value) for value in np.asarray(self.position_values[piece]).flatten()]
+        
+        # 挂接到CompactBoard上增量维护的分值表：红方为正、黑方为负
+        signed_values = [0] * CODE_COUNT
+        signed_pst = [[0] * BOARD_SQUARES for _ in range(CODE_COUNT)]
+        for code in range(CODE_COUNT):
+            sign = 1 if code & RED else -1
+            signed_values[code] = sign * self._code_values[code]
+            if self._code_pst[code] is not None:
+                signed_pst[code] = [sign * value for value in self._code_pst[code]]
+        self._value_tables = (signed_values, signed_pst)
+        
+        # 批量评估使用的NumPy数组
+        code_colors = np.array([code & COLOR_MASK for code in range(CODE_COUNT)])
+        code_kinds = np.array([code & KIND_MASK for code in range(CODE_COUNT)])
+        self._batch_signs = np.where(code_colors == RED, 1, np.where(code_colors == BLACK, -1, 0))
+        self._batch_values = np.array(self._code_values, dtype=float)
+        self._batch_signed_values = np.array(signed_values, dtype=float)
+        self._batch_signed_pst = np.array(signed_pst, dtype=float)
+        self._batch_protector = (code_kinds != KING) & (code_colors != 0)
+        
+        # 初始位置 [(格子序号, 棋子编码)]
+        self._initial_squares = [
+            (square_of(row, col), PIECE_CODES[piece])
+            for piece, positions in self._get_initial_positions().items()
+            for row, col in positions
+        ]
+        # 按格子索引的初始棋子编码，以及双方初始棋子数
+        self._initial_codes = [0] * BOARD_SQUARES
+        self._initial_counts = {RED: 0, BLACK: 0}
+        for square, code in self._initial_squares:
+            self._initial_codes[square] = code
+            self._initial_counts[code & COLOR_MASK] += 1
+        
+        # 懒惰评估跳过的特征的绝对值上界。按标准棋子数计算（象棋没有升变，棋子只会变少），
+        # 双方将帅都在时将帅都在己方九宫内，在攻击和防守特征中相互抵消
+        side_values = {RED: 0, BLACK: 0}
+        side_targets = {RED: 0, BLACK: 0}
+        for square, code in self._initial_squares:
+            kind = code & KIND_MASK
+            side_targets[code & COLOR_MASK] += MAX_TARGETS[kind]
+            if kind != KING:
+                side_values[code & COLOR_MASK] += self._code_values[code]
+        material = max(side_values.values())
+        self._lazy_bounds = {
+            'mobility': max(side_targets.values()) * 2,
+            'center_control': len(CENTER_SQUARES) * 15,
+            'development': max(self._initial_counts.values()) * 10,
+            'attack': material * 0.1,
+            'defense': material * 0.05,
+        }
+    
+    def lazy_margin(self) -> float:
+        """懒惰评估的余量：跳过的各项评估按当前权重加权后的上界之和"""
+        weights = self.weights
+        return sum(abs(weights[name]) * bound for name, bound in self._lazy_bounds.items())
+    
+    def weight_vector(self) -> np.ndarray:
+        """按FEATURE_NAMES顺序排列的权重向量（每次按weights字典现取，修改权重后立即生效）"""
+        weights = self.weights
+        return np.array([weights[name] for name in FEATURE_NAMES])
+    
+    def extract_features(self, board: BoardLike, perspective: str = 'red') -> np.ndarray:
+        """一次遍历棋子，计算各项评估特征
+        
+        子力和位置分取CompactBoard增量维护的总和，其余特征在同一次遍历中累加，
+        只遍历行占用掩码中有棋子的格子；走法数和王受到的攻击数取自攻击表。
+        evaluate_position()、evaluate_score()和evaluate_lazy()都以此为准
+        
+        Args:
+            board: 棋盘状态
+            perspective: 评估视角
+            
+        Returns:
+            按FEATURE_NAMES顺序排列的特征向量（perspective视角的差值）
+        """
+        board = self._attached(as_compact(board))
+        squares = board.squares
+        values = self._code_values
+        initial_codes = self._initial_codes
+        red_palace, black_palace = PALACE_SQUARES[RED], PALACE_SQUARES[BLACK]
+        red_king = squares.find(RED | KING)
+        black_king = squares.find(BLACK | KING)
+        
+        # 以下均为红方视角的累计值
+        center = 0
+        undeveloped = 0          # 黑方减红方留在初始位置的棋子数
+        attack = 0               # 红方在黑方半场的子力减黑方在红方半场的子力
+        defense = 0              # 红方在己方半场的子力减黑方在己方半场的子力
+        red_protectors = black_protectors = 0
+        
+        for square in board.occupied():
+            code = squares[square]
+            kind = code & KIND_MASK
+            if code & RED:
+                if square < 45:
+                    attack += values[code]
+                else:
+                    defense += values[code]
+                if initial_codes[square] == code:
+                    undeveloped -= 1
+                if kind != KING and square in red_palace:
+                    red_protectors += 1
+                if square in CENTER_SQUARES:
+                    center += 15
+            else:
+                if square < 45:
+                    defense -= values[code]
+                else:
+                    attack -= values[code]
+                if initial_codes[square] == code:
+                    undeveloped += 1
+                if kind != KING and square in black_palace:
+                    black_protectors += 1
+                if square in CENTER_SQUARES:
+                    center -= 15
+        
+        # 双方走法数和威胁红帅/黑将的对方棋子数取自攻击表
+        attack_map = self.attack_maps.get(board)
+        mobility = attack_map.move_count(RED) - attack_map.move_count(BLACK)
+        red_safety = black_safety = 0
+        if red_king >= 0:
+            red_safety = red_protectors * 20 - attack_map.attackers(red_king, BLACK) * 30
+        if black_king >= 0:
+            black_safety = black_protectors * 20 - attack_map.attackers(black_king, RED) * 30
+        initial_counts = self._initial_counts
+        development = (initial_counts[RED] - initial_counts[BLACK] + undeveloped) * 10
+        
+        features = np.array([
+            board.material,
+            board.positional,
+            mobility * 2,
+            (red_safety - black_safety) * 50,
+            center,
+            development,
+            attack * 0.1,
+            defense * 0.05,
+        ], dtype=float)
+        return features if perspective == 'red' else -features
+    
+    def evaluate_position(self, board: BoardLike, 
                          perspective: str = 'red') -> Dict[str, float]:
         """评估局面价值
         
         Args:
-            board: 棋盘状态
+            board: 棋盘状态（字符串棋盘或CompactBoard）
             perspective: 评估视角，'red'或'black'
             
         Returns:
             包含各项评估指标的字典
         """
+        features = self.extract_features(board, perspective)
+        
+        # 各项分数（子力、位置、机动性、王安全、中心控制、发展、攻击、防守）
         evaluation = {
-            'material_score': 0,      # 子力分数
-            'position_score': 0,      # 位置分数
-            'mobility_score': 0,      # 机动性分数
-            'king_safety_score': 0,   # 王安全分数
-            'center_control_score': 0, # 中心控制分数
-            'development_score': 0,   # 发展分数
-            'attack_score': 0,        # 攻击分数
-            'defense_score': 0,       # 防守分数
-            'total_score': 0,         # 总分
-            'win_probability': 0.5    # 胜率
+            f'{name}_score': float(value) for name, value in zip(FEATURE_NAMES, features)
         }
         
-        # 计算各项分数
-        evaluation['material_score'] = self._calculate_material_score(board, perspective)
-        evaluation['position_score'] = self._calculate_position_score(board, perspective)
-        evaluation['mobility_score'] = self._calculate_mobility_score(board, perspective)
-        evaluation['king_safety_score'] = self._calculate_king_safety_score(board, perspective)
-        evaluation['center_control_score'] = self._calculate_center_control_score(board, perspective)
-        evaluation['development_score'] = self._calculate_development_score(board, perspective)
-        evaluation['attack_score'] = self._calculate_attack_score(board, perspective)
-        evaluation['defense_score'] = self._calculate_defense_score(board, perspective)
-        
-        # 计算总分（加权求和）
-        evaluation['total_score'] = (
-            evaluation['material_score'] * self.weights['material'] +
-            evaluation['position_score'] * self.weights['position'] +
-            evaluation['mobility_score'] * self.weights['mobility'] +
-            evaluation['king_safety_score'] * self.weights['king_safety'] +
-            evaluation['center_control_score'] * self.weights['center_control'] +
-            evaluation['development_score'] * self.weights['development'] +
-            evaluation['attack_score'] * self.weights['attack'] +
-            evaluation['defense_score'] * self.weights['defense']
-        )
+        # 总分为特征向量与权重向量的点积
+        evaluation['total_score'] = float(features @ self.weight_vector())
         
         # 计算胜率
         evaluation['win_probability'] = self._score_to_win_probability(evaluation['total_score'])
         
         return evaluation
     
-    def _calculate_material_score(self, board: List[List[Optional[str]]], 
-                                 perspective: str) -> float:
-        """计算子力分数
+    def evaluate_score(self, board: BoardLike, perspective: str = 'red') -> float:
+        """只计算加权总分（搜索叶节点使用，不构造评估字典）
         
         Args:
             board: 棋盘状态
             perspective: 评估视角
             
         Returns:
-            子力分数差值
+            总分，与evaluate_position()的total_score相同
         """
-        my_material = 0
-        opponent_material = 0
-        
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece is None:
-                    continue
-                
-                piece_value = self.piece_values.get(piece, 0)
-                
-                if perspective in piece:  # 我方棋子
-                    my_material += piece_value
-                else:  # 对方棋子
-                    opponent_material += piece_value
-        
-        return my_material - opponent_material
+        return float(self.extract_features(board, perspective) @ self.weight_vector())
     
-    def _calculate_position_score(self, board: List[List[Optional[str]]], 
-                                 perspective: str) -> float:
-        """计算位置分数
+    def evaluate_lazy(self, board: BoardLike, perspective: str = 'red',
+                      alpha: float = -math.inf, beta: float = math.inf) -> float:
+        """懒惰评估（搜索叶节点使用）
         
-        Args:
-            board: 棋盘状态
-            perspective: 评估视角
-            
-        Returns:
-            位置分数差值
-        """
-        my_position = 0
-        opponent_position = 0
-        
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece is None:
-                    continue
-                
-                # 获取该棋子类型的位置价值表
-                if piece in self.position_values:
-                    position_value = self.position_values[piece][row][col]
-                    
-                    if perspective in piece:  # 我方棋子
-                        my_position += position_value
-                    else:  # 对方棋子
-                        opponent_position += position_value
-        
-        return my_position - opponent_position
-    
-    def _calculate_mobility_score(self, board: List[List[Optional[str]]], 
-                                 perspective: str) -> float:
-        """计算机动性分数（棋子的可走位置数量）
+        先只算子力、位置分（取CompactBoard增量维护的总和）和王安全分（只数王受到的攻击，不计算攻击表），
+        低于alpha或高于beta超过lazy_margin()时其余评估项已不可能改变搜索结果，直接返回该分数；
+        否则完整评估。缺少将帅的局面其余评估项没有上界，总是完整评估
         
         Args:
             board: 棋盘状态
             perspective: 评估视角
+            alpha: 搜索窗口下界（perspective视角）
+            beta: 搜索窗口上界（perspective视角）
             
         Returns:
-            机动性分数差值
+            总分，与evaluate_score()相差不超过lazy_margin()，窗口附近与evaluate_score()相同
         """
-        # 这里简化计算，实际应该计算每个棋子的合法走法数量
-        my_mobility = 0
-        opponent_mobility = 0
-        
-        # 基于棋子类型给予基础机动性分数
-        mobility_base = {
-            'king': 4, 'advisor': 4, 'elephant': 4,
-            'horse': 8, 'chariot': 14, 'cannon': 14, 'pawn': 3
-        }
-        
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece is None:
-                    continue
-                
-                # 简化的机动性计算
-                for piece_type, base_mobility in mobility_base.items():
-                    if piece_type in piece:
-                        if perspective in piece:
-                            my_mobility += base_mobility
-                        else:
-                            opponent_mobility += base_mobility
-                        break
-        
-        return (my_mobility - opponent_mobility) * 2
+        board = self._attached(as_compact(board))
+        if self.lazy_eval:
+            squares = board.squares
+            red_king = squares.find(RED | KING)
+            black_king = squares.find(BLACK | KING)
+            if red_king >= 0 and black_king >= 0:
+                weights = self.weights
+                safety = self._king_safety(board, red_king, RED) - self._king_safety(board, black_king, BLACK)
+                score = (board.material * weights['material'] + board.positional * weights['position'] +
+                         safety * 50 * weights['king_safety'])
+                if perspective != 'red':
+                    score = -score
+                margin = self.lazy_margin()
+                if score < alpha - margin or score > beta + margin:
+                    return score
+        return self.evaluate_score(board, perspective)
     
-    def _calculate_king_safety_score(self, board: List[List[Optional[str]]], 
-                                    perspective: str) -> float:
-        """计算王的安全性分数
+    @staticmethod
+    def _king_safety(board: CompactBoard, king: int, color: int) -> int:
+        """不计算攻击表的王安全分：九宫内己方非王棋子数和攻击王的对方棋子数，与extract_features()一致
         
         Args:
-            board: 棋盘状态
-            perspective: 评估视角
-            
-        Returns:
-            王安全性分数差值
-        """
-        my_safety = 0
-        opponent_safety = 0
-        
-        # 寻找双方的王
-        my_king_pos = None
-        opponent_king_pos = None
-        
-        my_king = f"{perspective}_king"
-        opponent_king = "black_king" if perspective == "red" else "red_king"
-        
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece == my_king:
-                    my_king_pos = (row, col)
-                elif piece == opponent_king:
-                    opponent_king_pos = (row, col)
-        
-        # 计算王周围的保护情况
-        if my_king_pos:
-            my_safety = self._evaluate_king_safety(board, my_king_pos, perspective)
-        
-        if opponent_king_pos:
-            opponent_perspective = "black" if perspective == "red" else "red"
-            opponent_safety = self._evaluate_king_safety(board, opponent_king_pos, opponent_perspective)
-        
-        return (my_safety - opponent_safety) * 50
-    
-    def _evaluate_king_safety(self, board: List[List[Optional[str]]], 
-                             king_pos: Tuple[int, int], color: str) -> float:
-        """评估特定王的安全性
-        
-        Args:
-            board: 棋盘状态
-            king_pos: 王的位置
+            board: 棋盘
+            king: 王所在的格子
             color: 王的颜色
-            
-        Returns:
-            安全性分数
         """
-        safety_score = 0
-        row, col = king_pos
-        
-        # 检查九宫内的保护情况
-        if color == "red":
-            palace_rows = range(7, 10)
-            palace_cols = range(3, 6)
-        else:
-            palace_rows = range(0, 3)
-            palace_cols = range(3, 6)
-        
-        # 计算九宫内己方棋子数量（保护力量）
+        squares = board.squares
         protectors = 0
-        for r in palace_rows:
-            for c in palace_cols:
-                piece = board[r][c]
-                if piece and color in piece and 'king' not in piece:
-                    protectors += 1
-        
-        safety_score += protectors * 20
-        
-        # 检查是否有对方攻击性棋子威胁王
-        threats = 0
-        opponent_color = "black" if color == "red" else "red"
-        
-        for r in range(10):
-            for c in range(9):
-                piece = board[r][c]
-                if piece and opponent_color in piece:
-                    if self._can_threaten_king(board, (r, c), king_pos, piece):
-                        threats += 1
-        
-        safety_score -= threats * 30
-        
-        return safety_score
+        for square in PALACE_SQUARES[color]:
+            code = squares[square]
+            if code & color and code & KIND_MASK != KING:
+                protectors += 1
+        attackers = count_attackers(squares, board.ranks, board.files, king, color ^ COLOR_MASK)
+        return protectors * 20 - attackers * 30
     
-    def _can_threaten_king(self, board: List[List[Optional[str]]], 
-                          piece_pos: Tuple[int, int], king_pos: Tuple[int, int], 
-                          piece: str) -> bool:
-        """检查棋子是否能威胁到王
+    def evaluate_batch(self, boards, perspective: str = 'red') -> Tuple[np.ndarray, np.ndarray]:
+        """用NumPy一次评估多个局面，结果与evaluate_score()一致
         
         Args:
-            board: 棋盘状态
-            piece_pos: 棋子位置
-            king_pos: 王的位置
-            piece: 棋子类型
-            
-        Returns:
-            是否能威胁到王
-        """
-        # 简化的威胁检测，这里只检查直接攻击
-        from_row, from_col = piece_pos
-        to_row, to_col = king_pos
-        
-        # 车和炮的直线威胁
-        if 'chariot' in piece or 'cannon' in piece:
-            if from_row == to_row or from_col == to_col:
-                return True
-        
-        # 马的威胁
-        elif 'horse' in piece:
-            row_diff = abs(to_row - from_row)
-            col_diff = abs(to_col - from_col)
-            if (row_diff == 2 and col_diff == 1) or (row_diff == 1 and col_diff == 2):
-                return True
-        
-        # 兵/卒的威胁
-        elif 'pawn' in piece:
-            if 'red' in piece:
-                if to_row == from_row - 1 and to_col == from_col:
-                    return True
-                elif from_row <= 4 and to_row == from_row and abs(to_col - from_col) == 1:
-                    return True
-            else:
-                if to_row == from_row + 1 and to_col == from_col:
-                    return True
-                elif from_row >= 5 and to_row == from_row and abs(to_col - from_col) == 1:
-                    return True
-        
-        return False
-    
-    def _calculate_center_control_score(self, board: List[List[Optional[str]]], 
-                                       perspective: str) -> float:
-        """计算中心控制分数
-        
-        Args:
-            board: 棋盘状态
+            boards: (N, 10, 9)的int8棋子编码数组，或CompactBoard/字符串棋盘的序列
             perspective: 评估视角
             
         Returns:
-            中心控制分数差值
+            Tuple[np.ndarray, np.ndarray]: (N个总分, N个胜率)
         """
-        # 定义中心区域（河界附近的重要位置）
-        center_positions = [
-            (4, 3), (4, 4), (4, 5),  # 河界上方
-            (5, 3), (5, 4), (5, 5)   # 河界下方
-        ]
-        
-        my_control = 0
-        opponent_control = 0
-        
-        for pos in center_positions:
-            row, col = pos
-            piece = board[row][col]
-            
-            if piece:
-                if perspective in piece:
-                    my_control += 15  # 占据中心位置的奖励
-                else:
-                    opponent_control += 15
+        scores = self.extract_features_batch(boards, perspective) @ self.weight_vector()
         
-        return my_control - opponent_control
+        low, high = WIN_PROBABILITY_RANGE
+        exponent = np.clip(-scores * WIN_PROBABILITY_SCALE, -700, 700)
+        probabilities = np.clip(1.0 / (1.0 + np.exp(exponent)), low, high)
+        return scores, probabilities
     
-    def _calculate_development_score(self, board: List[List[Optional[str]]], 
-                                    perspective: str) -> float:
-        """计算子力发展分数
+    def extract_features_batch(self, boards, perspective: str = 'red') -> np.ndarray:
+        """用NumPy一次计算多个局面的评估特征
+        
+        子力由np.bincount统计各编码的棋子数后与分值相乘，位置分按(编码, 格子)从位置价值表中取值，
+        攻击和防守用半场切片，走法数和王受到的攻击数由batch_attack_counts()查表得到。
+        结果与逐个局面的extract_features()一致
         
         Args:
-            board: 棋盘状态
+            boards: (N, 10, 9)的int8棋子编码数组，或CompactBoard/字符串棋盘的序列
             perspective: 评估视角
             
         Returns:
-            发展分数差值
+            (N, len(FEATURE_NAMES))的特征矩阵（perspective视角的差值）
         """
-        my_development = 0
-        opponent_development = 0
-        
-        # 检查子力是否离开了初始位置
-        initial_positions = self._get_initial_positions()
-        
-        for piece_type, positions in initial_positions.items():
-            if perspective in piece_type:
-                for pos in positions:
-                    row, col = pos
-                    if board[row][col] != piece_type:
-                        my_development += 10  # 子力发展奖励
-            else:
-                opposite_piece = piece_type.replace(perspective, "black" if perspective == "red" else "red")
-                if opposite_piece in initial_positions:
-                    for pos in initial_positions[opposite_piece]:
-                        row, col = pos
-                        if board[row][col] != opposite_piece:
-                            opponent_development += 10
-        
-        return my_development - opponent_development
+        if not isinstance(boards, np.ndarray):
+            boards = np.stack([as_compact(board).to_numpy() for board in boards]) if len(boards) else \
+                np.zeros((0, 10, 9), dtype=np.int8)
+        codes = boards.reshape(len(boards), BOARD_SQUARES).astype(np.intp)
+        count = len(codes)
+        if count == 0:
+            return np.zeros((0, len(FEATURE_NAMES)))
+        
+        squares = np.arange(BOARD_SQUARES)
+        signs = self._batch_signs[codes]
+        values = self._batch_values[codes]
+        red = signs > 0
+        black = signs < 0
+        
+        # 每个局面各编码的棋子数
+        counts = np.bincount(
+            (np.arange(count)[:, None] * CODE_COUNT + codes).ravel(), minlength=count * CODE_COUNT
+        ).reshape(count, CODE_COUNT)
+        
+        features = np.empty((count, len(FEATURE_NAMES)))
+        features[:, 0] = counts @ self._batch_signed_values
+        features[:, 1] = self._batch_signed_pst[codes, squares].sum(axis=1)
+        
+        # 双方走法数和王受到的攻击数由batch_attack_counts()查表得到
+        move_counts, king_attackers = batch_attack_counts(codes)
+        features[:, 2] = (move_counts[:, 0] - move_counts[:, 1]) * 2
+        
+        # 王安全：九宫内己方非王棋子数和攻击王的对方棋子数
+        safety = np.zeros(count)
+        for column, (color, sign, own) in enumerate(((RED, 1, red), (BLACK, -1, black))):
+            has_king = (codes == (color | KING)).any(axis=1)
+            palace = np.fromiter(PALACE_SQUARES[color], dtype=np.intp)
+            protectors = (own[:, palace] & self._batch_protector[codes[:, palace]]).sum(axis=1)
+            safety += sign * np.where(has_king, protectors * 20 - king_attackers[:, column] * 30, 0)
+        features[:, 3] = safety * 50
+        
+        center = np.fromiter(sorted(CENTER_SQUARES), dtype=np.intp)
+        features[:, 4] = signs[:, center].sum(axis=1) * 15
+        
+        # 发展：留在初始位置的棋子，黑方减红方
+        initial_codes = np.array(self._initial_codes)
+        undeveloped = -(signs * ((codes == initial_codes) & (initial_codes != 0))).sum(axis=1)
+        features[:, 5] = (self._initial_counts[RED] - self._initial_counts[BLACK] + undeveloped) * 10
+        
+        # 攻击和防守：黑方半场为格子0-44，红方半场为格子45-89
+        red_values = values * red
+        black_values = values * black
+        features[:, 6] = (red_values[:, :45].sum(axis=1) - black_values[:, 45:].sum(axis=1)) * 0.1
+        features[:, 7] = (red_values[:, 45:].sum(axis=1) - black_values[:, :45].sum(axis=1)) * 0.05
+        
+        return features if perspective == 'red' else -features
+    
+    def _attached(self, board: CompactBoard) -> CompactBoard:
+        """确保棋盘挂接的是本评估器的分值表，子力和位置分之后随走子增量更新"""
+        if board.value_tables is not self._value_tables:
+            board.attach_value_tables(self._value_tables)
+        return board
     
     def _get_initial_positions(self) -> Dict[str, List[Tuple[int, int]]]:
         """获取棋子的初始位置
@@ -548,84 +569,6 @@ class PositionEvaluator:
             'black_pawn': [(3, 0), (3, 2), (3, 4), (3, 6), (3, 8)]
         }
     
-    def _calculate_attack_score(self, board: List[List[Optional[str]]], 
-                               perspective: str) -> float:
-        """计算攻击分数
-        
-        Args:
-            board: 棋盘状态
-            perspective: 评估视角
-            
-        Returns:
-            攻击分数差值
-        """
-        # 简化的攻击分数计算
-        # 主要考虑子力向对方半场的渗透程度
-        
-        my_attack = 0
-        opponent_attack = 0
-        
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece is None:
-                    continue
-                
-                if perspective in piece:
-                    # 我方棋子深入对方半场的奖励
-                    if perspective == "red" and row <= 4:
-                        my_attack += self.piece_values[piece] * 0.1
-                    elif perspective == "black" and row >= 5:
-                        my_attack += self.piece_values[piece] * 0.1
-                else:
-                    # 对方棋子深入我方半场的威胁
-                    if perspective == "red" and row >= 5:
-                        opponent_attack += self.piece_values[piece] * 0.1
-                    elif perspective == "black" and row <= 4:
-                        opponent_attack += self.piece_values[piece] * 0.1
-        
-        return my_attack - opponent_attack
-    
-    def _calculate_defense_score(self, board: List[List[Optional[str]]], 
-                                perspective: str) -> float:
-        """计算防守分数
-        
-        Args:
-            board: 棋盘状态  
-            perspective: 评估视角
-            
-        Returns:
-            防守分数差值
-        """
-        # 简化的防守分数计算
-        # 主要考虑己方半场的子力密度
-        
-        my_defense = 0
-        opponent_defense = 0
-        
-        for row in range(10):
-            for col in range(9):
-                piece = board[row][col]
-                if piece is None:
-                    continue
-                
-                piece_value = self.piece_values.get(piece, 0)
-                
-                if perspective in piece:
-                    # 我方子力在己方半场的防守价值
-                    if perspective == "red" and row >= 5:
-                        my_defense += piece_value * 0.05
-                    elif perspective == "black" and row <= 4:
-                        my_defense += piece_value * 0.05
-                else:
-                    # 对方子力在其半场的防守价值
-                    if perspective == "red" and row <= 4:
-                        opponent_defense += piece_value * 0.05
-                    elif perspective == "black" and row >= 5:
-                        opponent_defense += piece_value * 0.05
-        
-        return my_defense - opponent_defense
-    
     def _score_to_win_probability(self, score: float) -> float:
         """将评估分数转换为胜率百分比
         
@@ -639,18 +582,19 @@ class PositionEvaluator:
         # 分数越高胜率越高，使用合适的缩放因子
         
         # 缩放因子，可以调整以获得合适的胜率范围
-        scale_factor = 0.002
+        scale_factor = WIN_PROBABILITY_SCALE
         
         # Sigmoid函数: 1 / (1 + e^(-x))
         probability = 1.0 / (1.0 + math.exp(-score * scale_factor))
         
         # 确保胜率在合理范围内
-        probability = max(0.01, min(0.99, probability))
+        low, high = WIN_PROBABILITY_RANGE
+        probability = max(low, min(high, probability))
         
         return probability
     
-    def compare_positions(self, board1: List[List[Optional[str]]], 
-                         board2: List[List[Optional[str]]], 
+    def compare_positions(self, board1: BoardLike, 
+                         board2: BoardLike, 
                          perspective: str = 'red') -> Dict[str, any]:
         """比较两个局面的优劣
         
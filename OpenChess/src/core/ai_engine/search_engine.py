@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索引擎模块
+在紧凑棋盘上进行Alpha-Beta（Negamax形式）迭代加深搜索，返回最佳走法及预计变化。
+每次分析受思考时间和节点数预算约束，超出预算时返回最后一轮完整搜索的结果。
+置换表在多次搜索之间保留，连续扫描的相近局面可以复用之前的结果。
+走法排序依次为置换表走法、按MVV-LVA排列的吃子、杀手走法和历史启发分数高的走法。
+叶子节点进入只搜吃子的静态搜索，避免在兑子中途评估局面
+"""
+
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from .compact_board import CompactBoard, COLOR_MASK, COLOR_NAMES, CODE_COUNT, KING, PIECE_CODES
+from .move_generator import generate_moves
+from .position_evaluator import PositionEvaluator
+from .transposition_table import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+from ...utils.config import (
+    AI_SEARCH_DEPTH, AI_THINKING_TIME, AI_NODE_LIMIT, AI_HASH_SIZE_MB,
+    AI_QUIESCENCE_DEPTH, AI_QUIESCENCE_CHECKS, AI_DELTA_MARGIN,
+)
+
+# 将死分数，减去层数后仍远大于任何局面评估分
+MATE_SCORE = 100000
+INFINITY = 1000000
+
+# 分数绝对值超过此值表示已搜到杀棋
+MATE_THRESHOLD = MATE_SCORE - 1000
+
+# 杀手走法表的最大层数
+MAX_PLY = 64
+
+# 走法排序的分数段：置换表走法 > 吃子 > 杀手走法 > 历史启发
+_HASH_MOVE_ORDER = 1 << 60
+_CAPTURE_ORDER = 1 << 40
+_KILLER_ORDER = 1 << 30
+# 历史启发分数的上限，超过后整体减半
+_HISTORY_LIMIT = 1 << 20
+# 打包走法的取值范围
+_MOVE_SPACE = 1 << 15
+
+
+class SearchAborted(Exception):
+    """搜索超出时间或节点预算，或被外部停止"""
+    pass
+
+
+class RootMove(NamedTuple):
+    """根节点走法的搜索结果"""
+    move: int            # encode_move()打包的走法
+    score: float         # 走法方视角的分数
+    line: List[int]      # 预计变化（从该走法开始）
+
+
+class SearchResult(NamedTuple):
+    """搜索结果"""
+    best_move: Optional[int]      # 最佳走法，无子可走时为None
+    score: float                  # 最佳走法的分数（走棋方视角）
+    depth: int                    # 完成的搜索深度
+    pv: List[int]                 # 主要变化
+    root_moves: List[RootMove]    # 根节点走法，按分数从高到低排列
+    nodes: int                    # 搜索的节点数
+    elapsed: float                # 耗时（秒）
+    aborted: bool = False         # 最后一轮搜索是否因预算耗尽而中止
+    cutoffs: int = 0              # 发生beta截断的节点数
+    first_move_cutoffs: int = 0   # 第一个走法即截断的节点数，占cutoffs的比例反映走法排序的质量
+
+
+class SearchEngine:
+    """Alpha-Beta迭代加深搜索引擎
+    
+    走法为伪合法走法，走后被将军的走法由下一层吃王判负，无子可走同样判负。
+    时间和节点预算不会中止深度1的一轮搜索，保证任何预算下都有走法可以推荐；
+    stop()的停止请求在任何一轮都立即生效，并一直保持到reset_stop()
+    """
+    
+    def __init__(self, evaluator: Optional[PositionEvaluator] = None, max_depth: int = AI_SEARCH_DEPTH,
+                 time_limit: float = AI_THINKING_TIME, node_limit: int = AI_NODE_LIMIT,
+                 hash_size_mb: float = AI_HASH_SIZE_MB):
+        """初始化搜索引擎
+        
+        Args:
+            evaluator: 局面评估器，None时新建
+            max_depth: 默认的最大搜索深度（层）
+            time_limit: 默认的思考时间（秒），0表示不限时
+            node_limit: 默认的节点数预算，0表示不限制
+            hash_size_mb: 置换表内存上限（MB），0表示不使用置换表
+        """
+        self.evaluator = evaluator or PositionEvaluator()
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.transposition_table = TranspositionTable(hash_size_mb) if hash_size_mb > 0 else None
+        
+        # 静态搜索：最多再搜的层数（0表示叶子节点直接评估）、是否在第一层搜将军走法、Delta剪枝余量
+        self.quiescence_depth = AI_QUIESCENCE_DEPTH
+        self.quiescence_checks = AI_QUIESCENCE_CHECKS
+        self.delta_margin = AI_DELTA_MARGIN
+        
+        # 每搜索这么多个节点检查一次时间（约几毫秒），限时搜索超出思考时间不超过一个间隔
+        self.check_interval = 256
+        
+        # 当前搜索的预算
+        self._deadline: Optional[float] = None
+        self._node_budget: Optional[int] = None
+        self._next_check = 0
+        self._abortable = False
+        self._stop_requested = False
+        
+        # 走法排序：每层两个杀手走法，历史启发分数按走棋方和走法索引
+        self._piece_values = [0] * CODE_COUNT
+        self._refresh_piece_values()
+        self._killers = [[0, 0] for _ in range(MAX_PLY)]
+        self._history = {color: [0] * _MOVE_SPACE for color in COLOR_NAMES}
+        
+        # 统计信息
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+    
+    def stop(self):
+        """请求停止搜索（可从其他线程调用），搜索返回已完成的结果
+        
+        请求一直有效，之后开始的搜索也立即返回，直到调用reset_stop()
+        """
+        self._stop_requested = True
+    
+    def reset_stop(self):
+        """清除停止请求（开始新的一次分析时调用）"""
+        self._stop_requested = False
+    
+    def clear_hash(self):
+        """清空置换表（如开始新对局时）"""
+        if self.transposition_table is not None:
+            self.transposition_table.clear()
+        for history in self._history.values():
+            history[:] = [0] * _MOVE_SPACE
+    
+    def search(self, board: CompactBoard, color: int, depth: Optional[int] = None,
+               multi_pv: int = 1, time_limit: Optional[float] = None,
+               node_limit: Optional[int] = None,
+               move_order: Optional[List[int]] = None) -> SearchResult:
+        """迭代加深搜索最佳走法
+        
+        依次完成深度1、2、3……的搜索，直到达到depth、预算耗尽或收到停止请求。
+        第一轮完成前被停止时没有根节点走法。搜索在board上原地走子和悔棋，返回时棋盘恢复原状
+        
+        Args:
+            board: 紧凑棋盘
+            color: 走棋方（RED或BLACK）
+            depth: 最大搜索深度，None时使用max_depth
+            multi_pv: 需要精确分数的根节点走法数，其余走法只保证分数不高于第multi_pv名
+            time_limit: 思考时间（秒），None时使用默认值，0表示不限时
+            node_limit: 节点数预算，None时使用默认值，0表示不限制
+            move_order: 第一轮根节点走法的搜索顺序，None时按置换表走法和排序规则排列
+        
+        Returns:
+            最后一轮完整搜索的结果
+        """
+        depth = max(1, depth or self.max_depth)
+        multi_pv = max(1, multi_pv)
+        time_limit = self.time_limit if time_limit is None else time_limit
+        node_limit = self.node_limit if node_limit is None else node_limit
+        
+        start_time = time.time()
+        start_ply = board.ply
+        self._deadline = start_time + time_limit if time_limit and time_limit > 0 else None
+        self._node_budget = node_limit if node_limit and node_limit > 0 else None
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self._next_check = self._schedule_check()
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        
+        self._refresh_piece_values()
+        
+        # 杀手走法只对当前局面有效；历史启发分数保留一半，连续扫描时仍有参考价值
+        for killers in self._killers:
+            killers[0] = killers[1] = 0
+        self._age_history()
+        
+        completed_depth = 0
+        root_moves: List[RootMove] = []
+        aborted = False
+        
+        for current_depth in range(1, depth + 1):
+            if self._stop_requested:
+                aborted = True
+                break
+            
+            # 第一轮不因时间和节点预算中止
+            self._abortable = completed_depth > 0
+            try:
+                # 按上一轮的结果排列根节点走法，最佳走法最先搜索
+                previous_order = [root_move.move for root_move in root_moves] or move_order
+                iteration = self._search_root(board, color, current_depth, multi_pv, previous_order)
+            except SearchAborted:
+                aborted = True
+                break
+            finally:
+                # 中止或出现异常时撤销未撤销的走法，保证棋盘不被破坏
+                while board.ply > start_ply:
+                    board.unmake_move()
+            
+            completed_depth = current_depth
+            root_moves = iteration
+            
+            # 已搜到杀棋或无子可走，加深没有意义
+            if not root_moves or abs(root_moves[0].score) >= MATE_THRESHOLD:
+                break
+            
+            # 下一轮通常比已用时间的总和还长，剩余时间不足一半时不再开始
+            if self._deadline is not None and time.time() - start_time > time_limit / 2:
+                break
+        
+        best = root_moves[0] if root_moves else None
+        return SearchResult(
+            best_move=best.move if best else None,
+            score=best.score if best else -MATE_SCORE,
+            depth=completed_depth,
+            pv=best.line if best else [],
+            root_moves=root_moves,
+            nodes=self.nodes,
+            elapsed=time.time() - start_time,
+            aborted=aborted,
+            cutoffs=self.cutoffs,
+            first_move_cutoffs=self.first_move_cutoffs
+        )
+    
+    def _refresh_piece_values(self):
+        """按评估器的piece_values重建MVV-LVA和Delta剪枝使用的棋子价值表"""
+        piece_values = self.evaluator.piece_values
+        for name, code in PIECE_CODES.items():
+            self._piece_values[code] = piece_values.get(name, 0)
+    
+    def _schedule_check(self) -> int:
+        """计算下一次检查预算时的节点数"""
+        next_check = self.nodes + self.check_interval
+        if self._node_budget is not None:
+            next_check = min(next_check, self._node_budget)
+        return next_check
+    
+    def _check_budget(self):
+        """检查停止请求、时间和节点预算，需要中止时抛出SearchAborted"""
+        self._next_check = self._schedule_check()
+        if self._stop_requested:
+            raise SearchAborted()
+        if not self._abortable:
+            return
+        if self._node_budget is not None and self.nodes >= self._node_budget:
+            raise SearchAborted()
+        if self._deadline is not None and time.time() >= self._deadline:
+            raise SearchAborted()
+    
+    def _search_root(self, board: CompactBoard, color: int, depth: int, multi_pv: int,
+                     move_order: Optional[List[int]] = None) -> List[RootMove]:
+        """搜索根节点的每个走法
+        
+        窗口下界取当前第multi_pv名的分数，前multi_pv名的分数都是精确值
+        
+        Args:
+            board: 紧凑棋盘
+            color: 走棋方
+            depth: 搜索深度
+            multi_pv: 需要精确分数的走法数
+            move_order: 根节点走法的搜索顺序，None时按走法排序规则排列
+        
+        Returns:
+            List[RootMove]: 按分数从高到低排列的根节点走法
+        """
+        opponent = color ^ COLOR_MASK
+        results: List[RootMove] = []
+        
+        if not move_order:
+            hash_move = 0
+            if self.transposition_table is not None:
+                entry = self.transposition_table.probe(board.hash_key(color))
+                if entry is not None:
+                    hash_move = entry.move
+            move_order = self._order_moves(board.squares, generate_moves(board, color),
+                                           color, hash_move, 0)
+        
+        for move in move_order:
+            if len(results) >= multi_pv:
+                alpha = results[multi_pv - 1].score
+            else:
+                alpha = -INFINITY
+            
+            board.make_move(move)
+            score, line = self._negamax(board, opponent, depth - 1, -INFINITY, -alpha, 1)
+            board.unmake_move()
+            
+            results.append(RootMove(move, -score, [move] + line))
+            results.sort(key=lambda root_move: root_move.score, reverse=True)
+        
+        return results
+    
+    def _negamax(self, board: CompactBoard, color: int, depth: int,
+                 alpha: float, beta: float, ply: int) -> Tuple[float, List[int]]:
+        """Negamax形式的Alpha-Beta搜索
+        
+        Args:
+            board: 紧凑棋盘
+            color: 走棋方
+            depth: 剩余深度
+            alpha: 窗口下界
+            beta: 窗口上界
+            ply: 距根节点的层数
+        
+        Returns:
+            Tuple[float, List[int]]: (走棋方视角的分数, 主要变化)
+        """
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._check_budget()
+        squares = board.squares
+        
+        # 王已被吃：上一步的走法方获胜，层数越少越好
+        if squares.find(color | KING) < 0:
+            return -MATE_SCORE + ply, []
+        
+        if depth <= 0:
+            return self._quiescence(board, color, alpha, beta, ply, 0)
+        
+        table = self.transposition_table
+        hash_move = 0
+        if table is not None:
+            key = board.hash_key(color)
+            entry = table.probe(key)
+            if entry is not None:
+                hash_move = entry.move
+                if entry.depth >= depth:
+                    score = _score_from_table(entry.score, ply)
+                    if (entry.bound == BOUND_EXACT
+                            or (entry.bound == BOUND_LOWER and score >= beta)
+                            or (entry.bound == BOUND_UPPER and score <= alpha)):
+                        return score, [hash_move] if hash_move else []
+        
+        moves = generate_moves(board, color)
+        if not moves:
+            # 无子可走判负
+            return -MATE_SCORE + ply, []
+        
+        moves = self._order_moves(squares, moves, color, hash_move, ply)
+        
+        opponent = color ^ COLOR_MASK
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_line: List[int] = []
+        
+        for index, move in enumerate(moves):
+            captured = board.make_move(move)
+            score, line = self._negamax(board, opponent, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            score = -score
+            
+            if score > best_score:
+                best_score = score
+                best_line = [move] + line
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if index == 0:
+                            self.first_move_cutoffs += 1
+                        if not captured:
+                            self._record_quiet_cutoff(color, move, depth, ply)
+                        break
+        
+        if table is not None:
+            if best_score >= beta:
+                bound = BOUND_LOWER
+            elif best_score > original_alpha:
+                bound = BOUND_EXACT
+            else:
+                bound = BOUND_UPPER
+            table.store(key, depth, bound, _score_to_table(best_score, ply), best_line[0])
+        
+        return best_score, best_line
+    
+    def _quiescence(self, board: CompactBoard, color: int, alpha: float, beta: float,
+                    ply: int, qdepth: int) -> Tuple[float, List[int]]:
+        """静态搜索：只搜吃子（可选第一层的将军走法），直到局面平静
+        
+        走棋方可以不吃子，以静态评估分作为下界（stand pat）；
+        吃子后即使加上delta_margin也达不到alpha的走法不搜（Delta剪枝）。
+        搜索层数受quiescence_depth限制
+        
+        Args:
+            board: 紧凑棋盘
+            color: 走棋方
+            alpha: 窗口下界
+            beta: 窗口上界
+            ply: 距根节点的层数
+            qdepth: 已进入静态搜索的层数
+        
+        Returns:
+            Tuple[float, List[int]]: (走棋方视角的分数, 主要变化)
+        """
+        if qdepth:
+            self.nodes += 1
+            if self.nodes >= self._next_check:
+                self._check_budget()
+            if board.squares.find(color | KING) < 0:
+                return -MATE_SCORE + ply, []
+        
+        stand_pat = self._evaluate(board, color, alpha, beta)
+        if stand_pat >= beta or qdepth >= self.quiescence_depth:
+            return stand_pat, []
+        if stand_pat > alpha:
+            alpha = stand_pat
+        
+        squares = board.squares
+        values = self._piece_values
+        moves = generate_moves(board, color)
+        captures = [move for move in moves if squares[move & 0xFF]]
+        if self.quiescence_checks and qdepth == 0:
+            captures.extend(move for move in moves if not squares[move & 0xFF] and self._gives_check(board, move, color))
+        
+        opponent = color ^ COLOR_MASK
+        best_score = stand_pat
+        best_line: List[int] = []
+        
+        for move in self._order_moves(squares, captures, color, 0, ply):
+            victim = squares[move & 0xFF]
+            # Delta剪枝：吃掉这个子也追不上alpha
+            if victim and stand_pat + values[victim] + self.delta_margin <= alpha:
+                continue
+            
+            board.make_move(move)
+            score, line = self._quiescence(board, opponent, -beta, -alpha, ply + 1, qdepth + 1)
+            board.unmake_move()
+            score = -score
+            
+            if score > best_score:
+                best_score = score
+                best_line = [move] + line
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        
+        return best_score, best_line
+    
+    def _gives_check(self, board: CompactBoard, move: int, color: int) -> bool:
+        """走法走后是否将军对方"""
+        board.make_move(move)
+        try:
+            king = board.squares.find((color ^ COLOR_MASK) | KING)
+            return king >= 0 and any(
+                reply & 0xFF == king for reply in generate_moves(board, color)
+            )
+        finally:
+            board.unmake_move()
+    
+    def _order_moves(self, squares: bytearray, moves: List[int], color: int,
+                     hash_move: int, ply: int) -> List[int]:
+        """按截断的可能性从大到小排列走法
+        
+        置换表走法最先，其次是吃子（先吃价值高的棋子，同一被吃棋子先用价值低的棋子吃），
+        然后是本层的杀手走法，其余不吃子的走法按历史启发分数排列
+        
+        Args:
+            squares: 棋盘编码
+            moves: 打包的走法列表
+            color: 走棋方
+            hash_move: 置换表中的最佳走法，没有时为0
+            ply: 距根节点的层数
+        
+        Returns:
+            排列后的走法列表
+        """
+        values = self._piece_values
+        history = self._history[color]
+        killer1, killer2 = self._killers[ply] if ply < MAX_PLY else (0, 0)
+        
+        keys = []
+        for move in moves:
+            victim = squares[move & 0xFF]
+            if move == hash_move:
+                keys.append(_HASH_MOVE_ORDER)
+            elif victim:
+                keys.append(_CAPTURE_ORDER + values[victim] * 65536 - values[squares[move >> 8]])
+            elif move == killer1:
+                keys.append(_KILLER_ORDER + 1)
+            elif move == killer2:
+                keys.append(_KILLER_ORDER)
+            else:
+                keys.append(history[move])
+        
+        order = sorted(range(len(moves)), key=keys.__getitem__, reverse=True)
+        return [moves[index] for index in order]
+    
+    def _record_quiet_cutoff(self, color: int, move: int, depth: int, ply: int):
+        """不吃子的走法发生截断时更新杀手走法和历史启发分数"""
+        if ply < MAX_PLY:
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        
+        history = self._history[color]
+        history[move] += depth * depth
+        if history[move] > _HISTORY_LIMIT:
+            self._age_history()
+    
+    def _age_history(self):
+        """历史启发分数整体减半"""
+        for color, history in self._history.items():
+            self._history[color] = [value >> 1 for value in history]
+    
+    def _evaluate(self, board: CompactBoard, color: int,
+                  alpha: float = -INFINITY, beta: float = INFINITY) -> float:
+        """走棋方视角的静态评估，子力悬殊、远在窗口之外时只算子力和位置分"""
+        return self.evaluator.evaluate_lazy(board, COLOR_NAMES[color], alpha, beta)
+
+
+def _score_to_table(score: float, ply: int) -> float:
+    """杀棋分数改为相对当前节点的步数后存入置换表"""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_table(score: float, ply: int) -> float:
+    """置换表中的杀棋分数还原为相对根节点的步数"""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+置换表模块
+按Zobrist哈希键缓存搜索结果（深度、边界类型、分数和最佳走法），
+同一局面再次出现时直接取用，连续两次扫描之间的分析结果也可以复用
+"""
+
+from array import array
+from typing import NamedTuple, Optional
+
+from ...utils.config import AI_HASH_SIZE_MB
+
+# 边界类型
+BOUND_EXACT = 1   # 精确值
+BOUND_LOWER = 2   # 下界（发生了beta截断）
+BOUND_UPPER = 3   # 上界（所有走法都不超过alpha）
+
+# 每个表项占用的字节数：哈希键、分数和打包信息各8字节
+ENTRY_BYTES = 24
+
+# 打包信息的布局：低16位为走法，其上依次为边界类型、深度和搜索代数
+_MOVE_MASK = 0xFFFF
+_BOUND_SHIFT = 16
+_DEPTH_SHIFT = 18
+_GENERATION_SHIFT = 26
+_FIELD_MASK = 0xFF
+
+
+class TTEntry(NamedTuple):
+    """置换表项"""
+    depth: int      # 搜索深度
+    bound: int      # 边界类型
+    score: float    # 分数（走棋方视角）
+    move: int       # 最佳走法，没有时为0
+
+
+class TranspositionTable:
+    """固定大小的置换表
+    
+    表项数为不超过内存上限的2的幂，哈希键的低位作为索引。
+    替换策略为深度优先：空位、旧搜索代数的表项或深度不大于新结果的表项才被覆盖
+    """
+    
+    def __init__(self, size_mb: float = AI_HASH_SIZE_MB):
+        """初始化置换表
+        
+        Args:
+            size_mb: 内存上限（MB）
+        """
+        max_entries = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.capacity = 1 << (max_entries.bit_length() - 1)
+        self.size_mb = size_mb
+        self._mask = self.capacity - 1
+        self._generation = 0
+        
+        self._keys = array('Q', [0]) * self.capacity
+        self._scores = array('d', [0.0]) * self.capacity
+        self._data = array('Q', [0]) * self.capacity
+        
+        # 统计信息
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+    
+    def clear(self):
+        """清空所有表项"""
+        self._keys = array('Q', [0]) * self.capacity
+        self._scores = array('d', [0.0]) * self.capacity
+        self._data = array('Q', [0]) * self.capacity
+        self._generation = 0
+        self.probes = self.hits = self.stores = 0
+    
+    def new_search(self):
+        """开始新一次搜索，之前的表项变为可被替换的旧表项"""
+        self._generation = (self._generation + 1) & _FIELD_MASK
+    
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """查找局面
+        
+        Args:
+            key: 局面哈希键（含走棋方）
+        
+        Returns:
+            命中的表项，未命中返回None
+        """
+        self.probes += 1
+        index = key & self._mask
+        if self._keys[index] != key:
+            return None
+        data = self._data[index]
+        if not data:
+            return None
+        
+        self.hits += 1
+        return TTEntry(
+            (data >> _DEPTH_SHIFT) & _FIELD_MASK,
+            (data >> _BOUND_SHIFT) & 0x03,
+            self._scores[index],
+            data & _MOVE_MASK
+        )
+    
+    def store(self, key: int, depth: int, bound: int, score: float, move: int):
+        """保存搜索结果
+        
+        Args:
+            key: 局面哈希键（含走棋方）
+            depth: 搜索深度
+            bound: 边界类型
+            score: 分数（走棋方视角）
+            move: 最佳走法，没有时为0
+        """
+        index = key & self._mask
+        data = self._data[index]
+        if data and ((data >> _GENERATION_SHIFT) & _FIELD_MASK) == self._generation:
+            # 同一次搜索的表项只被深度不小于它的结果替换
+            if depth < (data >> _DEPTH_SHIFT) & _FIELD_MASK:
+                return
+        
+        self._keys[index] = key
+        self._scores[index] = score
+        self._data[index] = (
+            (self._generation << _GENERATION_SHIFT)
+            | (min(depth, _FIELD_MASK) << _DEPTH_SHIFT)
+            | (bound << _BOUND_SHIFT)
+            | (move & _MOVE_MASK)
+        )
+        self.stores += 1
+    
+    def usage(self) -> float:
+        """当前搜索代数的表项所占比例（抽样前1000项）"""
+        sample = min(self.capacity, 1000)
+        used = sum(
+            1 for data in self._data[:sample]
+            if data and ((data >> _GENERATION_SHIFT) & _FIELD_MASK) == self._generation
+        )
+        return used / sample
@@ -8,16 +8,36 @@
 
 import cv2
 import numpy as np
-import pyautogui
 import pytesseract
 import time
 import os
 import json
+import shutil
 from PIL import Image, ImageDraw, ImageFont
 import threading
 from typing import Dict, List, Tuple, Optional
 import colorsys
 
+try:
+    import pyautogui
+except Exception:  # 无显示环境下导入pyautogui会失败，截图改由帧源提供
+    pyautogui = None
+
+from ..vision.frame_source import FrameSource, create_frame_source, crop_region
+from ..vision.change_detector import CellChangeDetector
+from ..vision.template_bank import TemplateBank
+from ..vision.image_utils import ImageUtils
+from ..vision.occupancy import EmptyCellClassifier
+from ..vision.color_map import BoardColorMap
+from ..vision.ocr_service import OCRService, TesseractRecognizer
+from ..vision.recognition_cache import RecognitionCache
+from ..vision.worker_pool import RecognitionPool
+from ...utils.config import (
+    RED_COLOR_RANGE, RED_COLOR_RANGE_ALT, BLACK_COLOR_RANGE,
+    RECOGNITION_CACHE_SIZE, RECOGNITION_CACHE_PATH,
+    RECOGNITION_WORKERS, RECOGNITION_WORKER_MODE
+)
+
 class AdvancedChessScanner:
     """中国象棋智能对弈助手 - 高级扫描器类
     
@@ -25,10 +45,17 @@ class AdvancedChessScanner:
     上方棋子识别为对手，下方棋子识别为玩家
     """
     
-    def __init__(self):
-        """初始化高级扫描器"""
+    def __init__(self, frame_source: Optional[FrameSource] = None):
+        """初始化高级扫描器
+        
+        Args:
+            frame_source: 截图使用的帧源，None表示按配置在首次截图时创建
+        """
         self.board_size = (9, 10)  # 中国象棋棋盘大小：9列10行
         
+        # 帧源（屏幕截图、图片回放或合成画面）
+        self.frame_source = frame_source
+        
         # 自定义扫描区域 (x, y, width, height)
         self.custom_scan_region = None
         
@@ -57,17 +84,12 @@ class AdvancedChessScanner:
             }
         }
         
-        # 颜色范围定义（HSV格式）
+        # 颜色范围定义（HSV格式），红色色调在0/180处环绕，使用两段范围
         self.color_ranges = {
-            'red': {
-                'lower': np.array([0, 100, 100]),
-                'upper': np.array([10, 255, 255])
-            },
-            'black': {
-                'lower': np.array([0, 0, 0]),
-                'upper': np.array([180, 255, 30])
-            }
+            'red': [RED_COLOR_RANGE, RED_COLOR_RANGE_ALT],
+            'black': [BLACK_COLOR_RANGE]
         }
+        self.color_ratio_threshold = 0.1  # 颜色像素比例超过此值才判定为该颜色
         
         # 棋盘位置映射
         self.board_positions = {}
@@ -85,6 +107,7 @@ class AdvancedChessScanner:
         
         # 模板图片路径
         self.template_dir = "chess_templates"
+        self.template_bank = TemplateBank()
         self.templates = {}
         self._ensure_template_dir()
         self._load_templates()
@@ -93,9 +116,50 @@ class AdvancedChessScanner:
         self.confidence_threshold = 0.7
         self.min_piece_size = 20
         
-        # OCR相关配置
-        self.ocr_available = False
-        self.chinese_ocr_available = False
+        # 单帧扫描：每次扫描只截图一次，再从同一帧中切出所有棋子图像
+        self.single_frame_capture = True
+        
+        # 空位预分类：根据棋盘背景快速排除空交叉点，跳过后续所有识别步骤
+        self.empty_detection = True
+        self.empty_classifier = EmptyCellClassifier()
+        
+        # 批量模板匹配：一次矩阵乘法完成所有格子与所有模板的匹配
+        self.batch_template_matching = True
+        
+        # 整盘颜色识别：整帧只做一次HSV转换，用积分图读出每格的红/黑像素比例
+        self.board_color_map = True
+        # 按颜色缩小模板范围：已知棋子颜色时只与该颜色的7个模板匹配
+        self.color_narrowing = True
+        
+        # 逐格变化检测：画面未变化的格子直接复用上一次的识别结果
+        self.change_detection = True
+        self.change_detector = CellChangeDetector()
+        self._last_board_region = None
+        
+        # 感知哈希识别缓存：同一外观的棋子（如移动到其他交叉点后）只需识别一次
+        self.recognition_cache_enabled = True
+        self.recognition_cache = RecognitionCache(RECOGNITION_CACHE_SIZE, path=RECOGNITION_CACHE_PATH)
+        
+        # 并行识别：逐格检查和OCR分块在工作池中并发执行，结果顺序与串行一致
+        self.recognition_pool = RecognitionPool(RECOGNITION_WORKERS, RECOGNITION_WORKER_MODE)
+        self.ocr_chunk_size = 8  # 并行OCR时每次调用的最少格子数
+        
+        # 最近一次扫描的统计信息
+        self.last_scan_stats = {'recognized': 0, 'reused': 0, 'empty': 0, 'cached': 0}
+    
+    @property
+    def templates(self) -> Dict[str, np.ndarray]:
+        """已加载的棋子模板 {模板名称: BGR图像}"""
+        return self._templates
+    
+    @templates.setter
+    def templates(self, templates: Dict[str, np.ndarray]):
+        self._templates = templates
+        self.template_bank.set_templates(templates)
+        
+        # 模板变化后缓存的识别结果可能不再正确
+        if getattr(self, 'recognition_cache', None) is not None:
+            self.recognition_cache.clear()
     
     def set_scan_region(self, region: Optional[Tuple[int, int, int, int]]):
         """设置扫描区域
@@ -114,8 +178,22 @@ class AdvancedChessScanner:
         else:
             self.custom_scan_region = region
     
+    @property
+    def ocr_available(self) -> bool:
+        """OCR是否可用（首次访问时探测语言包）"""
+        return self.ocr_service.available
+    
+    @property
+    def chinese_ocr_available(self) -> bool:
+        """中文OCR是否可用"""
+        return getattr(self.ocr_service.recognizer, 'language', None) == 'chi_sim'
+    
     def _configure_tesseract(self):
-        """配置Tesseract OCR"""
+        """配置Tesseract OCR
+        
+        只设置可执行文件路径并创建常驻的OCR服务，语言包在第一次需要OCR时才探测，
+        构造扫描器时不再启动tesseract进程
+        """
         try:
             # 尝试设置Tesseract路径
             possible_paths = [
@@ -133,34 +211,16 @@ class AdvancedChessScanner:
             if tesseract_path:
                 pytesseract.pytesseract.tesseract_cmd = tesseract_path
                 print(f"Tesseract路径设置为: {tesseract_path}")
-                
-                # 测试基本OCR功能
-                try:
-                    # 创建一个小测试图像
-                    import numpy as np
-                    from PIL import Image
-                    test_img = Image.fromarray(np.ones((50, 50), dtype=np.uint8) * 255)
-                    pytesseract.image_to_string(test_img, lang='eng')
-                    self.ocr_available = True
-                    print("英文OCR功能正常")
-                except Exception as e:
-                    print(f"英文OCR测试失败: {e}")
-                
-                # 测试中文OCR功能
-                try:
-                    pytesseract.image_to_string(test_img, lang='chi_sim')
-                    self.chinese_ocr_available = True
-                    print("中文OCR功能正常")
-                except Exception as e:
-                    print(f"中文OCR不可用: {e}")
-                    print("提示: 请安装中文语言包或使用模板匹配功能")
-            else:
+            elif shutil.which('tesseract') is None:
                 print("未找到Tesseract安装，OCR功能将不可用")
                 print("请从 https://github.com/UB-Mannheim/tesseract/wiki 下载安装Tesseract")
                 
         except Exception as e:
             print(f"配置Tesseract时出错: {e}")
         
+        # 批量OCR服务：每帧所有未识别的格子拼成一张图，只调用一次OCR
+        self.ocr_service = OCRService(TesseractRecognizer())
+        
     def _ensure_template_dir(self):
         """确保模板目录存在"""
         if not os.path.exists(self.template_dir):
@@ -185,18 +245,38 @@ class AdvancedChessScanner:
                         print(f"加载模板: {template_name}")
                 except Exception as e:
                     print(f"加载模板失败 {filename}: {e}")
+        
+        # 模板集合变化后重建模板库
+        self.template_bank.set_templates(self.templates)
+    
+    def set_recognition_workers(self, workers: int, mode: str = 'thread'):
+        """设置并行识别的工作者数量和类型
+        
+        Args:
+            workers: 工作者数量，0表示CPU核心数，1表示串行
+            mode: 'thread'（线程池）或'process'（OCR分块使用进程池）
+        """
+        self.recognition_pool.close()
+        self.recognition_pool = RecognitionPool(workers, mode)
+    
+    def set_frame_source(self, frame_source: Optional[FrameSource]):
+        """设置截图使用的帧源
+        
+        Args:
+            frame_source: 帧源，None表示按配置重新创建
+        """
+        self.frame_source = frame_source
     
     def capture_screen(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
-        """截取屏幕"""
+        """截取屏幕
+        
+        注意：帧源可能复用内部缓冲区，返回的图像在下一次截图前有效
+        """
         try:
-            if region:
-                screenshot = pyautogui.screenshot(region=region)
-            else:
-                screenshot = pyautogui.screenshot()
+            if self.frame_source is None:
+                self.frame_source = create_frame_source()
             
-            # 转换为OpenCV格式
-            screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-            return screenshot_cv
+            return self.frame_source.grab(region)
         except Exception as e:
             print(f"截图失败: {e}")
             return None
@@ -256,45 +336,50 @@ class AdvancedChessScanner:
         return None
     
     def detect_piece_color(self, piece_image: np.ndarray) -> Optional[str]:
-        """检测棋子颜色"""
+        """检测棋子颜色（单个棋子图像，整盘扫描时使用BoardColorMap）"""
         try:
             # 转换为HSV颜色空间
             hsv = cv2.cvtColor(piece_image, cv2.COLOR_BGR2HSV)
-            
-            # 检测红色
-            red_mask = cv2.inRange(hsv, self.color_ranges['red']['lower'], self.color_ranges['red']['upper'])
-            red_pixels = cv2.countNonZero(red_mask)
-            
-            # 检测黑色
-            black_mask = cv2.inRange(hsv, self.color_ranges['black']['lower'], self.color_ranges['black']['upper'])
-            black_pixels = cv2.countNonZero(black_mask)
-            
             total_pixels = piece_image.shape[0] * piece_image.shape[1]
             
-            # 计算颜色比例
-            red_ratio = red_pixels / total_pixels
-            black_ratio = black_pixels / total_pixels
-            
-            if red_ratio > 0.1:
-                return 'red'
-            elif black_ratio > 0.1:
-                return 'black'
+            # 依次检测红色（合并两段色调范围）和黑色
+            for color in ('red', 'black'):
+                pixels = 0
+                mask = None
+                for color_range in self.color_ranges[color]:
+                    range_mask = cv2.inRange(hsv, np.array(color_range['lower']), np.array(color_range['upper']))
+                    mask = range_mask if mask is None else cv2.bitwise_or(mask, range_mask)
+                if mask is not None:
+                    pixels = cv2.countNonZero(mask)
+                
+                # 计算颜色比例
+                if pixels / total_pixels > self.color_ratio_threshold:
+                    return color
             
             return None
         except Exception as e:
             print(f"颜色检测失败: {e}")
             return None
     
-    def template_match_piece(self, piece_image: np.ndarray) -> Optional[str]:
-        """使用模板匹配识别棋子"""
+    def template_match_piece(self, piece_image: np.ndarray, color: Optional[str] = None) -> Optional[str]:
+        """使用模板匹配识别棋子
+        
+        Args:
+            piece_image: 棋子图像
+            color: 已知的棋子颜色，指定时只与该颜色的模板匹配
+        """
+        return self._best_template_match(piece_image, color)[0]
+    
+    def _best_template_match(self, piece_image: np.ndarray, color: Optional[str] = None) -> Tuple[Optional[str], float]:
+        """逐个模板匹配，返回(最佳模板名称, 置信度)，未达到阈值时名称为None"""
         best_match = None
         best_confidence = 0
         
-        for template_name, template in self.templates.items():
+        # 从模板库获取已缩放到棋子图像尺寸的模板
+        prepared = self.template_bank.get((piece_image.shape[1], piece_image.shape[0]), color)
+        
+        for template_name, resized_template in zip(prepared.names, prepared.images):
             try:
-                # 调整模板大小
-                resized_template = cv2.resize(template, (piece_image.shape[1], piece_image.shape[0]))
-                
                 # 模板匹配
                 result = cv2.matchTemplate(piece_image, resized_template, cv2.TM_CCOEFF_NORMED)
                 confidence = np.max(result)
@@ -306,51 +391,70 @@ class AdvancedChessScanner:
             except Exception as e:
                 continue
         
-        return best_match
+        return best_match, float(best_confidence)
     
-    def ocr_recognize_piece(self, piece_image: np.ndarray) -> Optional[str]:
-        """使用OCR识别棋子"""
-        if not self.ocr_available:
-            return None
-            
-        try:
-            # 图像预处理
-            gray = cv2.cvtColor(piece_image, cv2.COLOR_BGR2GRAY)
-            
-            # 二值化
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # 转换为PIL图像
-            pil_image = Image.fromarray(binary)
-            
-            # OCR识别 - 根据可用语言包选择
-            text = ""
-            if self.chinese_ocr_available:
-                # 首选中文OCR
-                text = pytesseract.image_to_string(pil_image, lang='chi_sim', config='--psm 7')
-            elif self.ocr_available:
-                # 备用英文OCR（可能识别出拼音或形似字符）
-                text = pytesseract.image_to_string(pil_image, lang='eng', config='--psm 7')
-            
-            text = text.strip()
+    def template_match_batch(self, piece_images: Dict[Tuple[int, int], np.ndarray],
+                             colors: Optional[Dict[Tuple[int, int], Optional[str]]] = None) -> Dict[Tuple[int, int], Tuple[Optional[str], float]]:
+        """批量模板匹配
+        
+        把同尺寸的棋子图像堆叠为(N, h*w*3)矩阵，与模板库中的(T, h*w*3)矩阵
+        做一次矩阵乘法得到全部归一化互相关分数，结果与template_match_piece一致
+        
+        Args:
+            piece_images: {(row, col): 棋子图像}
+            colors: {(row, col): 棋子颜色}，已知颜色的格子只与该颜色的模板匹配
             
-            if text:
-                # 匹配棋子类型
-                result = self._match_piece_text(text)
-                if result:
-                    return result
+        Returns:
+            {(row, col): (棋子类型, 置信度)}，未达到置信度阈值时棋子类型为None
+        """
+        colors = colors or {}
+        
+        # 边缘格子可能被裁剪，按尺寸和颜色分组后分别匹配
+        groups: Dict[Tuple[Tuple[int, int], Optional[str]], List[Tuple[int, int]]] = {}
+        for position, piece_image in piece_images.items():
+            size = (piece_image.shape[1], piece_image.shape[0])
+            groups.setdefault((size, colors.get(position)), []).append(position)
+        
+        results = {}
+        for (size, color), positions in groups.items():
+            prepared = self.template_bank.get(size, color)
+            matches = ImageUtils.batch_template_match(
+                [piece_images[position] for position in positions],
+                prepared.images,
+                threshold=self.confidence_threshold,
+                template_vectors=prepared.vectors
+            )
             
-            return None
+            for position, (_, confidence, index) in zip(positions, matches):
+                # 与逐格匹配保持一致：置信度需严格大于阈值
+                if index >= 0 and confidence > self.confidence_threshold:
+                    results[position] = (prepared.names[index], confidence)
+                else:
+                    results[position] = (None, confidence)
+        
+        return results
+    
+    def ocr_recognize_piece(self, piece_image: np.ndarray) -> Optional[str]:
+        """使用OCR识别棋子"""
+        return self.ocr_recognize_batch({0: piece_image}).get(0)
+    
+    def ocr_recognize_batch(self, piece_images: Dict[Tuple[int, int], np.ndarray]) -> Dict[Tuple[int, int], Optional[str]]:
+        """批量OCR识别棋子
+        
+        所有棋子图像拼接成一张图后只调用一次OCR（中文语言包不可用时使用英文，
+        可能识别出拼音或形似字符）
+        
+        Args:
+            piece_images: {(row, col): 棋子图像}
             
-        except Exception as e:
-            if "chi_sim" in str(e):
-                print(f"中文OCR识别失败: {e}")
-                print("提示: 请安装中文语言包或使用模板匹配功能")
-                # 标记中文OCR不可用，避免重复错误
-                self.chinese_ocr_available = False
-            else:
-                print(f"OCR识别失败: {e}")
-            return None
+        Returns:
+            {(row, col): 棋子类型}，未识别出文字的格子不在结果中
+        """
+        if not piece_images:
+            return {}
+        
+        texts = self.recognition_pool.recognize_ocr(self.ocr_service, piece_images, self.ocr_chunk_size)
+        return {position: self._match_piece_text(text) for position, text in texts.items()}
     
     def _match_piece_text(self, text: str) -> Optional[str]:
         """匹配识别文本到棋子类型"""
@@ -390,20 +494,79 @@ class AdvancedChessScanner:
         
         return None
     
-    def recognize_piece(self, piece_image: np.ndarray) -> Optional[str]:
-        """综合识别棋子"""
+    def recognize_piece(self, piece_image: np.ndarray, color: Optional[str] = None) -> Optional[str]:
+        """综合识别棋子
+        
+        Args:
+            piece_image: 棋子图像
+            color: 已知的棋子颜色（如整盘颜色识别的结果），None时按需检测
+        """
+        # 空位预判：校准后的空交叉点无需进行任何识别
+        if self.empty_detection and self.empty_classifier.is_empty(piece_image):
+            return None
+        
+        # 先确定颜色，模板匹配只需比较该颜色的模板，缓存键也需要区分颜色
+        if color is None and (self.color_narrowing or self.recognition_cache_enabled):
+            color = self.detect_piece_color(piece_image)
+        
+        # 识别过的棋子外观直接使用缓存结果
+        cache_key = None
+        if self.recognition_cache_enabled:
+            cache_key = self.recognition_cache.make_key(piece_image, color)
+            cached = self.recognition_cache.get(cache_key)
+            if cached is not None:
+                return cached[0]
+        
+        piece_type, confidence = self._recognize_uncached(piece_image, color)
+        if cache_key is not None:
+            self._cache_result(cache_key, piece_type, confidence)
+        return piece_type
+    
+    def _recognize_uncached(self, piece_image: np.ndarray, color: Optional[str] = None) -> Tuple[Optional[str], float]:
+        """不经过缓存的完整识别流程
+        
+        Returns:
+            (棋子类型, 置信度)，OCR和颜色检测的结果没有置信度，记为0
+        """
         # 方法1: 模板匹配
-        template_result = self.template_match_piece(piece_image)
+        template_result, confidence = self._best_template_match(piece_image, color if self.color_narrowing else None)
         if template_result:
-            return template_result
+            return template_result, confidence
+        
+        return self._recognize_without_template(piece_image, color), 0.0
+    
+    def _cache_result(self, cache_key: str, piece_type: Optional[str], confidence: float):
+        """缓存模板匹配或OCR的识别结果
+        
+        只能确定颜色的通用标识（如red_piece）不缓存，模板补齐后仍有机会被正确识别
+        """
+        if piece_type and not piece_type.endswith('_piece'):
+            self.recognition_cache.put(cache_key, piece_type, confidence)
+    
+    def _recognize_without_template(self, piece_image: np.ndarray, color: Optional[str] = None) -> Optional[str]:
+        """模板匹配失败后的识别（OCR识别，再以颜色检测兜底）
         
+        Args:
+            piece_image: 棋子图像
+            color: 已知的棋子颜色，None时重新检测
+        """
         # 方法2: OCR识别
         ocr_result = self.ocr_recognize_piece(piece_image)
         if ocr_result:
             return ocr_result
         
+        return self._recognize_by_color(piece_image, color)
+    
+    def _recognize_by_color(self, piece_image: np.ndarray, color: Optional[str] = None) -> Optional[str]:
+        """只能确定颜色时返回通用棋子标识
+        
+        Args:
+            piece_image: 棋子图像
+            color: 已知的棋子颜色，None时重新检测
+        """
         # 方法3: 颜色检测（作为辅助）
-        color = self.detect_piece_color(piece_image)
+        if color is None:
+            color = self.detect_piece_color(piece_image)
         if color:
             # 如果只检测到颜色，返回通用标识
             return f"{color}_piece"
@@ -416,7 +579,22 @@ class AdvancedChessScanner:
         if self.custom_scan_region:
             # 使用自定义区域
             board_region = self.custom_scan_region
-            screenshot = self.capture_screen(board_region)
+            x, y, w, h = board_region
+            cell_width, cell_height = w // 9, h // 10
+            
+            if self.single_frame_capture:
+                # 单帧模式：向左上扩展1/4格，使边线上交叉点的棋子区域也落在同一帧内
+                frame_origin = (max(0, x - cell_width // 4), max(0, y - cell_height // 4))
+                capture_region = (
+                    frame_origin[0],
+                    frame_origin[1],
+                    x + w - frame_origin[0],
+                    y + h - frame_origin[1]
+                )
+                screenshot = self.capture_screen(capture_region)
+            else:
+                frame_origin = (x, y)
+                screenshot = self.capture_screen(board_region)
         else:
             # 全屏截图并检测棋盘
             screenshot = self.capture_screen()
@@ -428,21 +606,229 @@ class AdvancedChessScanner:
             if board_region is None:
                 print("未检测到棋盘，使用默认区域")
                 board_region = (100, 100, 540, 600)
+            
+            # 只保留棋盘（含边线上的棋子）所在区域，后续的颜色统计无需处理整屏
+            x, y, w, h = board_region
+            frame_origin = (max(0, x - (w // 9) // 4), max(0, y - (h // 10) // 4))
+            screenshot = crop_region(screenshot, (
+                frame_origin[0],
+                frame_origin[1],
+                x + w - frame_origin[0],
+                y + h - frame_origin[1]
+            ))
         
         if screenshot is None:
             return self.current_board
         
-        # 获取棋盘图像
-        if self.custom_scan_region:
-            # 自定义区域时，screenshot已经是棋盘区域
-            board_image = screenshot
+        # 更新棋盘位置映射
+        cell_width, cell_height = self._update_board_positions(board_region)
+        
+        # 棋盘区域或格子大小变化后，缓存的格子指纹和按尺寸缩放的模板全部失效
+        if board_region != self._last_board_region:
+            self.change_detector.reset()
+            self.template_bank.invalidate()
+            self.empty_classifier.reset()
+            self._last_board_region = board_region
+        
+        # 用棋盘自身的背景校准空位分类器
+        if self.empty_detection and not self.empty_classifier.calibrated:
             x, y, w, h = board_region
+            board_image = crop_region(screenshot, (x - frame_origin[0], y - frame_origin[1], w, h))
+            if board_image.size > 0:
+                self.empty_classifier.calibrate(board_image)
+        
+        # 提取每个位置的棋子图像
+        color_frame = None
+        piece_bounds = None
+        if self.single_frame_capture:
+            # 单帧模式：所有棋子图像都是同一帧的视图，避免逐格截图和走子过程中的画面撕裂
+            piece_bounds = self._get_piece_bounds(screenshot.shape, frame_origin, cell_width, cell_height)
+            piece_images = {
+                position: screenshot[top:bottom, left:right]
+                for position, (left, top, right, bottom) in piece_bounds.items()
+            }
+            color_frame = screenshot
         else:
-            # 全屏扫描时，需要从截图中提取棋盘区域
-            x, y, w, h = board_region
-            board_image = screenshot[y:y+h, x:x+w]
+            # 逐格截图模式（兼容旧行为）
+            piece_images = {}
+            for (row, col) in self.board_positions:
+                piece_region = self._get_piece_region(row, col, cell_width, cell_height)
+                piece_image = self.capture_screen(piece_region)
+                # 帧源可能复用缓冲区，逐格截图时需要保留副本
+                piece_images[(row, col)] = piece_image.copy() if piece_image is not None else None
         
-        # 更新棋盘位置映射
+        # 扫描每个位置
+        new_board = [[None for _ in range(9)] for _ in range(10)]
+        
+        for (row, col), piece_type in self._recognize_cells(piece_images, color_frame, piece_bounds).items():
+            new_board[row][col] = piece_type
+        
+        self.current_board = new_board
+        return new_board
+    
+    def _recognize_cells(self, piece_images: Dict[Tuple[int, int], np.ndarray],
+                         frame: Optional[np.ndarray] = None,
+                         piece_bounds: Optional[Dict[Tuple[int, int], Tuple[int, int, int, int]]] = None) -> Dict[Tuple[int, int], Optional[str]]:
+        """识别所有格子的棋子，画面未变化的格子复用上一次的结果
+        
+        Args:
+            piece_images: {(row, col): 棋子图像}
+            frame: 棋子图像所在的整帧，提供时整帧只做一次颜色统计
+            piece_bounds: {(row, col): 棋子图像在frame中的(left, top, right, bottom)}
+            
+        Returns:
+            {(row, col): 棋子类型}
+        """
+        results = {}
+        pending = {}
+        fingerprints = {}
+        empty = 0
+        
+        # 逐格检查（变化检测、空位判定）在工作池中并发执行，再按原顺序汇总
+        cells = [
+            (position, piece_image) for position, piece_image in piece_images.items()
+            if piece_image is not None and piece_image.size > 0
+        ]
+        for position, state, previous_type, fingerprint in self.recognition_pool.map(self._check_cell, cells):
+            if state == 'reused':
+                results[position] = previous_type
+                continue
+            
+            fingerprints[position] = fingerprint
+            
+            # 空位直接判定，不参与后续识别
+            if state == 'empty':
+                results[position] = None
+                if self.change_detection:
+                    self.change_detector.update(position, fingerprint, None)
+                empty += 1
+                continue
+            
+            pending[position] = piece_images[position]
+        
+        # 需要重新识别的格子先确定颜色
+        colors = self._detect_cell_colors(pending, frame, piece_bounds) if pending else {}
+        
+        # 外观与识别过的棋子相同的格子直接使用缓存结果
+        cache_keys = {}
+        cached = 0
+        if self.recognition_cache_enabled:
+            for position in list(pending):
+                cache_key = self.recognition_cache.make_key(pending[position], colors.get(position))
+                cached_result = self.recognition_cache.get(cache_key)
+                if cached_result is None:
+                    cache_keys[position] = cache_key
+                    continue
+                
+                results[position] = cached_result[0]
+                if self.change_detection:
+                    self.change_detector.update(position, fingerprints[position], cached_result[0])
+                del pending[position]
+                cached += 1
+        
+        # 其余格子统一做一次批量模板匹配
+        match_colors = colors if self.color_narrowing else None
+        template_results = self.template_match_batch(pending, match_colors) if self.batch_template_matching else {}
+        
+        # 模板匹配失败的格子拼成一张图统一OCR
+        ocr_results = {}
+        if self.batch_template_matching:
+            ocr_results = self.ocr_recognize_batch({
+                position: piece_image for position, piece_image in pending.items()
+                if template_results[position][0] is None
+            })
+        
+        # 逐格识别模式下每个格子的完整识别流程并发执行
+        uncached_results = {}
+        if not self.batch_template_matching:
+            positions = list(pending)
+            uncached_results = dict(zip(positions, self.recognition_pool.map(
+                lambda position: self._recognize_uncached(pending[position], colors.get(position)),
+                positions
+            )))
+        
+        for position, piece_image in pending.items():
+            color = colors.get(position)
+            if not self.batch_template_matching:
+                piece_type, confidence = uncached_results[position]
+            elif template_results[position][0]:
+                piece_type, confidence = template_results[position]
+            else:
+                piece_type = ocr_results.get(position) or self._recognize_by_color(piece_image, color)
+                confidence = 0.0
+            results[position] = piece_type
+            
+            if position in cache_keys:
+                self._cache_result(cache_keys[position], piece_type, confidence)
+            if self.change_detection:
+                self.change_detector.update(position, fingerprints[position], piece_type)
+        
+        recognized = len(pending) + empty + cached
+        self.last_scan_stats = {
+            'recognized': recognized,
+            'reused': len(results) - recognized,
+            'empty': empty,
+            'cached': cached
+        }
+        return results
+    
+    def _check_cell(self, cell: Tuple[Tuple[int, int], np.ndarray]) -> Tuple[Tuple[int, int], str, Optional[str], Optional[np.ndarray]]:
+        """检查单个格子是否需要识别（可在工作线程中执行，不修改共享状态）
+        
+        Args:
+            cell: ((row, col), 棋子图像)
+            
+        Returns:
+            ((row, col), 状态, 上次识别结果, 指纹)，状态为'reused'、'empty'或'pending'
+        """
+        position, piece_image = cell
+        
+        fingerprint = None
+        if self.change_detection:
+            unchanged, previous_type, fingerprint = self.change_detector.check(position, piece_image)
+            if unchanged:
+                return position, 'reused', previous_type, fingerprint
+        
+        if self.empty_detection and self.empty_classifier.is_empty(piece_image):
+            return position, 'empty', None, fingerprint
+        
+        return position, 'pending', None, fingerprint
+    
+    def _detect_cell_colors(self, piece_images: Dict[Tuple[int, int], np.ndarray],
+                            frame: Optional[np.ndarray] = None,
+                            piece_bounds: Optional[Dict[Tuple[int, int], Tuple[int, int, int, int]]] = None) -> Dict[Tuple[int, int], Optional[str]]:
+        """检测多个格子的棋子颜色
+        
+        有整帧时只做一次HSV转换并建立红/黑掩码积分图，每格颜色比例O(1)读出；
+        否则逐格调用detect_piece_color
+        
+        Args:
+            piece_images: {(row, col): 棋子图像}
+            frame: 棋子图像所在的整帧
+            piece_bounds: {(row, col): 棋子图像在frame中的(left, top, right, bottom)}
+            
+        Returns:
+            {(row, col): 棋子颜色}
+        """
+        if self.board_color_map and frame is not None and piece_bounds is not None:
+            color_map = BoardColorMap(frame, self.color_ranges)
+            return color_map.classify_cells(
+                {position: piece_bounds[position] for position in piece_images},
+                self.color_ratio_threshold
+            )
+        
+        return {position: self.detect_piece_color(piece_image) for position, piece_image in piece_images.items()}
+    
+    def _update_board_positions(self, board_region: Tuple[int, int, int, int]) -> Tuple[int, int]:
+        """根据棋盘区域更新交叉点位置映射
+        
+        Args:
+            board_region: 棋盘区域 (x, y, width, height)
+            
+        Returns:
+            (格子宽度, 格子高度)
+        """
+        x, y, w, h = board_region
         cell_width = w // 9
         cell_height = h // 10
         
@@ -452,28 +838,70 @@ class AdvancedChessScanner:
                 cell_y = y + row * cell_height
                 self.board_positions[(row, col)] = (cell_x, cell_y)
         
-        # 扫描每个位置
-        new_board = [[None for _ in range(9)] for _ in range(10)]
+        return cell_width, cell_height
+    
+    def _get_piece_region(self, row: int, col: int, 
+                          cell_width: int, cell_height: int) -> Tuple[int, int, int, int]:
+        """获取交叉点处棋子图像的屏幕区域 (x, y, width, height)"""
+        cell_x, cell_y = self.board_positions[(row, col)]
+        return (
+            cell_x - cell_width//4,
+            cell_y - cell_height//4,
+            cell_width//2,
+            cell_height//2
+        )
+    
+    def extract_piece_images(self, frame: np.ndarray, frame_origin: Tuple[int, int],
+                             cell_width: int, cell_height: int) -> Dict[Tuple[int, int], np.ndarray]:
+        """从单帧截图中切出所有交叉点的棋子图像
         
+        返回的图像均为frame的视图（不复制像素数据）
+        
+        Args:
+            frame: 棋盘所在的截图（BGR格式）
+            frame_origin: frame左上角对应的屏幕坐标 (x, y)
+            cell_width: 格子宽度
+            cell_height: 格子高度
+            
+        Returns:
+            {(row, col): 棋子图像} 字典，按行优先顺序排列
+        """
+        piece_bounds = self._get_piece_bounds(frame.shape, frame_origin, cell_width, cell_height)
+        return {
+            position: frame[top:bottom, left:right]
+            for position, (left, top, right, bottom) in piece_bounds.items()
+        }
+    
+    def _get_piece_bounds(self, frame_shape: Tuple[int, ...], frame_origin: Tuple[int, int],
+                          cell_width: int, cell_height: int) -> Dict[Tuple[int, int], Tuple[int, int, int, int]]:
+        """计算所有交叉点的棋子图像在帧内的范围
+        
+        Args:
+            frame_shape: 帧图像的shape
+            frame_origin: 帧左上角对应的屏幕坐标 (x, y)
+            cell_width: 格子宽度
+            cell_height: 格子高度
+            
+        Returns:
+            {(row, col): (left, top, right, bottom)}，已裁剪到帧范围内
+        """
+        origin_x, origin_y = frame_origin
+        frame_height, frame_width = frame_shape[:2]
+        
+        piece_bounds = {}
         for row in range(10):
             for col in range(9):
-                cell_x, cell_y = self.board_positions[(row, col)]
+                px, py, pw, ph = self._get_piece_region(row, col, cell_width, cell_height)
                 
-                # 提取棋子图像
-                piece_region = (
-                    cell_x - cell_width//4,
-                    cell_y - cell_height//4,
-                    cell_width//2,
-                    cell_height//2
-                )
+                # 转换为帧内坐标并裁剪到帧范围内
+                left = min(max(px - origin_x, 0), frame_width)
+                top = min(max(py - origin_y, 0), frame_height)
+                right = min(max(px - origin_x + pw, 0), frame_width)
+                bottom = min(max(py - origin_y + ph, 0), frame_height)
                 
-                piece_image = self.capture_screen(piece_region)
-                if piece_image is not None and piece_image.size > 0:
-                    piece_type = self.recognize_piece(piece_image)
-                    new_board[row][col] = piece_type
+                piece_bounds[(row, col)] = (left, top, right, bottom)
         
-        self.current_board = new_board
-        return new_board
+        return piece_bounds
     
     def get_board_state(self) -> List[List[Optional[str]]]:
         """获取当前棋盘状态，供AI助手分析使用
@@ -558,15 +986,17 @@ class AdvancedChessScanner:
             piece_region = (pos[0]-30, pos[1]-30, 60, 60)
             piece_image = self.capture_screen(piece_region)
             
-            if piece_image is not None:
+            if piece_image is not None and piece_image.size > 0:
                 # 保存模板
                 template_path = os.path.join(self.template_dir, f"{piece_name}.png")
                 success = cv2.imwrite(template_path, piece_image)
                 
                 if success:
                     print(f"模板已保存: {template_path}")
-                    # 重新加载模板
+                    # 重新加载模板，已缓存的识别结果需要重新识别
                     self._load_templates()
+                    self.change_detector.reset()
+                    self.recognition_cache.clear()
                     return True
                 else:
                     raise Exception("保存模板图片失败")
@@ -627,6 +1057,19 @@ class AdvancedChessScanner:
                 
         except KeyboardInterrupt:
             print("\n扫描已停止")
+        finally:
+            self.save_recognition_cache()
+    
+    def save_recognition_cache(self, path: Optional[str] = None) -> bool:
+        """保存识别缓存，供下次启动时直接复用
+        
+        Args:
+            path: 保存路径，None时使用配置的RECOGNITION_CACHE_PATH（未配置时不保存）
+        
+        Returns:
+            bool: 是否保存成功
+        """
+        return self.recognition_cache.save(path)
 
 def main():
     """主函数 - 高级扫描器演示
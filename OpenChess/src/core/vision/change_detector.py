@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+格子变化检测 - Cell Change Detection
+为每个交叉点保存缩小的灰度指纹，画面未变化的格子直接复用上一次的识别结果
+"""
+
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class CellChangeDetector:
+    """逐格变化检测器
+    
+    指纹为缩小到固定尺寸的灰度图，与上一次识别时保存的指纹计算平均绝对差（MAD），
+    小于阈值即认为该格画面没有变化
+    """
+    
+    def __init__(self, fingerprint_size: Tuple[int, int] = (16, 16), threshold: float = 6.0):
+        """初始化变化检测器
+        
+        Args:
+            fingerprint_size: 指纹尺寸 (width, height)
+            threshold: 平均绝对差阈值（灰度级），超过即认为画面变化
+        """
+        self.fingerprint_size = fingerprint_size
+        self.threshold = threshold
+        
+        # {格子: (指纹, 识别结果)}
+        self._cells: Dict[Hashable, Tuple[np.ndarray, Optional[str]]] = {}
+        self._lock = threading.Lock()
+    
+    def fingerprint(self, image: np.ndarray) -> np.ndarray:
+        """计算图像指纹
+        
+        Args:
+            image: BGR或灰度图像
+        
+        Returns:
+            np.ndarray: int16类型的缩小灰度图
+        """
+        if len(image.shape) == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(image, self.fingerprint_size, interpolation=cv2.INTER_AREA)
+        return small.astype(np.int16)
+    
+    def check(self, key: Hashable, image: np.ndarray) -> Tuple[bool, Optional[str], np.ndarray]:
+        """检查格子画面是否与上次识别时相同
+        
+        Args:
+            key: 格子标识，如(row, col)
+            image: 当前格子图像
+        
+        Returns:
+            Tuple[bool, Optional[str], np.ndarray]: (是否未变化, 上次识别结果, 当前指纹)
+        """
+        current = self.fingerprint(image)
+        cached = self._cells.get(key)
+        if cached is None:
+            return False, None, current
+        
+        previous, label = cached
+        difference = float(np.mean(np.abs(current - previous)))
+        return difference <= self.threshold, label, current
+    
+    def update(self, key: Hashable, fingerprint: np.ndarray, label: Optional[str]):
+        """保存格子的指纹和识别结果
+        
+        Args:
+            key: 格子标识
+            fingerprint: check()返回的指纹
+            label: 识别结果
+        """
+        with self._lock:
+            self._cells[key] = (fingerprint, label)
+    
+    def reset(self):
+        """清空所有缓存（棋盘区域、格子大小或模板变化时调用）"""
+        with self._lock:
+            self._cells.clear()
+    
+    def __len__(self) -> int:
+        return len(self._cells)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+整盘颜色图 - Board Color Map
+整块棋盘图像只做一次HSV转换，为每种颜色的掩码建立积分图，
+之后任意矩形区域内的颜色像素比例都可以O(1)读出
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ...utils.config import RED_COLOR_RANGE, RED_COLOR_RANGE_ALT, BLACK_COLOR_RANGE
+
+# 默认颜色范围（HSV格式），红色色调在0/180处环绕，需要两段范围合并
+DEFAULT_COLOR_RANGES = {
+    'red': [RED_COLOR_RANGE, RED_COLOR_RANGE_ALT],
+    'black': [BLACK_COLOR_RANGE]
+}
+
+# 颜色判定顺序与detect_piece_color保持一致：先红后黑
+COLOR_ORDER = ('red', 'black')
+
+
+class BoardColorMap:
+    """基于积分图的整盘颜色统计
+    
+    积分图比原图多一行一列，integral[y, x]为区域[0:y, 0:x]内的掩码像素数
+    """
+    
+    def __init__(self, image: np.ndarray,
+                 color_ranges: Optional[Dict[str, Sequence[Dict]]] = None):
+        """对整块图像建立颜色积分图
+        
+        Args:
+            image: BGR图像（通常是包含整个棋盘的单帧截图）
+            color_ranges: {颜色: [HSV范围, ...]}，每个范围包含'lower'和'upper'键
+        """
+        self.color_ranges = color_ranges or DEFAULT_COLOR_RANGES
+        self.shape = image.shape[:2]
+        
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        
+        self.integrals: Dict[str, np.ndarray] = {}
+        for color, ranges in self.color_ranges.items():
+            mask = np.zeros(self.shape, dtype=np.uint8)
+            for color_range in ranges:
+                lower = np.array(color_range['lower'])
+                upper = np.array(color_range['upper'])
+                cv2.bitwise_or(mask, cv2.inRange(hsv, lower, upper), dst=mask)
+            
+            # 掩码转为0/1后求积分图，结果为int32
+            self.integrals[color] = cv2.integral(mask // 255)
+    
+    def count(self, color: str, bounds: Tuple[int, int, int, int]) -> int:
+        """统计矩形区域内某颜色的像素数
+        
+        Args:
+            color: 颜色名称
+            bounds: 区域 (left, top, right, bottom)，均为图像内坐标
+        
+        Returns:
+            int: 像素数
+        """
+        left, top, right, bottom = bounds
+        integral = self.integrals[color]
+        return int(integral[bottom, right] - integral[top, right]
+                   - integral[bottom, left] + integral[top, left])
+    
+    def ratios(self, bounds: Tuple[int, int, int, int]) -> Dict[str, float]:
+        """计算矩形区域内各颜色像素所占比例
+        
+        Args:
+            bounds: 区域 (left, top, right, bottom)
+        
+        Returns:
+            Dict[str, float]: {颜色: 0-1之间的比例}
+        """
+        left, top, right, bottom = bounds
+        area = (right - left) * (bottom - top)
+        if area <= 0:
+            return {color: 0.0 for color in self.integrals}
+        return {color: self.count(color, bounds) / area for color in self.integrals}
+    
+    def classify(self, bounds: Tuple[int, int, int, int], min_ratio: float = 0.1) -> Optional[str]:
+        """判定矩形区域内棋子的颜色
+        
+        Args:
+            bounds: 区域 (left, top, right, bottom)
+            min_ratio: 颜色像素比例超过此值才判定为该颜色
+        
+        Returns:
+            Optional[str]: 'red'、'black'或None
+        """
+        ratios = self.ratios(bounds)
+        for color in COLOR_ORDER:
+            if ratios.get(color, 0.0) > min_ratio:
+                return color
+        return None
+    
+    def classify_cells(self, cell_bounds: Dict[Tuple[int, int], Tuple[int, int, int, int]],
+                       min_ratio: float = 0.1) -> Dict[Tuple[int, int], Optional[str]]:
+        """批量判定多个格子的棋子颜色
+        
+        Args:
+            cell_bounds: {(row, col): (left, top, right, bottom)}
+            min_ratio: 颜色像素比例阈值
+        
+        Returns:
+            Dict[Tuple[int, int], Optional[str]]: {(row, col): 颜色}
+        """
+        return {position: self.classify(bounds, min_ratio) for position, bounds in cell_bounds.items()}
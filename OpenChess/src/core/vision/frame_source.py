@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧源模块 - Frame Sources
+为扫描器提供统一的截图接口，支持多种采集后端：
+- mss: 基于X11共享内存/DXGI的快速截图，结果写入可复用的预分配BGR缓冲区
+- pyautogui: 兼容旧行为的截图方式
+- replay: 回放PNG等图片序列，用于无显示环境下的基准测试和回归测试
+- synthetic: 内存中的合成画面，用于单元测试和无显示环境（默认显示配置的图片或空白画面）
+"""
+
+import abc
+import glob
+import os
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+try:
+    import pyautogui
+except Exception:  # 无显示环境下导入pyautogui会失败
+    pyautogui = None
+
+from ...utils.config import (
+    FRAME_SOURCE_BACKEND, FRAME_REPLAY_DIR, FRAME_SYNTHETIC_IMAGE, FRAME_SYNTHETIC_SIZE,
+    SUPPORTED_FRAME_BACKENDS
+)
+
+Region = Tuple[int, int, int, int]
+
+
+def crop_region(frame: np.ndarray, region: Optional[Region]) -> np.ndarray:
+    """从整帧图像中裁剪区域（返回视图，超出边界部分自动截断）
+    
+    Args:
+        frame: 整帧图像
+        region: 区域 (x, y, width, height)，None表示整帧
+    
+    Returns:
+        np.ndarray: 区域图像视图
+    """
+    if region is None:
+        return frame
+    
+    x, y, w, h = region
+    frame_height, frame_width = frame.shape[:2]
+    left = min(max(x, 0), frame_width)
+    top = min(max(y, 0), frame_height)
+    right = min(max(x + w, 0), frame_width)
+    bottom = min(max(y + h, 0), frame_height)
+    return frame[top:bottom, left:right]
+
+
+class FrameSource(abc.ABC):
+    """帧源抽象基类
+    
+    grab()返回BGR格式的图像。部分后端会复用内部缓冲区，
+    返回的图像只保证在下一次grab()之前有效，需要长期保存时请自行copy()
+    """
+    
+    @abc.abstractmethod
+    def grab(self, region: Optional[Region] = None) -> Optional[np.ndarray]:
+        """获取一帧图像
+        
+        Args:
+            region: 截取区域 (x, y, width, height)，None表示整个画面
+        
+        Returns:
+            Optional[np.ndarray]: BGR格式的图像，失败时返回None
+        """
+        pass
+    
+    def close(self):
+        """释放帧源占用的资源"""
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PyAutoGUIFrameSource(FrameSource):
+    """基于pyautogui的帧源（兼容旧行为，每次截图都会分配新图像）"""
+    
+    def __init__(self):
+        if pyautogui is None:
+            raise ImportError("pyautogui不可用（未安装或当前没有可用的显示环境）")
+    
+    def grab(self, region: Optional[Region] = None) -> Optional[np.ndarray]:
+        if region:
+            screenshot = pyautogui.screenshot(region=region)
+        else:
+            screenshot = pyautogui.screenshot()
+        
+        # 转换PIL图像到OpenCV格式
+        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+
+
+class MSSFrameSource(FrameSource):
+    """基于mss的快速帧源
+    
+    Linux下使用X11共享内存截图，Windows下使用GDI/DXGI。
+    截图结果直接转换到预分配的BGR缓冲区中，避免每帧分配内存
+    """
+    
+    def __init__(self, monitor: int = 0):
+        """初始化mss帧源
+        
+        Args:
+            monitor: 全屏截图时使用的显示器编号，0表示所有显示器拼接的虚拟屏幕
+        """
+        if mss is None:
+            raise ImportError("mss未安装，请运行: pip install mss")
+        
+        self.monitor = monitor
+        # mss实例不能跨线程使用，每个线程各自创建
+        self._local = threading.local()
+    
+    def _get_sct(self):
+        """获取当前线程的mss实例"""
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+    
+    def _get_buffer(self, height: int, width: int) -> np.ndarray:
+        """获取当前线程可复用的BGR缓冲区，尺寸变化时重新分配"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[:2] != (height, width):
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self._local.buffer = buffer
+        return buffer
+    
+    def grab(self, region: Optional[Region] = None) -> Optional[np.ndarray]:
+        sct = self._get_sct()
+        
+        if region:
+            x, y, w, h = region
+            monitor = {'left': int(x), 'top': int(y), 'width': int(w), 'height': int(h)}
+        else:
+            monitor = sct.monitors[self.monitor]
+        
+        shot = sct.grab(monitor)
+        
+        # mss返回BGRA原始数据，直接在其上建立视图并转换到预分配缓冲区
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        buffer = self._get_buffer(shot.height, shot.width)
+        cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=buffer)
+        return buffer
+    
+    def close(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class ImageSequenceFrameSource(FrameSource):
+    """图片序列回放帧源
+    
+    将一组图片当作连续的屏幕画面回放，图片左上角对应屏幕原点
+    """
+    
+    def __init__(self, images: Union[str, Sequence[str]], loop: bool = True,
+                 advance_on_grab: bool = False, preload: bool = True):
+        """初始化回放帧源
+        
+        Args:
+            images: 图片目录（按文件名排序读取其中的png/jpg/bmp）或图片路径列表
+            loop: 播放到末尾后是否从头循环
+            advance_on_grab: 是否每次grab()后自动切换到下一帧（单帧扫描时每次扫描对应一帧）
+            preload: 是否预先解码所有图片，基准测试时可避免磁盘IO影响结果
+        """
+        if isinstance(images, str):
+            if not os.path.isdir(images):
+                raise ValueError(f"回放目录不存在: {images}")
+            paths = []
+            for pattern in ('*.png', '*.jpg', '*.jpeg', '*.bmp'):
+                paths.extend(glob.glob(os.path.join(images, pattern)))
+            paths.sort()
+        else:
+            paths = list(images)
+        
+        if not paths:
+            raise ValueError("回放序列中没有图片")
+        
+        self.paths = paths
+        self.loop = loop
+        self.advance_on_grab = advance_on_grab
+        self.index = 0
+        self._frames: List[Optional[np.ndarray]] = [None] * len(paths)
+        
+        if preload:
+            for i in range(len(paths)):
+                self._load(i)
+    
+    def _load(self, index: int) -> np.ndarray:
+        """读取并缓存第index帧"""
+        frame = self._frames[index]
+        if frame is None:
+            frame = cv2.imread(self.paths[index], cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError(f"无法读取回放图片: {self.paths[index]}")
+            self._frames[index] = frame
+        return frame
+    
+    def __len__(self) -> int:
+        return len(self.paths)
+    
+    def advance(self) -> bool:
+        """切换到下一帧
+        
+        Returns:
+            bool: 是否成功切换（非循环模式下到达末尾时返回False）
+        """
+        if self.index + 1 < len(self.paths):
+            self.index += 1
+            return True
+        if self.loop:
+            self.index = 0
+            return True
+        return False
+    
+    def grab(self, region: Optional[Region] = None) -> Optional[np.ndarray]:
+        frame = crop_region(self._load(self.index), region)
+        if self.advance_on_grab:
+            self.advance()
+        return frame
+
+
+class SyntheticFrameSource(FrameSource):
+    """内存合成帧源，画面可以是固定图像或按需生成图像的函数"""
+    
+    def __init__(self, frame: Union[np.ndarray, Callable[[], np.ndarray], None] = None):
+        """初始化合成帧源
+        
+        Args:
+            frame: BGR图像，或每次grab()时调用以生成整帧图像的函数；
+                   None时读取FRAME_SYNTHETIC_IMAGE，未配置时使用FRAME_SYNTHETIC_SIZE大小的空白画面
+        """
+        if frame is None:
+            frame = self._default_frame()
+        self.set_frame(frame)
+    
+    @staticmethod
+    def _default_frame() -> np.ndarray:
+        """按配置生成默认画面"""
+        if FRAME_SYNTHETIC_IMAGE:
+            frame = cv2.imread(FRAME_SYNTHETIC_IMAGE, cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError(f"无法读取合成画面图片: {FRAME_SYNTHETIC_IMAGE}")
+            return frame
+        
+        width, height = FRAME_SYNTHETIC_SIZE
+        return np.zeros((height, width, 3), dtype=np.uint8)
+    
+    def set_frame(self, frame: Union[np.ndarray, Callable[[], np.ndarray]]):
+        """更新当前画面"""
+        self.frame = frame
+    
+    def grab(self, region: Optional[Region] = None) -> Optional[np.ndarray]:
+        frame = self.frame() if callable(self.frame) else self.frame
+        if frame is None:
+            return None
+        return crop_region(frame, region)
+
+
+def create_frame_source(backend: str = FRAME_SOURCE_BACKEND, **kwargs) -> FrameSource:
+    """按名称创建帧源
+    
+    Args:
+        backend: 后端名称，见SUPPORTED_FRAME_BACKENDS；'auto'优先使用mss，不可用时回退到pyautogui
+        **kwargs: 传递给后端构造函数的参数
+    
+    Returns:
+        FrameSource: 帧源实例
+    """
+    if backend not in SUPPORTED_FRAME_BACKENDS:
+        raise ValueError(f"不支持的帧源后端: {backend}，可选: {', '.join(SUPPORTED_FRAME_BACKENDS)}")
+    
+    if backend == 'auto':
+        backend = 'mss' if mss is not None else 'pyautogui'
+    
+    if backend == 'mss':
+        return MSSFrameSource(**kwargs)
+    elif backend == 'pyautogui':
+        return PyAutoGUIFrameSource(**kwargs)
+    elif backend == 'replay':
+        kwargs.setdefault('images', FRAME_REPLAY_DIR)
+        if kwargs['images'] is None:
+            raise ValueError("replay后端需要指定images参数或设置CHESS_REPLAY_DIR环境变量")
+        return ImageSequenceFrameSource(**kwargs)
+    else:
+        return SyntheticFrameSource(**kwargs)
+
+
+_default_frame_source: Optional[FrameSource] = None
+_default_lock = threading.Lock()
+
+
+def get_default_frame_source() -> FrameSource:
+    """获取全局默认帧源（按配置的后端延迟创建）"""
+    global _default_frame_source
+    with _default_lock:
+        if _default_frame_source is None:
+            _default_frame_source = create_frame_source()
+        return _default_frame_source
+
+
+def set_default_frame_source(source: Optional[FrameSource]):
+    """替换全局默认帧源，None表示下次使用时按配置重新创建"""
+    global _default_frame_source
+    with _default_lock:
+        _default_frame_source = source
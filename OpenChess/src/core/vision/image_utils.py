@@ -9,7 +9,8 @@ import cv2
 import numpy as np
 from typing import List, Tuple, Optional, Dict
 from PIL import Image, ImageEnhance
-import pyautogui
+
+from .frame_source import get_default_frame_source
 
 
 class ImageUtils:
@@ -23,15 +24,9 @@ class ImageUtils:
             region: 截取区域 (x, y, width, height)，None表示全屏
             
         Returns:
-            np.ndarray: BGR格式的图像数组
+            np.ndarray: BGR格式的图像数组（可能是帧源的复用缓冲区，需长期保存时请copy()）
         """
-        if region:
-            screenshot = pyautogui.screenshot(region=region)
-        else:
-            screenshot = pyautogui.screenshot()
-        
-        # 转换PIL图像到OpenCV格式
-        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        return get_default_frame_source().grab(region)
     
     @staticmethod
     def enhance_image_quality(image: np.ndarray, 
@@ -203,6 +198,73 @@ class ImageUtils:
         is_match = max_val >= threshold
         return is_match, max_val, max_loc
     
+    @staticmethod
+    def ncc_vectors(images: List[np.ndarray], grayscale: bool = False) -> np.ndarray:
+        """把同尺寸图像展平为去均值、单位范数的向量，用于批量归一化互相关
+        
+        两个向量的点积等于两幅同尺寸图像的TM_CCOEFF_NORMED匹配值
+        
+        Args:
+            images: 同尺寸图像列表
+            grayscale: 是否先转换为灰度图（否则保留颜色通道，按通道分别去均值）
+            
+        Returns:
+            np.ndarray: 形状为(N, 像素数×通道数)的float32矩阵，无纹理的图像对应全零向量
+        """
+        if not images:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        if grayscale:
+            images = [cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+                      for image in images]
+        
+        stack = np.stack(images).astype(np.float32)
+        count = stack.shape[0]
+        channels = stack.shape[3] if stack.ndim == 4 else 1
+        
+        # 按通道去均值后展平
+        stack = stack.reshape(count, -1, channels)
+        stack -= stack.mean(axis=1, keepdims=True)
+        vectors = stack.reshape(count, -1)
+        
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 1e-6)
+        vectors[norms[:, 0] <= 1e-6] = 0
+        return vectors
+    
+    @staticmethod
+    def batch_template_match(images: List[np.ndarray], 
+                             templates: List[np.ndarray], 
+                             threshold: float = 0.7,
+                             template_vectors: Optional[np.ndarray] = None) -> List[Tuple[bool, float, int]]:
+        """批量模板匹配：一次矩阵乘法计算所有图像与所有模板的归一化互相关
+        
+        图像与模板尺寸必须相同（即棋子图像与已缩放模板），结果与逐对调用
+        cv2.matchTemplate(TM_CCOEFF_NORMED)一致
+        
+        Args:
+            images: 同尺寸图像列表
+            templates: 与图像同尺寸的模板列表
+            threshold: 匹配阈值
+            template_vectors: 预先计算好的模板向量（ncc_vectors的结果），提供时忽略templates
+            
+        Returns:
+            List[Tuple[bool, float, int]]: 每幅图像的 (是否匹配, 最高置信度, 最佳模板索引)
+        """
+        if template_vectors is None:
+            template_vectors = ImageUtils.ncc_vectors(templates)
+        
+        if not images or template_vectors.size == 0:
+            return [(False, 0.0, -1) for _ in images]
+        
+        # (N, D) @ (D, T) -> (N, T)
+        scores = ImageUtils.ncc_vectors(images) @ template_vectors.T
+        best_indices = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(len(images)), best_indices]
+        
+        return [(float(score) >= threshold, float(score), int(index))
+                for score, index in zip(best_scores, best_indices)]
+    
     @staticmethod
     def color_segment(image: np.ndarray, 
                      color_ranges: List[Dict]) -> np.ndarray:
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+空位判定 - Empty Intersection Classification
+根据棋盘自身的背景颜色快速判断交叉点是否为空，
+空位无需再经过模板匹配、OCR和颜色检测
+"""
+
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class EmptyCellClassifier:
+    """空位预分类器
+    
+    先用整块棋盘图像估计背景颜色和噪声水平，再检查棋子图像中心圆盘区域内
+    与背景明显不同的像素比例：空交叉点只有细网格线（开运算后被去除），
+    棋子则会在圆盘内形成大面积前景
+    """
+    
+    def __init__(self, max_foreground_ratio: float = 0.2, disc_ratio: float = 0.4,
+                 min_tolerance: float = 25.0):
+        """初始化空位分类器
+        
+        Args:
+            max_foreground_ratio: 圆盘内前景像素比例低于此值判定为空位
+            disc_ratio: 圆盘半径与棋子图像短边的比例
+            min_tolerance: 与背景颜色差异的最小阈值（灰度级）
+        """
+        self.max_foreground_ratio = max_foreground_ratio
+        self.disc_ratio = disc_ratio
+        self.min_tolerance = min_tolerance
+        
+        # 校准结果
+        self.background: Optional[np.ndarray] = None
+        self.tolerance = min_tolerance
+        
+        # 按尺寸缓存的圆盘掩码
+        self._disc_masks: Dict[Tuple[int, int], Tuple[np.ndarray, int]] = {}
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+    
+    @property
+    def calibrated(self) -> bool:
+        """是否已根据棋盘背景完成校准"""
+        return self.background is not None
+    
+    def calibrate(self, board_image: np.ndarray):
+        """根据棋盘图像校准背景颜色和差异阈值
+        
+        棋盘大部分区域是背景，用各通道中位数作为背景颜色，
+        用像素到背景距离的中位数估计纹理噪声
+        
+        Args:
+            board_image: 棋盘区域的BGR图像
+        """
+        pixels = board_image.reshape(-1, 3)
+        background = np.median(pixels, axis=0)
+        distances = np.max(np.abs(pixels.astype(np.float32) - background), axis=1)
+        
+        self.background = background.astype(np.uint8)
+        self.tolerance = max(self.min_tolerance, 4.0 * float(np.median(distances)))
+    
+    def reset(self):
+        """清除校准结果（棋盘区域变化时调用）"""
+        self.background = None
+        self.tolerance = self.min_tolerance
+    
+    def _get_disc_mask(self, height: int, width: int) -> Tuple[np.ndarray, int]:
+        """获取指定尺寸的中心圆盘掩码及其像素数"""
+        cached = self._disc_masks.get((height, width))
+        if cached is None:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            radius = max(1, int(min(height, width) * self.disc_ratio))
+            cv2.circle(mask, (width // 2, height // 2), radius, 255, -1)
+            cached = (mask, cv2.countNonZero(mask))
+            self._disc_masks[(height, width)] = cached
+        return cached
+    
+    def foreground_ratio(self, piece_image: np.ndarray) -> float:
+        """计算棋子图像中心圆盘内的前景像素比例
+        
+        Args:
+            piece_image: 棋子图像（BGR）
+        
+        Returns:
+            float: 0-1之间的前景比例
+        """
+        height, width = piece_image.shape[:2]
+        disc_mask, disc_pixels = self._get_disc_mask(height, width)
+        
+        # 与背景颜色的最大通道差
+        difference = cv2.absdiff(piece_image, np.full_like(piece_image, self.background))
+        difference = np.max(difference, axis=2)
+        foreground = np.where(difference > self.tolerance, 255, 0).astype(np.uint8)
+        
+        # 开运算去除细网格线和标记线
+        foreground = cv2.morphologyEx(foreground, cv2.MORPH_OPEN, self._kernel)
+        foreground = cv2.bitwise_and(foreground, disc_mask)
+        
+        return cv2.countNonZero(foreground) / disc_pixels
+    
+    def is_empty(self, piece_image: np.ndarray) -> bool:
+        """判断交叉点是否为空
+        
+        未校准时总是返回False，保证不会漏识别棋子
+        
+        Args:
+            piece_image: 棋子图像（BGR）
+        
+        Returns:
+            bool: 是否为空位
+        """
+        if not self.calibrated or piece_image is None or piece_image.size == 0:
+            return False
+        
+        height, width = piece_image.shape[:2]
+        if height < 3 or width < 3:
+            return False
+        
+        return self.foreground_ratio(piece_image) < self.max_foreground_ratio
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量OCR服务 - Batched OCR Service
+把一帧中所有需要OCR的棋子图像拼接成一张大图，只调用一次OCR，
+再根据字符框的位置把识别结果分配回各个格子。
+识别器在扫描器生命周期内常驻：安装了tesserocr时Tesseract引擎只初始化一次，
+否则每帧只启动一次tesseract进程；测试时可以替换为本地的桩识别器
+"""
+
+import abc
+import math
+import threading
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+class OCRBox(NamedTuple):
+    """识别出的单个字符及其外框（图像坐标，原点在左上角）"""
+    text: str
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+
+class OCRRecognizer(abc.ABC):
+    """OCR识别器抽象基类"""
+    
+    @property
+    def available(self) -> bool:
+        """识别器是否可用"""
+        return True
+    
+    @abc.abstractmethod
+    def recognize(self, image: np.ndarray) -> List[OCRBox]:
+        """识别图像中的所有字符
+        
+        Args:
+            image: 灰度图像（白底黑字）
+        
+        Returns:
+            List[OCRBox]: 字符及其外框
+        """
+        pass
+    
+    def close(self):
+        """释放识别器占用的资源"""
+        pass
+
+
+class TesseractRecognizer(OCRRecognizer):
+    """基于Tesseract的字符框识别器
+    
+    语言包在第一次使用时探测（只调用一次tesseract --list-langs），
+    有tesserocr时每个线程复用各自常驻的TessBaseAPI，否则通过pytesseract.image_to_boxes识别。
+    识别器可以被pickle传给工作进程，进程内会重新探测并创建自己的引擎
+    """
+    
+    def __init__(self, languages: Sequence[str] = ('chi_sim', 'eng'), psm: int = 6):
+        """初始化Tesseract识别器
+        
+        Args:
+            languages: 按优先级排列的候选语言包
+            psm: Tesseract页面分割模式，6表示把整张图当作一个文本块
+        """
+        self.languages = tuple(languages)
+        self.psm = psm
+        
+        self._language: Optional[str] = None
+        self._probed = False
+        self._lock = threading.Lock()
+        # TessBaseAPI不能跨线程使用，每个线程各自创建
+        self._local = threading.local()
+    
+    def __getstate__(self):
+        return {'languages': self.languages, 'psm': self.psm}
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+    
+    def _probe(self):
+        """探测已安装的语言包，选出优先级最高的可用语言"""
+        if self._probed:
+            return
+        
+        with self._lock:
+            if self._probed:
+                return
+            
+            installed = []
+            if tesserocr is not None:
+                try:
+                    _, installed = tesserocr.get_languages()
+                except Exception as e:
+                    print(f"探测Tesseract语言包失败: {e}")
+            elif pytesseract is not None:
+                try:
+                    installed = pytesseract.get_languages(config='')
+                except Exception as e:
+                    print(f"Tesseract不可用: {e}")
+            
+            self._language = next((lang for lang in self.languages if lang in installed), None)
+            if installed and self._language is None:
+                print(f"未找到可用的OCR语言包: {', '.join(self.languages)}")
+            self._probed = True
+    
+    @property
+    def available(self) -> bool:
+        self._probe()
+        return self._language is not None
+    
+    @property
+    def language(self) -> Optional[str]:
+        """实际使用的语言包"""
+        self._probe()
+        return self._language
+    
+    def recognize(self, image: np.ndarray) -> List[OCRBox]:
+        if not self.available:
+            return []
+        
+        if tesserocr is not None:
+            return self._recognize_tesserocr(image)
+        return self._recognize_pytesseract(image)
+    
+    def _recognize_tesserocr(self, image: np.ndarray) -> List[OCRBox]:
+        """使用当前线程常驻的TessBaseAPI识别"""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=self._language, psm=self.psm)
+            self._local.api = api
+        
+        api.SetImage(Image.fromarray(image))
+        api.Recognize()
+        
+        boxes = []
+        level = tesserocr.RIL.SYMBOL
+        iterator = api.GetIterator()
+        if iterator is None:
+            return boxes
+        
+        for symbol in tesserocr.iterate_level(iterator, level):
+            text = symbol.GetUTF8Text(level)
+            bounds = symbol.BoundingBox(level)
+            if text and bounds:
+                boxes.append(OCRBox(text.strip(), *bounds))
+        return boxes
+    
+    def _recognize_pytesseract(self, image: np.ndarray) -> List[OCRBox]:
+        """使用pytesseract的box模式识别（每次调用启动一个tesseract进程）"""
+        height = image.shape[0]
+        output = pytesseract.image_to_boxes(
+            Image.fromarray(image), lang=self._language, config=f'--psm {self.psm}'
+        )
+        
+        boxes = []
+        for line in output.splitlines():
+            parts = line.split(' ')
+            if len(parts) < 5:
+                continue
+            
+            # box文件的坐标原点在左下角，转换为左上角原点
+            left, bottom, right, top = (int(value) for value in parts[1:5])
+            boxes.append(OCRBox(parts[0], left, height - top, right, height - bottom))
+        return boxes
+    
+    def close(self):
+        api = getattr(self._local, 'api', None)
+        if api is not None:
+            api.End()
+            self._local.api = None
+
+
+class OCRService:
+    """批量OCR服务
+    
+    每个格子的图像先二值化并缩放到统一的小块，按网格拼接成一张白底大图，
+    小块之间留出空白，保证每个字符框只落在一个小块内
+    """
+    
+    def __init__(self, recognizer: Optional[OCRRecognizer] = None,
+                 tile_size: Tuple[int, int] = (48, 48), padding: int = 16, columns: int = 10):
+        """初始化OCR服务
+        
+        Args:
+            recognizer: 识别器，None时使用TesseractRecognizer
+            tile_size: 每个格子在拼接图中的尺寸 (width, height)
+            padding: 小块之间及四周的空白宽度
+            columns: 拼接图每行的小块数
+        """
+        self.recognizer = recognizer or TesseractRecognizer()
+        self.tile_size = tile_size
+        self.padding = padding
+        self.columns = columns
+        
+        # 统计信息（并行识别时多个线程同时更新）
+        self.calls = 0
+        self.last_batch_size = 0
+        self._stats_lock = threading.Lock()
+    
+    @property
+    def available(self) -> bool:
+        """OCR是否可用"""
+        try:
+            return self.recognizer.available
+        except Exception:
+            return False
+    
+    def set_recognizer(self, recognizer: OCRRecognizer):
+        """替换识别器（旧识别器会被关闭）"""
+        if recognizer is not self.recognizer:
+            self.recognizer.close()
+        self.recognizer = recognizer
+    
+    def close(self):
+        """关闭识别器"""
+        self.recognizer.close()
+    
+    def preprocess(self, image: np.ndarray) -> np.ndarray:
+        """把棋子图像转换为白底黑字的二值小块
+        
+        Args:
+            image: 棋子图像（BGR或灰度）
+        
+        Returns:
+            np.ndarray: tile_size大小的二值图像
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        gray = cv2.resize(gray, self.tile_size, interpolation=cv2.INTER_LINEAR)
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # 保证背景为白色：白色像素少于一半时反色
+        if cv2.countNonZero(binary) < binary.size // 2:
+            binary = cv2.bitwise_not(binary)
+        return binary
+    
+    def build_montage(self, tiles: List[np.ndarray]) -> Tuple[np.ndarray, List[Tuple[int, int, int, int]]]:
+        """把小块按网格拼接成一张图
+        
+        Args:
+            tiles: tile_size大小的灰度小块
+        
+        Returns:
+            Tuple: (拼接图, 每个小块在拼接图中的(left, top, right, bottom))
+        """
+        tile_width, tile_height = self.tile_size
+        columns = max(1, min(self.columns, len(tiles)))
+        rows = max(1, math.ceil(len(tiles) / columns))
+        
+        montage = np.full(
+            (rows * (tile_height + self.padding) + self.padding,
+             columns * (tile_width + self.padding) + self.padding),
+            255, dtype=np.uint8
+        )
+        
+        rects = []
+        for index, tile in enumerate(tiles):
+            row, col = divmod(index, columns)
+            left = self.padding + col * (tile_width + self.padding)
+            top = self.padding + row * (tile_height + self.padding)
+            montage[top:top + tile_height, left:left + tile_width] = tile
+            rects.append((left, top, left + tile_width, top + tile_height))
+        
+        return montage, rects
+    
+    def recognize_cells(self, images: Dict[Hashable, np.ndarray]) -> Dict[Hashable, str]:
+        """一次OCR调用识别多个格子
+        
+        Args:
+            images: {格子标识: 棋子图像}
+        
+        Returns:
+            Dict[Hashable, str]: {格子标识: 识别出的文本}，没有识别出字符的格子不在结果中
+        """
+        keys = [key for key, image in images.items() if image is not None and image.size > 0]
+        if not keys or not self.available:
+            return {}
+        
+        montage, _ = self.build_montage([self.preprocess(images[key]) for key in keys])
+        
+        try:
+            boxes = self.recognizer.recognize(montage)
+        except Exception as e:
+            print(f"OCR识别失败: {e}")
+            return {}
+        
+        with self._stats_lock:
+            self.calls += 1
+            self.last_batch_size = len(keys)
+        
+        # 按字符框中心所在的小块分配字符
+        pitch_x = self.tile_size[0] + self.padding
+        pitch_y = self.tile_size[1] + self.padding
+        columns = max(1, min(self.columns, len(keys)))
+        
+        characters: Dict[int, List[Tuple[int, str]]] = {}
+        for box in boxes:
+            text = box.text.strip()
+            if not text:
+                continue
+            
+            # 每个小块连同其四周一半的空白构成一个网格单元
+            col = int(((box.left + box.right) / 2 - self.padding / 2) // pitch_x)
+            row = int(((box.top + box.bottom) / 2 - self.padding / 2) // pitch_y)
+            index = row * columns + col
+            if 0 <= col < columns and row >= 0 and index < len(keys):
+                characters.setdefault(index, []).append((box.left, text))
+        
+        return {
+            keys[index]: ''.join(text for _, text in sorted(found))
+            for index, found in characters.items()
+        }
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+识别结果缓存 - Recognition Cache
+以归一化棋子图像的感知哈希（dHash/pHash）为键缓存识别结果。
+棋子移动到其他交叉点后外观不变，识别过一次的棋子之后只需计算一次哈希
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+SUPPORTED_HASH_METHODS = ['dhash', 'phash']
+
+
+class RecognitionCache:
+    """感知哈希识别缓存（LRU淘汰，可持久化）
+    
+    哈希基于灰度图，红黑两方同名棋子（如车、马、炮）字形相同，
+    因此缓存键同时包含棋子颜色
+    """
+    
+    def __init__(self, capacity: int = 4096, method: str = 'dhash', hash_size: int = 8,
+                 crop_ratio: float = 0.8, path: Optional[str] = None):
+        """初始化识别缓存
+        
+        Args:
+            capacity: 最多缓存的条目数，超出时淘汰最久未使用的条目
+            method: 哈希算法，'dhash'（差值哈希）或'phash'（DCT感知哈希）
+            hash_size: 哈希边长，哈希位数为hash_size的平方
+            crop_ratio: 只对中心这一比例的区域计算哈希，减少四角网格线的影响
+            path: 持久化文件路径，提供时构造时自动加载
+        """
+        if method not in SUPPORTED_HASH_METHODS:
+            raise ValueError(f"不支持的哈希算法: {method}，可选: {', '.join(SUPPORTED_HASH_METHODS)}")
+        
+        self.capacity = capacity
+        self.method = method
+        self.hash_size = hash_size
+        self.crop_ratio = crop_ratio
+        self.path = path
+        
+        # {缓存键: (棋子类型, 置信度)}，按最近使用顺序排列
+        self._entries: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        
+        if path and os.path.exists(path):
+            self.load(path)
+    
+    def compute_hash(self, image: np.ndarray) -> int:
+        """计算棋子图像的感知哈希
+        
+        图像先裁剪中心区域、转为灰度并把亮度拉伸到0-255，消除截图亮度差异的影响
+        
+        Args:
+            image: 棋子图像（BGR或灰度）
+        
+        Returns:
+            int: hash_size*hash_size位的哈希值
+        """
+        height, width = image.shape[:2]
+        margin_y = int(height * (1 - self.crop_ratio) / 2)
+        margin_x = int(width * (1 - self.crop_ratio) / 2)
+        image = image[margin_y:height - margin_y, margin_x:width - margin_x]
+        
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+        
+        if self.method == 'dhash':
+            # 缩放到(hash_size+1)×hash_size，比较水平相邻像素
+            small = cv2.resize(gray, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+            bits = small[:, 1:] > small[:, :-1]
+        else:
+            # 32×32图像做DCT，取低频系数与中位数比较
+            small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+            low = cv2.dct(small)[:self.hash_size, :self.hash_size]
+            bits = low > np.median(low)
+        
+        value = 0
+        for bit in bits.flatten():
+            value = (value << 1) | int(bit)
+        return value
+    
+    def make_key(self, image: np.ndarray, color: Optional[str] = None) -> str:
+        """生成缓存键
+        
+        Args:
+            image: 棋子图像
+            color: 棋子颜色，None表示未知
+        
+        Returns:
+            str: 形如"red:1f3c..."的缓存键
+        """
+        digits = (self.hash_size * self.hash_size + 3) // 4
+        return f"{color or 'none'}:{self.compute_hash(image):0{digits}x}"
+    
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """查询缓存，命中时把条目移到最近使用的位置
+        
+        Args:
+            key: make_key()生成的缓存键
+        
+        Returns:
+            Optional[Tuple[str, float]]: (棋子类型, 置信度)，未命中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: str, label: str, confidence: float):
+        """写入缓存，超出容量时淘汰最久未使用的条目
+        
+        Args:
+            key: 缓存键
+            label: 棋子类型
+            confidence: 识别置信度
+        """
+        with self._lock:
+            self._entries[key] = (label, float(confidence))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存（模板变化时调用）"""
+        with self._lock:
+            self._entries.clear()
+    
+    def save(self, path: Optional[str] = None) -> bool:
+        """把缓存保存为JSON文件
+        
+        Args:
+            path: 文件路径，None时使用构造时的路径
+        
+        Returns:
+            bool: 是否保存成功
+        """
+        path = path or self.path
+        if not path:
+            return False
+        
+        with self._lock:
+            data = {
+                'method': self.method,
+                'hash_size': self.hash_size,
+                'crop_ratio': self.crop_ratio,
+                # 按最近使用顺序保存，加载后LRU顺序不变
+                'entries': [[key, label, confidence] for key, (label, confidence) in self._entries.items()]
+            }
+        
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            return True
+        except Exception as e:
+            print(f"保存识别缓存失败: {e}")
+            return False
+    
+    def load(self, path: Optional[str] = None) -> bool:
+        """从JSON文件加载缓存，哈希算法或尺寸不一致时忽略文件内容
+        
+        Args:
+            path: 文件路径，None时使用构造时的路径
+        
+        Returns:
+            bool: 是否加载成功
+        """
+        path = path or self.path
+        if not path:
+            return False
+        
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"加载识别缓存失败: {e}")
+            return False
+        
+        if (data.get('method') != self.method or data.get('hash_size') != self.hash_size
+                or data.get('crop_ratio') != self.crop_ratio):
+            print("识别缓存的哈希参数不一致，已忽略")
+            return False
+        
+        with self._lock:
+            for key, label, confidence in data.get('entries', []):
+                self._entries[key] = (label, float(confidence))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return True
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
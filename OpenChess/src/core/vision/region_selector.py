@@ -7,7 +7,6 @@
 
 import tkinter as tk
 from tkinter import ttk
-import pyautogui
 import cv2
 import numpy as np
 from PIL import Image, ImageTk
@@ -16,6 +15,8 @@ import threading
 import json
 import os
 
+from .frame_source import FrameSource, get_default_frame_source
+
 class RegionSelector:
     """区域选择工具类
     
@@ -23,13 +24,16 @@ class RegionSelector:
     支持区域预览、保存和加载功能
     """
     
-    def __init__(self, callback: Optional[Callable] = None):
+    def __init__(self, callback: Optional[Callable] = None, 
+                 frame_source: Optional[FrameSource] = None):
         """初始化区域选择器
         
         Args:
             callback: 选择完成后的回调函数，接收(x, y, width, height)参数
+            frame_source: 截图使用的帧源，None表示使用全局默认帧源
         """
         self.callback = callback
+        self.frame_source = frame_source
         self.selected_region = None
         self.selecting = False
         self.start_x = 0
@@ -50,6 +54,12 @@ class RegionSelector:
         self.background_image = None
         self._image_refs = []  # 保持对图像对象的强引用，防止被垃圾回收
         
+    def _get_frame_source(self) -> FrameSource:
+        """获取截图使用的帧源"""
+        if self.frame_source is None:
+            return get_default_frame_source()
+        return self.frame_source
+        
     def _cleanup_resources(self):
         """清理之前的资源，防止重复使用时的冲突"""
         try:
@@ -95,18 +105,17 @@ class RegionSelector:
             
             # 截取整个屏幕
             try:
-                screenshot = pyautogui.screenshot()
+                screenshot = self._get_frame_source().grab()
                 if screenshot is None:
                     print("截图失败: 返回None")
                     return None
                     
-                # 转换为OpenCV格式
-                screenshot_array = np.array(screenshot)
-                if screenshot_array.size == 0:
+                if screenshot.size == 0:
                     print("截图失败: 空数组")
                     return None
                     
-                self.screenshot_image = cv2.cvtColor(screenshot_array, cv2.COLOR_RGB2BGR)
+                # 帧源可能复用缓冲区，选择界面需要保留副本
+                self.screenshot_image = screenshot.copy()
                 
             except Exception as e:
                 print(f"截图失败: {e}")
@@ -756,8 +765,8 @@ class RegionSelector:
         """
         try:
             x, y, width, height = region
-            region_screenshot = pyautogui.screenshot(region=(x, y, width, height))
-            return cv2.cvtColor(np.array(region_screenshot), cv2.COLOR_RGB2BGR)
+            region_screenshot = self._get_frame_source().grab((x, y, width, height))
+            return region_screenshot.copy() if region_screenshot is not None else None
         except Exception as e:
             print(f"预览区域失败: {e}")
             return None
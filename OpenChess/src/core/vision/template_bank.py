@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板库 - Template Bank
+按棋子图像尺寸预先缩放和归一化所有棋子模板，避免每次匹配都重复缩放
+"""
+
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .image_utils import ImageUtils
+
+
+class PreparedTemplates(NamedTuple):
+    """某一尺寸下预处理好的模板集合"""
+    size: Tuple[int, int]          # 模板尺寸 (width, height)
+    names: List[str]               # 模板名称，与下列数组的第一维一一对应
+    images: List[np.ndarray]       # 缩放后的BGR模板
+    vectors: np.ndarray            # 去均值、单位范数的展平模板，形状(T, w*h*3)，用于批量NCC
+
+
+class TemplateBank:
+    """按尺寸缓存的模板库
+    
+    同一棋盘几何下所有棋子图像尺寸相同，模板只需按该尺寸处理一次。
+    扫描区域或格子大小变化时调用invalidate()清空缓存。
+    已知棋子颜色时可以只取该颜色的模板子集（名称以"red_"/"black_"开头），
+    没有颜色前缀的自定义模板属于所有子集
+    """
+    
+    def __init__(self, templates: Optional[Dict[str, np.ndarray]] = None):
+        """初始化模板库
+        
+        Args:
+            templates: {模板名称: BGR模板图像}
+        """
+        self._templates: Dict[str, np.ndarray] = {}
+        self._prepared: Dict[Tuple[int, int], PreparedTemplates] = {}
+        self._subsets: Dict[Tuple[Tuple[int, int], str], PreparedTemplates] = {}
+        self._lock = threading.Lock()
+        self.set_templates(templates or {})
+    
+    def set_templates(self, templates: Dict[str, np.ndarray]):
+        """替换模板集合并清空缓存"""
+        with self._lock:
+            self._templates = dict(templates)
+            self._prepared.clear()
+            self._subsets.clear()
+    
+    def invalidate(self):
+        """清空按尺寸缓存的模板（棋盘区域或格子大小变化时调用）"""
+        with self._lock:
+            self._prepared.clear()
+            self._subsets.clear()
+    
+    def get(self, size: Tuple[int, int], color: Optional[str] = None) -> PreparedTemplates:
+        """获取指定尺寸的预处理模板，首次使用时生成并缓存
+        
+        Args:
+            size: 棋子图像尺寸 (width, height)
+            color: 棋子颜色，指定时只返回该颜色的模板
+        
+        Returns:
+            PreparedTemplates: 预处理好的模板集合
+        """
+        prepared = self._prepared.get(size)
+        if prepared is None:
+            with self._lock:
+                prepared = self._prepared.get(size)
+                if prepared is None:
+                    prepared = self._prepare(size)
+                    self._prepared[size] = prepared
+        
+        if color is None:
+            return prepared
+        
+        subset = self._subsets.get((size, color))
+        if subset is None:
+            with self._lock:
+                subset = self._select(prepared, color)
+                self._subsets[(size, color)] = subset
+        return subset
+    
+    @staticmethod
+    def _select(prepared: PreparedTemplates, color: str) -> PreparedTemplates:
+        """从预处理模板中选出指定颜色（及无颜色前缀）的模板"""
+        indices = [
+            i for i, name in enumerate(prepared.names)
+            if name.startswith(f"{color}_") or not name.startswith(('red_', 'black_'))
+        ]
+        return PreparedTemplates(
+            size=prepared.size,
+            names=[prepared.names[i] for i in indices],
+            images=[prepared.images[i] for i in indices],
+            vectors=prepared.vectors[indices]
+        )
+    
+    def _prepare(self, size: Tuple[int, int]) -> PreparedTemplates:
+        """把所有模板缩放到指定尺寸并展平为NCC向量"""
+        names = []
+        images = []
+        
+        for name, template in self._templates.items():
+            try:
+                resized = cv2.resize(template, size)
+            except cv2.error:
+                continue
+            
+            names.append(name)
+            images.append(resized)
+        
+        return PreparedTemplates(
+            size=size,
+            names=names,
+            images=images,
+            vectors=ImageUtils.ncc_vectors(images)
+        )
+    
+    def __len__(self) -> int:
+        return len(self._templates)
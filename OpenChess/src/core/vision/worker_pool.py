@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+识别工作池 - Recognition Worker Pool
+把逐格识别任务分发到线程池或进程池中并发执行，结果按提交顺序返回。
+OpenCV的matchTemplate、cvtColor、threshold等调用会释放GIL，线程即可并行；
+OCR分块可以选择在进程中执行，每个工作进程各自保持常驻的OCR识别器
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, TypeVar
+
+import numpy as np
+
+from .ocr_service import OCRRecognizer, OCRService
+
+SUPPORTED_WORKER_MODES = ['thread', 'process']
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# 工作进程内的OCR服务，由进程池的initializer创建，进程存活期间一直复用
+_worker_ocr_service: Optional[OCRService] = None
+
+
+def _init_ocr_worker(recognizer: OCRRecognizer, tile_size, padding: int, columns: int):
+    """工作进程初始化：创建进程内常驻的OCR服务"""
+    global _worker_ocr_service
+    _worker_ocr_service = OCRService(recognizer, tile_size=tile_size, padding=padding, columns=columns)
+
+
+def _recognize_ocr_chunk(images: Dict[Hashable, np.ndarray]) -> Dict[Hashable, str]:
+    """在工作进程中识别一组格子"""
+    return _worker_ocr_service.recognize_cells(images)
+
+
+class RecognitionPool:
+    """识别工作池
+    
+    workers为1时所有任务在调用线程中串行执行；
+    mode为'process'时OCR分块在进程池中执行，其余任务仍使用线程池（需要访问扫描器状态）
+    """
+    
+    def __init__(self, workers: int = 0, mode: str = 'thread'):
+        """初始化工作池
+        
+        Args:
+            workers: 工作者数量，0表示使用CPU核心数，1表示串行
+            mode: 'thread'（线程池）或'process'（进程池）
+        """
+        if mode not in SUPPORTED_WORKER_MODES:
+            raise ValueError(f"不支持的工作池模式: {mode}，可选: {', '.join(SUPPORTED_WORKER_MODES)}")
+        
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.mode = mode
+        
+        self._thread_executor: Optional[ThreadPoolExecutor] = None
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+        self._process_key = None
+        self._lock = threading.Lock()
+    
+    @property
+    def parallel(self) -> bool:
+        """是否并发执行"""
+        return self.workers > 1
+    
+    def _get_thread_executor(self) -> Executor:
+        """获取线程池，首次使用时创建"""
+        with self._lock:
+            if self._thread_executor is None:
+                self._thread_executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='cell-recognition'
+                )
+            return self._thread_executor
+    
+    def _get_process_executor(self, service: OCRService) -> Executor:
+        """获取OCR进程池，识别器或拼接参数变化时重建"""
+        key = (id(service.recognizer), service.tile_size, service.padding, service.columns)
+        with self._lock:
+            if self._process_executor is None or self._process_key != key:
+                if self._process_executor is not None:
+                    self._process_executor.shutdown(wait=False)
+                self._process_executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_ocr_worker,
+                    initargs=(service.recognizer, service.tile_size, service.padding, service.columns)
+                )
+                self._process_key = key
+            return self._process_executor
+    
+    def map(self, func: Callable[[T], R], items: Sequence[T]) -> List[R]:
+        """并发执行任务，结果顺序与items一致
+        
+        Args:
+            func: 任务函数
+            items: 任务参数列表
+        
+        Returns:
+            List: 与items一一对应的结果
+        """
+        if not self.parallel or len(items) <= 1:
+            return [func(item) for item in items]
+        return list(self._get_thread_executor().map(func, items))
+    
+    def split(self, items: Sequence[T], min_chunk_size: int = 1) -> List[List[T]]:
+        """把任务按顺序切分为不超过workers个的连续分块
+        
+        Args:
+            items: 任务列表
+            min_chunk_size: 每个分块的最少任务数
+        
+        Returns:
+            List[List]: 分块列表，拼接后与items顺序一致
+        """
+        if not items:
+            return []
+        
+        chunks = max(1, min(self.workers, len(items) // max(1, min_chunk_size)))
+        size = math.ceil(len(items) / chunks)
+        return [list(items[i:i + size]) for i in range(0, len(items), size)]
+    
+    def recognize_ocr(self, service: OCRService, images: Dict[Hashable, np.ndarray],
+                      min_chunk_size: int = 8) -> Dict[Hashable, str]:
+        """把需要OCR的格子分块后并发识别，每块一次OCR调用
+        
+        Args:
+            service: OCR服务
+            images: {格子标识: 棋子图像}
+            min_chunk_size: 每次OCR调用的最少格子数，格子较少时不拆分
+        
+        Returns:
+            Dict[Hashable, str]: {格子标识: 识别出的文本}
+        """
+        chunks = [dict(chunk) for chunk in self.split(list(images.items()), min_chunk_size)]
+        if len(chunks) <= 1:
+            return service.recognize_cells(images)
+        
+        if self.mode == 'process':
+            if not service.available:
+                return {}
+            results = list(self._get_process_executor(service).map(_recognize_ocr_chunk, chunks))
+        else:
+            results = self.map(service.recognize_cells, chunks)
+        
+        merged = {}
+        for result in results:
+            merged.update(result)
+        return merged
+    
+    def close(self):
+        """关闭线程池和进程池"""
+        with self._lock:
+            if self._thread_executor is not None:
+                self._thread_executor.shutdown(wait=False)
+                self._thread_executor = None
+            if self._process_executor is not None:
+                self._process_executor.shutdown(wait=False)
+                self._process_executor = None
@@ -1425,8 +1425,14 @@ class ChessScannerGUI:
     def stop_monitoring(self):
         """停止监控"""
         self.scanning = False
+        self.save_recognition_cache()
         self.log_message("监控已停止")
     
+    def save_recognition_cache(self):
+        """将扫描器的识别缓存写入磁盘，供下次启动时直接复用"""
+        if self.scanner:
+            self.scanner.save_recognition_cache()
+    
     def start_ai_monitoring(self):
         """启动AI助手监控"""
         if not self.ai_assistant:
@@ -1438,6 +1444,8 @@ class ChessScannerGUI:
             return
         
         self.scanning = True
+        # 清除上次停止监控时的停止请求
+        self.ai_assistant.start_analysis()
         self.log_message("启动AI智能监控...")
         
         def ai_monitor_thread():
@@ -1473,6 +1481,10 @@ class ChessScannerGUI:
     def stop_ai_monitoring(self):
         """停止AI助手监控"""
         self.scanning = False
+        if self.ai_assistant:
+            # 正在进行的搜索立即返回，监控线程不会被搜索拖住
+            self.ai_assistant.stop_analysis()
+        self.save_recognition_cache()
         self.log_message("AI监控已停止")
     
     def get_ai_recommendation(self):
@@ -1486,6 +1498,7 @@ class ChessScannerGUI:
             return
         
         self.log_message("获取AI推荐中...")
+        self.ai_assistant.start_analysis()
         
         def get_recommendation_thread():
             try:
@@ -2148,6 +2161,8 @@ def main():
     def on_closing():
         if app.scanning:
             app.stop_ai_monitoring()
+        else:
+            app.save_recognition_cache()
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
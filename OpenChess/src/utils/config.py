@@ -64,7 +64,31 @@ GRID_PADDING = 10  # 网格边距（像素）
 PLAYER_COLOR = 'red'  # 玩家颜色（red=红方/下方，black=黑方/上方）
 AI_SEARCH_DEPTH = 3   # AI搜索深度
 MAX_RECOMMENDATIONS = 5  # 最大推荐走法数
-AI_THINKING_TIME = 1.0  # AI思考时间（秒）
+AI_THINKING_TIME = 1.0  # AI思考时间（秒），迭代加深搜索在此时间内尽量加深，0表示不限时、固定搜索AI_SEARCH_DEPTH层
+AI_MAX_SEARCH_DEPTH = 12  # 思考时间内迭代加深的最大深度
+AI_NODE_LIMIT = 200000  # 单次分析的最大搜索节点数，0表示不限制
+AI_HASH_SIZE_MB = 16  # 置换表内存上限（MB），0表示不使用置换表
+AI_QUIESCENCE_DEPTH = 6  # 叶子节点之后只搜吃子的静态搜索最多再搜的层数，0表示不做静态搜索
+AI_QUIESCENCE_CHECKS = False  # 静态搜索第一层是否也搜将军走法
+AI_DELTA_MARGIN = 200  # 静态搜索的Delta剪枝余量（分）
+AI_ATTACK_MAP_CACHE_SIZE = 4096  # 攻击表缓存的局面数
+AI_LAZY_EVAL = True  # 懒惰评估：子力、位置和王安全分超出搜索窗口其余评估项的上界时不再计算其余评估项
+
+# 截图配置
+# 帧源后端: auto（优先mss，回退pyautogui）、mss、pyautogui、replay（图片序列回放）、synthetic（内存合成）
+FRAME_SOURCE_BACKEND = os.environ.get('CHESS_FRAME_SOURCE', 'auto')
+SUPPORTED_FRAME_BACKENDS = ['auto', 'mss', 'pyautogui', 'replay', 'synthetic']
+FRAME_REPLAY_DIR = os.environ.get('CHESS_REPLAY_DIR')  # replay后端默认读取的图片目录
+FRAME_SYNTHETIC_IMAGE = os.environ.get('CHESS_SYNTHETIC_IMAGE')  # synthetic后端默认显示的图片，未设置时为空白画面
+FRAME_SYNTHETIC_SIZE = (1920, 1080)  # synthetic后端空白画面的尺寸 (width, height)
+
+# 识别缓存配置
+RECOGNITION_CACHE_SIZE = 4096  # 感知哈希识别缓存的最大条目数
+RECOGNITION_CACHE_PATH = os.environ.get('CHESS_RECOGNITION_CACHE')  # 识别缓存持久化文件，未设置时不持久化
+
+# 并行识别配置
+RECOGNITION_WORKERS = int(os.environ.get('CHESS_RECOGNITION_WORKERS', '0'))  # 识别工作者数量，0表示CPU核心数，1表示串行
+RECOGNITION_WORKER_MODE = os.environ.get('CHESS_RECOGNITION_WORKER_MODE', 'thread')  # thread（线程池）或process（OCR使用进程池）
 
 # 图像处理配置
 PIECE_SIZE_THRESHOLD = (15, 15)  # 最小棋子尺寸
@@ -0,0 +1,824 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI引擎测试模块
+测试紧凑棋盘、走法生成和局面评估
+"""
+
+import math
+import random
+import threading
+import time
+import unittest
+from typing import List, Optional
+
+import numpy as np
+
+from src.core.ai_engine.compact_board import (
+    CompactBoard, RED, BLACK, KING, HORSE, PAWN,
+    color_of, kind_of, encode_move, occupancy_masks, piece_code, piece_name, pieces_between,
+    position_of, square_of, zobrist_key,
+)
+from src.core.ai_engine.move_generator import (
+    generate_moves, KING_TARGETS, ELEPHANT_TARGETS, HORSE_TARGETS, PAWN_TARGETS,
+)
+from src.core.ai_engine.search_engine import SearchEngine
+from src.core.ai_engine.attack_map import AttackMapCache, batch_attack_counts, build_attack_map, count_attackers
+from src.core.ai_engine.transposition_table import TranspositionTable, BOUND_EXACT, BOUND_LOWER
+from src.core.ai_engine.move_detector import MoveDetector
+from src.core.ai_engine.position_evaluator import PositionEvaluator, FEATURE_NAMES
+from src.core.ai_engine.chess_ai_assistant import ChessAIAssistant
+
+
+def create_initial_board() -> List[List[Optional[str]]]:
+    """创建标准的象棋初始棋盘"""
+    board = [[None for _ in range(9)] for _ in range(10)]
+    board[0] = ['black_chariot', 'black_horse', 'black_elephant', 'black_advisor',
+               'black_king', 'black_advisor', 'black_elephant', 'black_horse', 'black_chariot']
+    board[2][1] = 'black_cannon'
+    board[2][7] = 'black_cannon'
+    board[3] = ['black_pawn', None, 'black_pawn', None, 'black_pawn',
+               None, 'black_pawn', None, 'black_pawn']
+    board[6] = ['red_pawn', None, 'red_pawn', None, 'red_pawn',
+               None, 'red_pawn', None, 'red_pawn']
+    board[7][1] = 'red_cannon'
+    board[7][7] = 'red_cannon'
+    board[9] = ['red_chariot', 'red_horse', 'red_elephant', 'red_advisor',
+               'red_king', 'red_advisor', 'red_elephant', 'red_horse', 'red_chariot']
+    return board
+
+
+def create_middle_game_board() -> List[List[Optional[str]]]:
+    """创建一个中局棋盘：双方各有子力交错，存在吃子和将军的可能"""
+    board = [[None for _ in range(9)] for _ in range(10)]
+    board[0][3] = 'black_advisor'
+    board[0][4] = 'black_king'
+    board[0][8] = 'black_chariot'
+    board[1][4] = 'black_advisor'
+    board[2][2] = 'black_horse'
+    board[2][4] = 'black_elephant'
+    board[2][7] = 'black_cannon'
+    board[3][0] = 'black_pawn'
+    board[3][4] = 'black_pawn'
+    board[4][6] = 'red_pawn'
+    board[5][2] = 'black_pawn'
+    board[5][4] = 'red_horse'
+    board[6][0] = 'red_pawn'
+    board[7][4] = 'red_cannon'
+    board[7][7] = 'red_chariot'
+    board[8][4] = 'red_advisor'
+    board[9][3] = 'red_advisor'
+    board[9][4] = 'red_king'
+    board[9][6] = 'red_elephant'
+    board[9][8] = 'red_chariot'
+    return board
+
+
+def create_poisoned_pawn_board() -> List[List[Optional[str]]]:
+    """红车(5,0)可以吃黑卒(5,6)，但黑车(0,6)随即吃回红车"""
+    board = [[None for _ in range(9)] for _ in range(10)]
+    board[0][3] = 'black_king'
+    board[0][6] = 'black_chariot'
+    board[5][6] = 'black_pawn'
+    board[5][0] = 'red_chariot'
+    board[9][4] = 'red_king'
+    return board
+
+
+def random_playout_positions(count: int, seed: int = 0) -> List[CompactBoard]:
+    """从初始局面随机走子得到的局面，王被吃掉或走满100步后从初始局面重新开始"""
+    rng = random.Random(seed)
+    positions = []
+    board, color = CompactBoard.from_grid(create_initial_board()), RED
+    while len(positions) < count:
+        moves = generate_moves(board, color)
+        if not moves or board.ply >= 100 or board.find(RED | KING) < 0 or board.find(BLACK | KING) < 0:
+            board, color = CompactBoard.from_grid(create_initial_board()), RED
+            continue
+        board.make_move(rng.choice(moves))
+        color ^= RED | BLACK
+        positions.append(board.copy())
+    return positions
+
+
+class TestCompactBoard(unittest.TestCase):
+    """紧凑棋盘测试类"""
+    
+    def test_grid_round_trip(self):
+        board = create_middle_game_board()
+        compact = CompactBoard.from_grid(board)
+        self.assertEqual(compact.to_grid(), board)
+        self.assertEqual([list(row) for row in compact.grid_view()], board)
+    
+    def test_color_and_kind_bits(self):
+        code = piece_code('black_horse')
+        self.assertEqual(color_of(code), BLACK)
+        self.assertEqual(kind_of(code), HORSE)
+        self.assertEqual(piece_name(RED | PAWN), 'red_pawn')
+        # 扫描器无法识别兵种时输出的名称也能往返转换
+        self.assertEqual(piece_name(piece_code('red_piece')), 'red_piece')
+        self.assertEqual(kind_of(piece_code('red_piece')), 0)
+    
+    def test_numpy_view_shares_memory(self):
+        compact = CompactBoard.from_grid(create_initial_board())
+        view = compact.to_numpy()
+        self.assertEqual(view.shape, (10, 9))
+        self.assertEqual(view.dtype, np.int8)
+        self.assertEqual(view[9, 4], RED | KING)
+        
+        view[9, 4] = 0
+        self.assertEqual(compact.at(9, 4), 0)
+    
+    def test_make_unmake_restores_board(self):
+        board = create_middle_game_board()
+        compact = CompactBoard.from_grid(board)
+        original = bytes(compact.squares)
+        
+        made = []
+        for move in generate_moves(compact.squares, RED):
+            captured = compact[move & 0xFF]
+            self.assertEqual(compact.make_move(move), captured)
+            made.append(move)
+            # 每步之后接着走一步对方的棋，验证多层撤销
+            replies = generate_moves(compact.squares, BLACK)
+            if replies:
+                compact.make_move(replies[0])
+                compact.unmake_move()
+            self.assertEqual(compact.unmake_move(), move)
+            self.assertEqual(bytes(compact.squares), original)
+        
+        self.assertTrue(made)
+        self.assertEqual(compact.ply, 0)
+    
+    def test_capture_is_recorded(self):
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        # 红车(7,7)吃黑炮(2,7)
+        move = encode_move(square_of(7, 7), square_of(2, 7))
+        self.assertEqual(compact.make_move(move), piece_code('black_cannon'))
+        self.assertEqual(piece_name(compact.at(2, 7)), 'red_chariot')
+        self.assertEqual(compact.at(7, 7), 0)
+        compact.unmake_move()
+        self.assertEqual(piece_name(compact.at(2, 7)), 'black_cannon')
+    
+    def test_zobrist_key_is_incremental(self):
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        original_key = compact.key
+        for move in generate_moves(compact.squares, RED):
+            compact.make_move(move)
+            self.assertEqual(compact.key, zobrist_key(compact.squares))
+            for reply in generate_moves(compact.squares, BLACK)[:5]:
+                compact.make_move(reply)
+                self.assertEqual(compact.key, zobrist_key(compact.squares))
+                compact.unmake_move()
+            compact.unmake_move()
+            self.assertEqual(compact.key, original_key)
+        
+        compact[square_of(4, 4)] = RED | PAWN
+        self.assertEqual(compact.key, zobrist_key(compact.squares))
+        # 同一布局不同走棋方的键不同
+        self.assertNotEqual(compact.hash_key(RED), compact.hash_key(BLACK))
+    
+    def test_occupancy_masks_are_incremental(self):
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        original = (list(compact.ranks), list(compact.files))
+        for move in generate_moves(compact, RED):
+            compact.make_move(move)
+            self.assertEqual((compact.ranks, compact.files), occupancy_masks(compact.squares))
+            compact.unmake_move()
+        self.assertEqual((compact.ranks, compact.files), original)
+        
+        compact[square_of(4, 4)] = RED | PAWN
+        compact[square_of(0, 0)] = 0
+        self.assertEqual((compact.ranks, compact.files), occupancy_masks(compact.squares))
+    
+    def test_pieces_between(self):
+        compact = CompactBoard.from_grid(create_initial_board())
+        cases = [
+            ((9, 4), (0, 4), 2),   # 帅将之间隔着红兵和黑卒
+            ((7, 1), (0, 1), 1),   # 红炮与黑马之间隔着黑炮
+            ((9, 0), (9, 8), 7),
+            ((9, 0), (9, 1), 0),
+            ((9, 0), (8, 1), 0),   # 不在同一行或列
+        ]
+        for from_pos, to_pos, expected in cases:
+            from_square, to_square = square_of(*from_pos), square_of(*to_pos)
+            # 占用掩码和逐格统计结果一致，与方向无关
+            self.assertEqual(pieces_between(compact, from_square, to_square), expected)
+            self.assertEqual(pieces_between(compact, to_square, from_square), expected)
+            self.assertEqual(pieces_between(compact.squares, from_square, to_square), expected)
+
+
+class TestIntegerEngine(unittest.TestCase):
+    """整数棋盘上的走法生成与评估测试类"""
+    
+    def setUp(self):
+        self.assistant = ChessAIAssistant(player_color='red')
+        self.evaluator = PositionEvaluator()
+        self.detector = MoveDetector()
+    
+    def test_initial_move_count(self):
+        compact = CompactBoard.from_grid(create_initial_board())
+        self.assertEqual(len(generate_moves(compact.squares, RED)), 44)
+        self.assertEqual(len(generate_moves(compact.squares, BLACK)), 44)
+    
+    def test_opponent_moves_respect_own_pieces(self):
+        # 为对方生成走法时不能吃对方自己的棋子
+        board = create_middle_game_board()
+        for move in self.assistant._generate_all_legal_moves(board, 'black'):
+            self.assertFalse(move.captured_piece and move.captured_piece.startswith('black'))
+    
+    def test_generated_moves_pass_legality_check(self):
+        board = create_middle_game_board()
+        compact = CompactBoard.from_grid(board)
+        for color in ('red', 'black'):
+            for move in self.assistant._generate_all_legal_moves(compact, color):
+                self.assertTrue(self.detector._is_legal_move(move.from_pos, move.to_pos, move.piece, board))
+    
+    def test_move_tables(self):
+        # 角上的马只有两个目标格，马腿分别在正下方和正右方
+        self.assertEqual(HORSE_TARGETS[square_of(0, 0)],
+                         {square_of(2, 1): square_of(1, 0), square_of(1, 2): square_of(0, 1)})
+        # 相的目标格不过河，象眼在中间
+        self.assertEqual(ELEPHANT_TARGETS[RED][square_of(5, 2)],
+                         {square_of(7, 0): square_of(6, 1), square_of(7, 4): square_of(6, 3)})
+        # 帅/将只能到达九宫的9个格子
+        for color in (RED, BLACK):
+            self.assertEqual(len({target for targets in KING_TARGETS[color] for target in targets}), 9)
+        # 未过河的兵只能向前，过河后可以左右走
+        self.assertEqual(PAWN_TARGETS[RED][square_of(6, 0)], (square_of(5, 0),))
+        self.assertEqual(set(PAWN_TARGETS[RED][square_of(4, 4)]),
+                         {square_of(3, 4), square_of(4, 3), square_of(4, 5)})
+    
+    def test_blocked_horse_and_elephant(self):
+        board = create_initial_board()
+        # 红马(9,1)跳(7,2)的马腿(8,1)为空，跳(8,3)的马腿(9,2)被红相堵住
+        self.assertTrue(self.detector._is_legal_move((9, 1), (7, 2), 'red_horse', board))
+        self.assertFalse(self.detector._is_legal_move((9, 1), (8, 3), 'red_horse', board))
+        board[8][3] = 'black_pawn'
+        self.assertFalse(self.detector._is_legal_move((9, 2), (7, 4), 'red_elephant', board))
+        self.assertTrue(self.detector._is_legal_move((9, 2), (7, 0), 'red_elephant', board))
+        # 相不能过河
+        self.assertFalse(self.detector._is_legal_move((5, 2), (3, 4), 'red_elephant', board))
+    
+    def test_flying_general(self):
+        board = [[None] * 9 for _ in range(10)]
+        board[0][4] = 'black_king'
+        board[9][4] = 'red_king'
+        board[5][4] = 'red_pawn'
+        compact = CompactBoard.from_grid(board)
+        flying = encode_move(square_of(9, 4), square_of(0, 4))
+        self.assertNotIn(flying, generate_moves(compact, RED))
+        self.assertFalse(self.detector._is_legal_move((9, 4), (0, 4), 'red_king', compact))
+        
+        # 移开中间的兵后将帅照面，帅可以飞将吃王
+        compact[square_of(5, 4)] = 0
+        self.assertIn(flying, generate_moves(compact, RED))
+        self.assertTrue(self.detector._is_legal_move((9, 4), (0, 4), 'red_king', compact))
+        self.assertTrue(self.detector._is_legal_move((0, 4), (9, 4), 'black_king', compact.to_grid()))
+    
+    def test_cannon_check_needs_screen(self):
+        # 红炮(7,4)与黑将(0,4)之间隔着多个棋子，移开后只剩一个炮架时构成将军
+        board = create_middle_game_board()
+        self.assertFalse(self.detector._causes_check((7, 4), 'red_cannon', board))
+        board[3][4] = None
+        board[5][4] = None
+        self.assertFalse(self.detector._causes_check((7, 4), 'red_cannon', board))
+        board[2][4] = None
+        self.assertTrue(self.detector._causes_check((7, 4), 'red_cannon', board))
+    
+    def test_stopped_analysis_until_restarted(self):
+        assistant = self.assistant
+        assistant.stop_analysis()
+        analysis = assistant.update_board_state(create_middle_game_board())
+        self.assertEqual(analysis.recommendations, [])
+        self.assertTrue(assistant.last_search.aborted)
+        
+        assistant.start_analysis()
+        self.assertTrue(assistant.update_board_state(create_middle_game_board()).recommendations)
+    
+    def test_preparation_counts_against_thinking_time(self):
+        assistant = self.assistant
+        assistant.thinking_time = 0.5
+        limits = []
+        search = assistant.search_engine.search
+        assistant.search_engine.search = lambda *args, **kwargs: limits.append(kwargs['time_limit']) or \
+            search(*args, **kwargs)
+        
+        # 静态排序耗时0.2秒，搜索只剩余下的时间
+        order = assistant._static_move_order
+        assistant._static_move_order = lambda: time.sleep(0.2) or order()
+        assistant.update_board_state(create_middle_game_board())
+        self.assertLessEqual(limits[0], 0.3)
+        self.assertGreater(limits[0], 0)
+        
+        # 准备工作已用完思考时间时仍完成深度1的搜索
+        assistant._static_move_order = lambda: time.sleep(0.6) or order()
+        analysis = assistant.update_board_state(create_middle_game_board())
+        self.assertGreater(limits[1], 0)
+        self.assertEqual(assistant.last_search.depth, 1)
+        self.assertTrue(analysis.recommendations)
+    
+    def test_analysis_leaves_board_unchanged(self):
+        board = create_middle_game_board()
+        analysis = self.assistant.update_board_state(board)
+        self.assertTrue(analysis.recommendations)
+        self.assertEqual(bytes(self.assistant.current_compact.squares), bytes(CompactBoard.from_grid(board).squares))
+        self.assertEqual(self.assistant.current_board, board)
+    
+    def test_compact_and_grid_evaluation_agree(self):
+        board = create_middle_game_board()
+        compact = CompactBoard.from_grid(board)
+        for perspective in ('red', 'black'):
+            self.assertEqual(self.evaluator.evaluate_position(board, perspective),
+                             self.evaluator.evaluate_position(compact, perspective))
+    
+    def test_feature_vector_views(self):
+        for board in (create_initial_board(), create_middle_game_board(), create_poisoned_pawn_board()):
+            for perspective in ('red', 'black'):
+                features = self.evaluator.extract_features(board, perspective)
+                self.assertEqual(features.shape, (len(FEATURE_NAMES),))
+                # NumPy批量实现按格子切片计算，与逐个棋子累加的结果互相印证
+                np.testing.assert_allclose(self.evaluator.extract_features_batch([board], perspective)[0], features)
+                
+                # 字典视图与特征向量一致，总分为点积
+                evaluation = self.evaluator.evaluate_position(board, perspective)
+                for name, value in zip(FEATURE_NAMES, features):
+                    self.assertAlmostEqual(evaluation[f'{name}_score'], value)
+                self.assertAlmostEqual(evaluation['total_score'],
+                                       float(np.dot(features, self.evaluator.weight_vector())))
+                self.assertIn('子力优势', self.evaluator.get_evaluation_summary(evaluation))
+    
+    def test_batch_evaluation_matches_single(self):
+        boards = [CompactBoard.from_grid(board) for board in
+                  (create_initial_board(), create_middle_game_board(), create_poisoned_pawn_board())]
+        # 加上中局所有走法的子局面，包括吃子和王被吃掉的局面
+        middle = boards[1]
+        for move in generate_moves(middle, RED):
+            middle.make_move(move)
+            boards.append(middle.copy())
+            middle.unmake_move()
+        
+        stacked = np.stack([board.to_numpy() for board in boards])
+        for perspective in ('red', 'black'):
+            scores, probabilities = self.evaluator.evaluate_batch(stacked, perspective)
+            self.assertEqual(scores.shape, (len(boards),))
+            for board, score, probability in zip(boards, scores, probabilities):
+                expected = self.evaluator.evaluate_score(board, perspective)
+                self.assertAlmostEqual(score, expected, places=6)
+                self.assertAlmostEqual(probability, self.evaluator._score_to_win_probability(expected))
+        
+        scores, _ = self.evaluator.evaluate_batch([])
+        self.assertEqual(len(scores), 0)
+    
+    def test_lazy_evaluation(self):
+        evaluator = self.evaluator
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        full = evaluator.evaluate_score(compact, 'red')
+        features = evaluator.extract_features(compact, 'red')
+        weights = evaluator.weights
+        lazy = (features[0] * weights['material'] + features[1] * weights['position'] +
+                features[3] * weights['king_safety'])
+        
+        calls = []
+        original = evaluator.evaluate_score
+        evaluator.evaluate_score = lambda *args: calls.append(args) or original(*args)
+        try:
+            # 窗口附近完整评估
+            self.assertAlmostEqual(evaluator.evaluate_lazy(compact, 'red', full - 10, full + 10), full)
+            self.assertEqual(len(calls), 1)
+            
+            # 远在窗口之外时只算子力、位置和王安全分
+            margin = evaluator.lazy_margin()
+            self.assertAlmostEqual(evaluator.evaluate_lazy(compact, 'red', lazy + margin + 1, math.inf), lazy)
+            self.assertAlmostEqual(evaluator.evaluate_lazy(compact, 'black', -math.inf, -lazy - margin - 1), -lazy)
+            self.assertEqual(len(calls), 1)
+            
+            # 关闭懒惰评估时总是完整评估
+            evaluator.lazy_eval = False
+            self.assertAlmostEqual(evaluator.evaluate_lazy(compact, 'red', lazy + margin + 1, math.inf), full)
+            self.assertEqual(len(calls), 2)
+        finally:
+            del evaluator.evaluate_score
+    
+    def test_lazy_margin_bounds_skipped_terms(self):
+        evaluator = self.evaluator
+        margin = evaluator.lazy_margin()
+        for board in random_playout_positions(2000):
+            for perspective in ('red', 'black'):
+                full = evaluator.evaluate_score(board, perspective)
+                # 窗口在无穷远处时总是返回懒惰评估的分数
+                lazy = evaluator.evaluate_lazy(board, perspective, math.inf, math.inf)
+                self.assertLessEqual(abs(lazy - full), margin)
+    
+    def test_incremental_material_and_position(self):
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        evaluator = self.evaluator
+        
+        def assert_matches_full_scan():
+            # 从头构造的棋盘在挂接分值表时重新求和
+            for perspective in ('red', 'black'):
+                np.testing.assert_array_equal(evaluator.extract_features(compact, perspective)[:2],
+                                              evaluator.extract_features(compact.squares, perspective)[:2])
+        
+        # 先走一步再挂接分值表，撤销后总和仍然正确
+        first = generate_moves(compact, RED)[0]
+        compact.make_move(first)
+        assert_matches_full_scan()
+        for move in generate_moves(compact, BLACK):
+            compact.make_move(move)
+            assert_matches_full_scan()
+            compact.unmake_move()
+        compact.unmake_move()
+        assert_matches_full_scan()
+        
+        compact[square_of(4, 4)] = RED | PAWN
+        assert_matches_full_scan()
+    
+    def test_current_position_scored_once(self):
+        assistant = self.assistant
+        # 只搜一层，叶节点之后只有吃子，搜索中不会回到当前局面
+        assistant.thinking_time = 0
+        assistant.search_depth = 1
+        
+        board = CompactBoard.from_grid(create_middle_game_board())
+        evaluator = assistant.position_evaluator
+        keys = []
+        original = evaluator.evaluate_score
+        evaluator.evaluate_score = lambda board, *args: keys.append(board.key) or original(board, *args)
+        try:
+            analysis = assistant.update_board_state(create_middle_game_board())
+            assistant._generate_recommendations()
+        finally:
+            del evaluator.evaluate_score
+        # 推荐的改进量都相对于同一个当前分数，当前局面的静态分数只算一次
+        self.assertTrue(analysis.recommendations)
+        self.assertEqual(keys.count(board.key), 1)
+
+
+class TestSearchEngine(unittest.TestCase):
+    """Alpha-Beta搜索测试类"""
+    
+    def setUp(self):
+        self.engine = SearchEngine(PositionEvaluator())
+        self.poisoned_capture = encode_move(square_of(5, 0), square_of(5, 6))
+    
+    def capture_score(self, result) -> float:
+        return next(root_move.score for root_move in result.root_moves if root_move.move == self.poisoned_capture)
+    
+    def test_deeper_search_sees_recapture(self):
+        board = CompactBoard.from_grid(create_poisoned_pawn_board())
+        original = bytes(board.squares)
+        self.engine.quiescence_depth = 0
+        # multi_pv覆盖所有根节点走法，每个走法的分数都是精确值
+        shallow = self.engine.search(board, RED, depth=1, multi_pv=100)
+        result = self.engine.search(board, RED, depth=2, multi_pv=100)
+        
+        # 一层搜索只看到吃卒，两层搜索看到黑车吃回
+        self.assertLess(self.capture_score(result), self.capture_score(shallow) - 500)
+        self.assertNotEqual(result.best_move, self.poisoned_capture)
+        self.assertEqual(len(result.pv), 2)
+        # 搜索结束后棋盘恢复原状
+        self.assertEqual(bytes(board.squares), original)
+        self.assertEqual(board.ply, 0)
+    
+    def test_quiescence_sees_recapture(self):
+        board = CompactBoard.from_grid(create_poisoned_pawn_board())
+        self.engine.quiescence_depth = 0
+        horizon = self.engine.search(board, RED, depth=1, multi_pv=100)
+        self.engine.quiescence_depth = 6
+        quiet = self.engine.search(board, RED, depth=1, multi_pv=100)
+        
+        # 一层搜索加静态搜索就能看到黑车吃回
+        self.assertLess(self.capture_score(quiet), self.capture_score(horizon) - 500)
+        self.assertNotEqual(quiet.best_move, self.poisoned_capture)
+        self.assertEqual(board.ply, 0)
+    
+    def test_quiescence_stands_pat_on_quiet_position(self):
+        board = CompactBoard.from_grid(create_initial_board())
+        # 初始局面有炮打马的吃子，但吃完被车吃回，不吃子的静态分不应被吃子拉低
+        static = self.engine._evaluate(board, RED)
+        score, _ = self.engine._quiescence(board, RED, -1000000, 1000000, 0, 0)
+        self.assertGreaterEqual(score, static)
+        self.assertEqual(board.ply, 0)
+    
+    def test_multi_pv_scores_are_exact(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        result = self.engine.search(board, RED, depth=2, multi_pv=3)
+        for root_move in result.root_moves[:3]:
+            board.make_move(root_move.move)
+            exact = -self.engine.search(board, BLACK, depth=1).score
+            board.unmake_move()
+            self.assertAlmostEqual(root_move.score, exact)
+    
+    def test_iterative_deepening_matches_fixed_depth(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        result = self.engine.search(board, RED, depth=3, time_limit=0, node_limit=0)
+        self.assertEqual(result.depth, 3)
+        self.assertFalse(result.aborted)
+        
+        # 逐层加深只改变根节点搜索顺序，不改变最佳分数
+        fixed = SearchEngine(PositionEvaluator())
+        fixed_root = fixed._search_root(board, RED, 3, 1)
+        self.assertAlmostEqual(result.score, fixed_root[0].score)
+    
+    def test_time_budget(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        result = self.engine.search(board, RED, depth=30, time_limit=0.2, node_limit=0)
+        self.assertLess(result.depth, 30)
+        self.assertGreaterEqual(result.depth, 1)
+        self.assertIsNotNone(result.best_move)
+        self.assertLess(result.elapsed, 0.6)
+        self.assertEqual(board.ply, 0)
+    
+    def test_node_budget(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        # 不用置换表，否则第二次搜索会取用中止那一轮留下的更深的结果
+        self.engine = SearchEngine(PositionEvaluator(), hash_size_mb=0)
+        result = self.engine.search(board, RED, depth=30, time_limit=0, node_limit=3000)
+        self.assertTrue(result.aborted)
+        self.assertLessEqual(result.nodes, 3000)
+        self.assertIsNotNone(result.best_move)
+        
+        # 预算耗尽时返回最后一轮完整搜索的结果
+        completed = self.engine.search(board, RED, depth=result.depth, time_limit=0, node_limit=0)
+        self.assertAlmostEqual(result.score, completed.score)
+    
+    def test_stop_from_another_thread(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        timer = threading.Timer(0.1, self.engine.stop)
+        timer.start()
+        try:
+            result = self.engine.search(board, RED, depth=30, time_limit=0, node_limit=0)
+        finally:
+            timer.cancel()
+        self.assertTrue(result.aborted)
+        self.assertIsNotNone(result.best_move)
+    
+    def test_stop_persists_until_reset(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        # 停止请求先于搜索到达时不会被新的搜索清除
+        self.engine.stop()
+        result = self.engine.search(board, RED, depth=3, time_limit=0, node_limit=0)
+        self.assertTrue(result.aborted)
+        self.assertIsNone(result.best_move)
+        self.assertEqual(result.nodes, 0)
+        
+        self.engine.reset_stop()
+        result = self.engine.search(board, RED, depth=2, time_limit=0, node_limit=0)
+        self.assertFalse(result.aborted)
+        self.assertEqual(result.depth, 2)
+    
+    def test_stop_during_first_iteration(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        full = self.engine.search(board, RED, depth=1, time_limit=0, node_limit=0)
+        
+        # 第一轮不因预算中止，但停止请求立即生效
+        self.engine.check_interval = 1
+        evaluator = self.engine.evaluator
+        original = evaluator.evaluate_lazy
+        evaluator.evaluate_lazy = lambda *args: self.engine.stop() or original(*args)
+        try:
+            result = self.engine.search(board, RED, depth=1, time_limit=0, node_limit=0)
+        finally:
+            del evaluator.evaluate_lazy
+        self.assertTrue(result.aborted)
+        self.assertEqual(result.depth, 0)
+        self.assertLess(result.nodes, full.nodes)
+        self.assertEqual(board.ply, 0)
+    
+    def test_lazy_evaluation_keeps_best_move(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        exact_evaluator = PositionEvaluator()
+        exact_evaluator.lazy_eval = False
+        exact = SearchEngine(exact_evaluator).search(board, RED, depth=3, time_limit=0, node_limit=0)
+        lazy = self.engine.search(board, RED, depth=3, time_limit=0, node_limit=0)
+        self.assertEqual(lazy.best_move, exact.best_move)
+        self.assertAlmostEqual(lazy.score, exact.score)
+    
+    def test_move_ordering(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        squares = board.squares
+        moves = generate_moves(squares, RED)
+        quiet = next(move for move in moves if not squares[move & 0xFF])
+        self.engine.search(board, RED, depth=1)
+        ordered = self.engine._order_moves(squares, moves, RED, quiet, 0)
+        
+        self.assertEqual(sorted(ordered), sorted(moves))
+        self.assertEqual(ordered[0], quiet)
+        # 置换表走法之后是吃子，被吃棋子价值从高到低
+        values = self.engine.evaluator.piece_values
+        captures = [move for move in ordered[1:] if squares[move & 0xFF]]
+        self.assertEqual(ordered[1:1 + len(captures)], captures)
+        victims = [values[piece_name(squares[move & 0xFF])] for move in captures]
+        self.assertEqual(victims, sorted(victims, reverse=True))
+    
+    def test_cutoff_statistics(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        result = self.engine.search(board, RED, depth=3, time_limit=0, node_limit=0)
+        self.assertGreater(result.cutoffs, 0)
+        self.assertLessEqual(result.first_move_cutoffs, result.cutoffs)
+        # 良好的走法排序使大多数截断发生在第一个走法
+        self.assertGreater(result.first_move_cutoffs, result.cutoffs * 0.8)
+    
+    def test_recommendations_use_configured_depth(self):
+        assistant = ChessAIAssistant(player_color='red')
+        assistant.thinking_time = 0
+        assistant.search_depth = 2
+        analysis = assistant.update_board_state(create_poisoned_pawn_board())
+        self.assertEqual(assistant.last_search.depth, 2)
+        self.assertLessEqual(len(analysis.recommendations), assistant.max_recommendations)
+        self.assertNotEqual(analysis.recommendations[0].move.to_pos, (5, 6))
+        scores = [recommendation.score for recommendation in analysis.recommendations]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+class TestTranspositionTable(unittest.TestCase):
+    """置换表测试类"""
+    
+    def test_store_and_probe(self):
+        table = TranspositionTable(1)
+        key = 0x123456789ABCDEF0
+        self.assertIsNone(table.probe(key))
+        table.store(key, 3, BOUND_EXACT, -12.5, encode_move(1, 2))
+        entry = table.probe(key)
+        self.assertEqual((entry.depth, entry.bound, entry.score, entry.move),
+                         (3, BOUND_EXACT, -12.5, encode_move(1, 2)))
+        # 索引相同但键不同
+        self.assertIsNone(table.probe(key ^ (1 << 63)))
+    
+    def test_size_cap(self):
+        table = TranspositionTable(1)
+        self.assertLessEqual(table.capacity * 24, 1024 * 1024)
+        self.assertEqual(table.capacity & (table.capacity - 1), 0)
+    
+    def test_depth_preferred_replacement(self):
+        table = TranspositionTable(1)
+        key = 42
+        other = key + table.capacity  # 映射到同一个位置
+        table.store(key, 5, BOUND_EXACT, 1.0, 0)
+        table.store(other, 2, BOUND_LOWER, 2.0, 0)
+        self.assertEqual(table.probe(key).depth, 5)
+        self.assertIsNone(table.probe(other))
+        
+        # 新一次搜索中旧表项可以被替换
+        table.new_search()
+        table.store(other, 2, BOUND_LOWER, 2.0, 0)
+        self.assertIsNone(table.probe(key))
+        self.assertEqual(table.probe(other).score, 2.0)
+    
+    def test_consecutive_searches_reuse_table(self):
+        board = CompactBoard.from_grid(create_middle_game_board())
+        engine = SearchEngine(PositionEvaluator())
+        first = engine.search(board, RED, depth=3, time_limit=0, node_limit=0)
+        second = engine.search(board, RED, depth=3, time_limit=0, node_limit=0)
+        self.assertLess(second.nodes, first.nodes / 2)
+        self.assertEqual(second.best_move, first.best_move)
+        self.assertAlmostEqual(second.score, first.score)
+        
+        without_table = SearchEngine(PositionEvaluator(), hash_size_mb=0)
+        self.assertIsNone(without_table.transposition_table)
+        self.assertEqual(without_table.search(board, RED, depth=3, time_limit=0, node_limit=0).best_move,
+                         first.best_move)
+
+
+class TestAttackMap(unittest.TestCase):
+    """攻击表测试类"""
+    
+    def setUp(self):
+        self.detector = MoveDetector()
+    
+    def test_counts_match_legality_checks(self):
+        for board in (create_initial_board(), create_middle_game_board(), create_poisoned_pawn_board()):
+            compact = CompactBoard.from_grid(board)
+            attack_map = build_attack_map(compact.squares, compact.ranks, compact.files)
+            for target, _ in compact.pieces():
+                for color in (RED, BLACK):
+                    expected = sum(
+                        1 for square, code in compact.pieces(color)
+                        if square != target and self.detector._is_legal_move(
+                            position_of(square), position_of(target), code, compact)
+                    )
+                    self.assertEqual(attack_map.attackers(target, color), expected)
+    
+    def test_move_counts_match_generator(self):
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        boards = [CompactBoard.from_grid(create_initial_board()), compact.copy()]
+        for move in generate_moves(compact, RED):
+            compact.make_move(move)
+            boards.append(compact.copy())
+            compact.unmake_move()
+        
+        for board in boards:
+            attack_map = build_attack_map(board.squares, board.ranks, board.files)
+            for color in (RED, BLACK):
+                self.assertEqual(attack_map.move_count(color), len(generate_moves(board, color)))
+    
+    def test_occupied_squares_follow_moves(self):
+        for board in random_playout_positions(300, seed=2):
+            self.assertEqual(board.occupied(), [square for square, code in enumerate(board.squares) if code])
+    
+    def test_count_attackers_matches_attack_map(self):
+        boards = [CompactBoard.from_grid(create_middle_game_board())] + random_playout_positions(300, seed=1)
+        for board in boards:
+            attack_map = build_attack_map(board.squares, board.ranks, board.files)
+            for target, _ in board.pieces():
+                for color in (RED, BLACK):
+                    self.assertEqual(count_attackers(board.squares, board.ranks, board.files, target, color),
+                                     attack_map.attackers(target, color))
+    
+    def test_mobility_uses_real_move_counts(self):
+        evaluator = PositionEvaluator()
+        mobility = FEATURE_NAMES.index('mobility')
+        self.assertEqual(evaluator.extract_features(create_initial_board(), 'red')[mobility], 0)
+        
+        # 堵住红方左马的马腿后，红方的走法比黑方少
+        board = create_initial_board()
+        board[8][1] = 'black_pawn'
+        compact = CompactBoard.from_grid(board)
+        expected = (len(generate_moves(compact, RED)) - len(generate_moves(compact, BLACK))) * 2
+        self.assertEqual(evaluator.extract_features(board, 'red')[mobility], expected)
+        self.assertEqual(evaluator.extract_features(board, 'black')[mobility], -expected)
+        self.assertLess(expected, 0)
+    
+    def test_batch_counts_match_attack_map(self):
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        boards = [CompactBoard.from_grid(create_initial_board()), compact.copy()]
+        for color in (RED, BLACK):
+            for move in generate_moves(compact, color):
+                compact.make_move(move)
+                boards.append(compact.copy())
+                compact.unmake_move()
+        
+        codes = np.stack([board.to_numpy().reshape(-1) for board in boards]).astype(np.intp)
+        move_counts, king_attackers = batch_attack_counts(codes)
+        for index, board in enumerate(boards):
+            attack_map = build_attack_map(board.squares, board.ranks, board.files)
+            for column, color in enumerate((RED, BLACK)):
+                self.assertEqual(move_counts[index, column], attack_map.move_count(color))
+                king = board.find(color | KING)
+                expected = attack_map.attackers(king, color ^ (RED | BLACK)) if king >= 0 else 0
+                self.assertEqual(king_attackers[index, column], expected)
+    
+    def test_batch_mobility_matches_scalar(self):
+        evaluator = PositionEvaluator()
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        boards = [CompactBoard.from_grid(create_initial_board()), compact.copy()]
+        for move in generate_moves(compact, BLACK):
+            compact.make_move(move)
+            boards.append(compact.copy())
+            compact.unmake_move()
+        
+        mobility = FEATURE_NAMES.index('mobility')
+        for perspective, sign in (('red', 1), ('black', -1)):
+            features = evaluator.extract_features_batch(boards, perspective)
+            for board, row in zip(boards, features):
+                expected = (len(generate_moves(board, RED)) - len(generate_moves(board, BLACK))) * 2 * sign
+                self.assertEqual(row[mobility], expected)
+                np.testing.assert_allclose(row, evaluator.extract_features(board, perspective))
+    
+    def test_cache_by_position_hash(self):
+        cache = AttackMapCache(capacity=2)
+        compact = CompactBoard.from_grid(create_middle_game_board())
+        first = cache.get(compact)
+        self.assertIs(cache.get(compact), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        
+        # 走子后是另一个局面，悔棋后重新命中
+        compact.make_move(generate_moves(compact, RED)[0])
+        self.assertIsNot(cache.get(compact), first)
+        compact.unmake_move()
+        self.assertIs(cache.get(compact), first)
+        
+        compact.make_move(generate_moves(compact, BLACK)[0])
+        cache.get(compact)
+        compact.unmake_move()
+        self.assertEqual(len(cache), 2)
+    
+    def test_threat_analysis_reads_attack_map(self):
+        # 黑马(3,3)攻击红车(5,4)，红车攻击黑炮(5,8)
+        board = [[None] * 9 for _ in range(10)]
+        board[0][3] = 'black_king'
+        board[3][3] = 'black_horse'
+        board[5][8] = 'black_cannon'
+        board[5][4] = 'red_chariot'
+        board[9][4] = 'red_king'
+        assistant = ChessAIAssistant(player_color='red')
+        assistant.update_board_state(board)
+        
+        # 分析时当前局面的攻击表已在缓存中，不再重新计算
+        attack_maps = assistant.position_evaluator.attack_maps
+        misses = attack_maps.misses
+        self.assertEqual(assistant._find_threatened_pieces('chariot'), [(5, 4)])
+        self.assertIn('chariot受到威胁', assistant._analyze_threats())
+        self.assertIn('可以吃掉对方cannon', assistant._analyze_opportunities())
+        self.assertEqual(attack_maps.misses, misses)
+        
+        # 王安全按攻击表计算：黑马跳到(7,5)后攻击红帅
+        evaluator = assistant.position_evaluator
+        before = evaluator.evaluate_position(board, 'red')['king_safety_score']
+        board[3][3], board[7][5] = None, 'black_horse'
+        self.assertEqual(evaluator.evaluate_position(board, 'red')['king_safety_score'], before - 30 * 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描识别流水线测试模块
+使用合成画面和图片回放帧源，在无显示环境下测试棋盘扫描和棋子识别
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from src.core.vision.frame_source import (
+    FrameSource, SyntheticFrameSource, ImageSequenceFrameSource, create_frame_source, crop_region
+)
+from src.core.vision.template_bank import TemplateBank
+from src.core.vision.image_utils import ImageUtils
+from src.core.vision.color_map import BoardColorMap
+from src.core.vision.ocr_service import OCRBox, OCRRecognizer, OCRService
+from src.core.vision.recognition_cache import RecognitionCache
+from src.core.scanner.advanced_chess_scanner import AdvancedChessScanner
+from src.utils.config import FRAME_SYNTHETIC_SIZE, SUPPORTED_FRAME_BACKENDS
+
+# 合成棋盘的几何参数：每格60像素，棋子图像30x30
+BOARD_REGION = (40, 40, 540, 600)
+CELL_SIZE = 60
+PATCH_SIZE = 30
+BOARD_BACKGROUND = (140, 190, 220)  # 木色背景（BGR）
+
+PIECE_KINDS = ['king', 'advisor', 'elephant', 'horse', 'chariot', 'cannon', 'pawn']
+
+
+def make_piece_patch(piece: str) -> np.ndarray:
+    """生成合成棋子图像：带颜色的圆盘加上每种棋子独有的纹理"""
+    color, kind = piece.split('_', 1)
+    patch = np.full((PATCH_SIZE, PATCH_SIZE, 3), BOARD_BACKGROUND, dtype=np.uint8)
+    disc_color = (30, 30, 200) if color == 'red' else (20, 20, 20)
+    center = (PATCH_SIZE // 2, PATCH_SIZE // 2)
+    cv2.circle(patch, center, PATCH_SIZE // 2 - 1, disc_color, -1)
+    
+    # 每种棋子使用固定种子的纹理，模拟不同的字形
+    rng = np.random.RandomState(PIECE_KINDS.index(kind) + (0 if color == 'red' else 100))
+    texture = rng.randint(0, 2, size=(6, 6)).astype(np.uint8) * 255
+    texture = cv2.resize(texture, (14, 14), interpolation=cv2.INTER_NEAREST)
+    glyph = patch[8:22, 8:22]
+    glyph[texture > 0] = (230, 230, 230)
+    return patch
+
+
+def render_board(board: List[List[Optional[str]]],
+                 frame_size=(720, 680)) -> np.ndarray:
+    """把棋盘状态渲染成一帧合成截图"""
+    frame = np.full((frame_size[0], frame_size[1], 3), BOARD_BACKGROUND, dtype=np.uint8)
+    x, y, _, _ = BOARD_REGION
+    
+    # 画出棋盘网格线
+    for row in range(10):
+        cv2.line(frame, (x, y + row * CELL_SIZE), (x + 8 * CELL_SIZE, y + row * CELL_SIZE), (40, 60, 80), 1)
+    for col in range(9):
+        cv2.line(frame, (x + col * CELL_SIZE, y), (x + col * CELL_SIZE, y + 9 * CELL_SIZE), (40, 60, 80), 1)
+    
+    for row in range(10):
+        for col in range(9):
+            piece = board[row][col]
+            if piece is None:
+                continue
+            px = x + col * CELL_SIZE - PATCH_SIZE // 2
+            py = y + row * CELL_SIZE - PATCH_SIZE // 2
+            frame[py:py + PATCH_SIZE, px:px + PATCH_SIZE] = make_piece_patch(piece)
+    
+    return frame
+
+
+def create_initial_board() -> List[List[Optional[str]]]:
+    """创建标准的象棋初始棋盘"""
+    board = [[None for _ in range(9)] for _ in range(10)]
+    board[0] = ['black_chariot', 'black_horse', 'black_elephant', 'black_advisor',
+               'black_king', 'black_advisor', 'black_elephant', 'black_horse', 'black_chariot']
+    board[2][1] = 'black_cannon'
+    board[2][7] = 'black_cannon'
+    board[3] = ['black_pawn', None, 'black_pawn', None, 'black_pawn',
+               None, 'black_pawn', None, 'black_pawn']
+    board[6] = ['red_pawn', None, 'red_pawn', None, 'red_pawn',
+               None, 'red_pawn', None, 'red_pawn']
+    board[7][1] = 'red_cannon'
+    board[7][7] = 'red_cannon'
+    board[9] = ['red_chariot', 'red_horse', 'red_elephant', 'red_advisor',
+               'red_king', 'red_advisor', 'red_elephant', 'red_horse', 'red_chariot']
+    return board
+
+
+class CountingFrameSource(FrameSource):
+    """统计截图次数的帧源包装"""
+    
+    def __init__(self, source: FrameSource):
+        self.source = source
+        self.grab_count = 0
+    
+    def grab(self, region=None):
+        self.grab_count += 1
+        return self.source.grab(region)
+
+
+class StubRecognizer(OCRRecognizer):
+    """本地桩识别器：按拼接图的网格在每个小块中心返回指定文字"""
+    
+    def __init__(self, text_for_tile, tile_size=(48, 48), padding=16, columns=10):
+        self.text_for_tile = text_for_tile
+        self.tile_size = tile_size
+        self.padding = padding
+        self.columns = columns
+        self.montages = []
+    
+    def recognize(self, image):
+        self.montages.append(image)
+        tile_width, tile_height = self.tile_size
+        boxes = []
+        index = 0
+        for top in range(self.padding, image.shape[0] - tile_height + 1, tile_height + self.padding):
+            for left in range(self.padding, image.shape[1] - tile_width + 1, tile_width + self.padding):
+                # 空白小块（拼接图末尾的补位）没有任何黑色像素
+                if np.all(image[top:top + tile_height, left:left + tile_width] == 255):
+                    continue
+                text = self.text_for_tile(index)
+                index += 1
+                for i, char in enumerate(text):
+                    char_left = left + 4 + i * 14
+                    boxes.append(OCRBox(char, char_left, top + 10, char_left + 12, top + 38))
+        return boxes
+
+
+def pawn_text(index: int) -> str:
+    """所有小块都识别为"兵"（模块级函数，可以被pickle传给工作进程）"""
+    return '兵'
+
+
+class TestScannerPipeline(unittest.TestCase):
+    """扫描流水线测试基类"""
+    
+    def setUp(self):
+        """在临时目录中创建扫描器，避免模板目录写入工作区"""
+        self.original_cwd = os.getcwd()
+        self.work_dir = tempfile.mkdtemp()
+        os.chdir(self.work_dir)
+        
+        self.initial_board = create_initial_board()
+        self.frame_source = CountingFrameSource(SyntheticFrameSource(render_board(self.initial_board)))
+        
+        self.scanner = AdvancedChessScanner(frame_source=self.frame_source)
+        self.scanner.templates = {
+            f"{color}_{kind}": make_piece_patch(f"{color}_{kind}")
+            for color in ('red', 'black') for kind in PIECE_KINDS
+        }
+        self.scanner.set_scan_region(BOARD_REGION)
+    
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class TestFrameSources(TestScannerPipeline):
+    """帧源测试类"""
+    
+    def test_crop_region_clamps_to_frame(self):
+        """测试区域裁剪超出边界时自动截断"""
+        frame = np.zeros((100, 80, 3), dtype=np.uint8)
+        self.assertEqual(crop_region(frame, (70, 90, 20, 20)).shape[:2], (10, 10))
+        self.assertEqual(crop_region(frame, (-10, -10, 20, 20)).shape[:2], (10, 10))
+        self.assertIs(crop_region(frame, None), frame)
+    
+    def test_image_sequence_replay(self):
+        """测试图片序列回放帧源"""
+        moved_board = [row[:] for row in self.initial_board]
+        moved_board[5][0], moved_board[6][0] = 'red_pawn', None
+        
+        for i, board in enumerate([self.initial_board, moved_board]):
+            cv2.imwrite(os.path.join(self.work_dir, f"frame_{i:03d}.png"), render_board(board))
+        
+        source = ImageSequenceFrameSource(self.work_dir, advance_on_grab=True)
+        self.assertEqual(len(source), 2)
+        
+        self.scanner.set_frame_source(source)
+        self.assertEqual(self.scanner.scan_board(), self.initial_board)
+        self.assertEqual(self.scanner.scan_board(), moved_board)
+    
+    def test_create_every_backend(self):
+        """测试配置中列出的每个后端都能按名称创建"""
+        cv2.imwrite(os.path.join(self.work_dir, "frame_000.png"), render_board(self.initial_board))
+        
+        for backend in SUPPORTED_FRAME_BACKENDS:
+            with self.subTest(backend=backend):
+                kwargs = {'images': self.work_dir} if backend == 'replay' else {}
+                try:
+                    source = create_frame_source(backend, **kwargs)
+                except ImportError:
+                    # mss/pyautogui未安装或没有显示环境
+                    self.assertIn(backend, ('auto', 'mss', 'pyautogui'))
+                    continue
+                self.assertIsInstance(source, FrameSource)
+                source.close()
+        
+        # synthetic后端不传参数时提供空白画面，可以直接用于无显示环境
+        frame = create_frame_source('synthetic').grab((0, 0, 100, 50))
+        self.assertEqual(frame.shape, (50, 100, 3))
+        width, height = FRAME_SYNTHETIC_SIZE
+        self.assertEqual(create_frame_source('synthetic').grab().shape, (height, width, 3))
+
+
+class TestBoardScanning(TestScannerPipeline):
+    """棋盘扫描测试类"""
+    
+    def test_scan_recognizes_initial_board(self):
+        """测试合成画面中的初始棋盘识别"""
+        board = self.scanner.scan_board()
+        self.assertEqual(board, self.initial_board, "合成初始棋盘应该被完整识别")
+    
+    def test_single_frame_capture(self):
+        """测试每次扫描只截图一次"""
+        self.scanner.scan_board()
+        self.assertEqual(self.frame_source.grab_count, 1, "单帧模式下每次扫描只应截图一次")
+    
+    def test_piece_images_are_frame_views(self):
+        """测试棋子图像是同一帧的视图"""
+        frame = render_board(self.initial_board)
+        cell_width, cell_height = self.scanner._update_board_positions(BOARD_REGION)
+        piece_images = self.scanner.extract_piece_images(frame, (0, 0), cell_width, cell_height)
+        
+        self.assertEqual(len(piece_images), 90)
+        for image in piece_images.values():
+            self.assertTrue(np.shares_memory(image, frame), "棋子图像应该是帧的视图")
+        self.assertEqual(piece_images[(4, 4)].shape[:2], (PATCH_SIZE, PATCH_SIZE))
+    
+    
+    def test_unchanged_cells_are_reused(self):
+        """测试画面未变化的格子复用上一次的识别结果"""
+        self.scanner.scan_board()
+        self.assertEqual(self.scanner.last_scan_stats['recognized'], 90)
+        
+        # 画面不变时不应重新识别任何格子
+        self.assertEqual(self.scanner.scan_board(), self.initial_board)
+        self.assertEqual(self.scanner.last_scan_stats['recognized'], 0)
+        self.assertEqual(self.scanner.last_scan_stats['reused'], 90)
+        
+        # 普通走子只改变两个格子
+        moved_board = [row[:] for row in self.initial_board]
+        moved_board[5][0], moved_board[6][0] = 'red_pawn', None
+        self.frame_source.source.set_frame(render_board(moved_board))
+        
+        self.assertEqual(self.scanner.scan_board(), moved_board)
+        self.assertEqual(self.scanner.last_scan_stats['recognized'], 2, "走子后只应重新识别两个格子")
+    
+    def test_empty_cells_short_circuit(self):
+        """测试空交叉点在识别前被直接排除"""
+        calls = []
+        original = self.scanner._recognize_without_template
+        self.scanner._recognize_without_template = lambda image, *args: calls.append(image) or original(image, *args)
+        
+        self.assertEqual(self.scanner.scan_board(), self.initial_board)
+        self.assertTrue(self.scanner.empty_classifier.calibrated, "扫描后应该完成背景校准")
+        self.assertEqual(self.scanner.last_scan_stats['empty'], 90 - 32, "所有空位都应被预分类器排除")
+        self.assertEqual(len(calls), 0, "空位不应进入OCR和颜色检测")
+        
+        # 单格识别接口同样先判断空位
+        frame = render_board(self.initial_board)
+        piece_images = self.scanner.extract_piece_images(frame, (0, 0), CELL_SIZE, CELL_SIZE)
+        self.assertIsNone(self.scanner.recognize_piece(piece_images[(4, 4)]))
+        self.assertEqual(len(calls), 0)
+    
+    def test_region_change_resets_cache(self):
+        """测试扫描区域变化后缓存失效"""
+        self.scanner.scan_board()
+        self.scanner.set_scan_region((41, 40, 540, 600))
+        self.scanner.scan_board()
+        self.assertEqual(self.scanner.last_scan_stats['reused'], 0)
+
+
+
+class TestTemplateBank(TestScannerPipeline):
+    """模板库测试类"""
+    
+    def test_templates_prepared_once_per_size(self):
+        """测试同一尺寸的模板只处理一次"""
+        bank = TemplateBank({'red_king': make_piece_patch('red_king')})
+        prepared = bank.get((20, 20))
+        
+        self.assertIs(bank.get((20, 20)), prepared, "相同尺寸应该复用缓存的模板")
+        self.assertEqual(prepared.images[0].shape[:2], (20, 20))
+        self.assertEqual(prepared.vectors.shape, (1, 20 * 20 * 3))
+        
+        bank.invalidate()
+        self.assertIsNot(bank.get((20, 20)), prepared, "失效后应该重新生成模板")
+    
+    def test_scanner_invalidates_bank_on_region_change(self):
+        """测试扫描区域变化时模板库失效"""
+        self.scanner.scan_board()
+        prepared = self.scanner.template_bank.get((PATCH_SIZE, PATCH_SIZE))
+        self.assertEqual(len(prepared.names), 14)
+        
+        self.scanner.scan_board()
+        self.assertIs(self.scanner.template_bank.get((PATCH_SIZE, PATCH_SIZE)), prepared)
+        
+        self.scanner.set_scan_region((41, 40, 540, 600))
+        self.scanner.scan_board()
+        self.assertIsNot(self.scanner.template_bank.get((PATCH_SIZE, PATCH_SIZE)), prepared)
+    
+    
+    def test_batch_match_agrees_with_single_match(self):
+        """测试批量模板匹配与逐格模板匹配结果一致"""
+        frame = render_board(self.initial_board)
+        cell_width, cell_height = self.scanner._update_board_positions(BOARD_REGION)
+        piece_images = self.scanner.extract_piece_images(frame, (0, 0), cell_width, cell_height)
+        
+        batch_results = self.scanner.template_match_batch(piece_images)
+        for position, piece_image in piece_images.items():
+            self.assertEqual(batch_results[position][0], self.scanner.template_match_piece(piece_image))
+        
+        # 批量NCC分数应等于cv2.matchTemplate的TM_CCOEFF_NORMED结果
+        image = piece_images[(9, 1)]
+        template = self.scanner.template_bank.get((PATCH_SIZE, PATCH_SIZE)).images[0]
+        expected = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)[0, 0]
+        _, confidence, _ = ImageUtils.batch_template_match([image], [template])[0]
+        self.assertAlmostEqual(confidence, float(expected), places=4)
+
+
+class TestColorClassification(TestScannerPipeline):
+    """整盘颜色识别测试类"""
+    
+    def test_color_map_agrees_with_patch_detection(self):
+        """测试积分图颜色判定与逐格颜色检测一致"""
+        frame = render_board(self.initial_board)
+        cell_width, cell_height = self.scanner._update_board_positions(BOARD_REGION)
+        piece_bounds = self.scanner._get_piece_bounds(frame.shape, (0, 0), cell_width, cell_height)
+        
+        color_map = BoardColorMap(frame, self.scanner.color_ranges)
+        colors = color_map.classify_cells(piece_bounds)
+        for (row, col), (left, top, right, bottom) in piece_bounds.items():
+            expected = self.scanner.detect_piece_color(frame[top:bottom, left:right])
+            self.assertEqual(colors[(row, col)], expected)
+            
+            piece = self.initial_board[row][col]
+            self.assertEqual(colors[(row, col)], piece.split('_')[0] if piece else None)
+    
+    def test_red_hue_wrap_around(self):
+        """测试色调接近180的红色也被识别为红色"""
+        patch = np.zeros((PATCH_SIZE, PATCH_SIZE, 3), dtype=np.uint8)
+        patch[:] = cv2.cvtColor(np.array([[[175, 200, 200]]], dtype=np.uint8), cv2.COLOR_HSV2BGR)[0, 0]
+        
+        color_map = BoardColorMap(patch, self.scanner.color_ranges)
+        self.assertEqual(color_map.classify((0, 0, PATCH_SIZE, PATCH_SIZE)), 'red')
+        self.assertEqual(self.scanner.detect_piece_color(patch), 'red')
+    
+    def test_color_narrows_template_matching(self):
+        """测试已知颜色时只与该颜色的模板匹配"""
+        size = (PATCH_SIZE, PATCH_SIZE)
+        red_templates = self.scanner.template_bank.get(size, 'red')
+        self.assertEqual(len(red_templates.names), 7)
+        self.assertTrue(all(name.startswith('red_') for name in red_templates.names))
+        self.assertIs(self.scanner.template_bank.get(size, 'red'), red_templates)
+        
+        # 颜色与模板不符时不应匹配到另一种颜色的棋子
+        image = make_piece_patch('black_king')
+        self.assertEqual(self.scanner.template_match_piece(image, 'black'), 'black_king')
+        self.assertNotIn(self.scanner.template_match_piece(image, 'red'), ('black_king',))
+        
+        results = self.scanner.template_match_batch({(0, 0): image}, {(0, 0): 'black'})
+        self.assertEqual(results[(0, 0)][0], 'black_king')
+
+
+class TestBatchedOCR(TestScannerPipeline):
+    """批量OCR测试类"""
+    
+    def test_boxes_are_mapped_back_to_cells(self):
+        """测试拼接图中的字符框被分配回对应的格子"""
+        texts = ['车', '', '马炮']
+        service = OCRService(StubRecognizer(lambda index: texts[index]))
+        images = {
+            (0, 0): make_piece_patch('red_chariot'),
+            (0, 1): make_piece_patch('red_horse'),
+            (5, 5): make_piece_patch('black_cannon')
+        }
+        
+        results = service.recognize_cells(images)
+        self.assertEqual(results, {(0, 0): '车', (5, 5): '马炮'})
+        self.assertEqual(service.calls, 1)
+        self.assertEqual(len(service.recognizer.montages), 1, "多个格子应只调用一次OCR")
+    
+    def test_scan_runs_one_ocr_call_for_unresolved_cells(self):
+        """测试模板缺失时每帧只调用一次OCR"""
+        # 去掉所有红方模板，红方棋子只能通过OCR识别
+        self.scanner.templates = {
+            name: template for name, template in self.scanner.templates.items()
+            if name.startswith('black_')
+        }
+        recognizer = StubRecognizer(lambda index: '兵')
+        self.scanner.ocr_service.set_recognizer(recognizer)
+        self.scanner.set_recognition_workers(1)
+        
+        board = self.scanner.scan_board()
+        self.assertEqual(len(recognizer.montages), 1)
+        self.assertEqual(self.scanner.ocr_service.last_batch_size, 16)
+        for row in range(10):
+            for col in range(9):
+                piece = self.initial_board[row][col]
+                expected = 'red_pawn' if piece and piece.startswith('red_') else piece
+                self.assertEqual(board[row][col], expected)
+
+
+class TestRecognitionCache(TestScannerPipeline):
+    """感知哈希识别缓存测试类"""
+    
+    def test_moved_piece_hits_cache(self):
+        """测试棋子移动到新交叉点后直接使用缓存结果"""
+        self.scanner.scan_board()
+        
+        calls = []
+        original = self.scanner.template_match_batch
+        self.scanner.template_match_batch = lambda images, *args: calls.append(len(images)) or original(images, *args)
+        
+        moved_board = [row[:] for row in self.initial_board]
+        moved_board[5][0], moved_board[6][0] = 'red_pawn', None
+        self.frame_source.source.set_frame(render_board(moved_board))
+        
+        self.assertEqual(self.scanner.scan_board(), moved_board)
+        self.assertEqual(self.scanner.last_scan_stats['cached'], 1)
+        self.assertEqual(calls, [0], "缓存命中的格子不应再做模板匹配")
+        
+        # 单格识别接口同样先查询缓存
+        self.assertEqual(self.scanner.recognize_piece(make_piece_patch('black_horse')), 'black_horse')
+    
+    def test_same_glyph_different_color(self):
+        """测试同形不同色的棋子使用不同的缓存键"""
+        cache = RecognitionCache()
+        red_key = cache.make_key(make_piece_patch('red_chariot'), 'red')
+        black_key = cache.make_key(make_piece_patch('red_chariot'), 'black')
+        self.assertNotEqual(red_key, black_key)
+    
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = RecognitionCache(capacity=2)
+        cache.put('a', 'red_king', 0.9)
+        cache.put('b', 'red_pawn', 0.8)
+        self.assertEqual(cache.get('a'), ('red_king', 0.9))
+        
+        cache.put('c', 'red_horse', 0.7)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+    
+    def test_persistence(self):
+        """测试缓存保存后可在新会话中加载"""
+        path = os.path.join(self.work_dir, 'cache', 'recognition.json')
+        cache = RecognitionCache(method='phash')
+        key = cache.make_key(make_piece_patch('black_king'), 'black')
+        cache.put(key, 'black_king', 0.95)
+        self.assertTrue(cache.save(path))
+        
+        restored = RecognitionCache(method='phash', path=path)
+        self.assertEqual(restored.get(key), ('black_king', 0.95))
+        
+        # 哈希参数不同的缓存文件被忽略
+        self.assertEqual(len(RecognitionCache(method='dhash', path=path)), 0)
+    
+    def test_gui_stop_saves_cache(self):
+        """测试GUI停止监控和关闭窗口时保存识别缓存"""
+        try:
+            from src.ui.tkinter_gui.gui_chess_scanner import ChessScannerGUI
+        except ImportError as e:
+            self.skipTest(f"GUI依赖不可用: {e}")
+        
+        path = os.path.join(self.work_dir, 'cache', 'recognition.json')
+        self.scanner.recognition_cache.path = path
+        self.scanner.scan_board()
+        
+        # 不创建Tk窗口，只构造停止监控所需的属性
+        gui = ChessScannerGUI.__new__(ChessScannerGUI)
+        gui.scanner = self.scanner
+        gui.ai_assistant = None
+        gui.scanning = True
+        gui.log_message = lambda message: None
+        
+        for stop in (gui.stop_monitoring, gui.stop_ai_monitoring, gui.save_recognition_cache):
+            if os.path.exists(path):
+                os.remove(path)
+            stop()
+            self.assertFalse(gui.scanning)
+            restored = RecognitionCache(path=path)
+            self.assertEqual(len(restored), len(self.scanner.recognition_cache))
+            self.assertGreater(len(restored), 0)
+
+
+class TestParallelRecognition(TestScannerPipeline):
+    """并行识别测试类"""
+    
+    def tearDown(self):
+        self.scanner.recognition_pool.close()
+        super().tearDown()
+    
+    def remove_red_templates(self):
+        """去掉所有红方模板，红方棋子只能通过OCR识别"""
+        self.scanner.templates = {
+            name: template for name, template in self.scanner.templates.items()
+            if name.startswith('black_')
+        }
+    
+    def expected_ocr_board(self):
+        """红方棋子全部被识别为兵时的棋盘"""
+        return [
+            ['red_pawn' if piece and piece.startswith('red_') else piece for piece in row]
+            for row in self.initial_board
+        ]
+    
+    def test_thread_pool_matches_serial_scan(self):
+        """测试线程池并行识别结果与串行一致"""
+        for batch in (True, False):
+            self.scanner.batch_template_matching = batch
+            self.scanner.set_recognition_workers(4)
+            self.scanner.change_detector.reset()
+            self.scanner.recognition_cache.clear()
+            
+            self.assertEqual(self.scanner.scan_board(), self.initial_board)
+            self.assertEqual(self.scanner.last_scan_stats['recognized'], 90)
+    
+    def test_pool_preserves_order(self):
+        """测试工作池结果顺序与提交顺序一致"""
+        from src.core.vision.worker_pool import RecognitionPool
+        pool = RecognitionPool(workers=4)
+        try:
+            items = list(range(50))
+            self.assertEqual(pool.map(lambda value: value * value, items), [value * value for value in items])
+            
+            chunks = pool.split(items, min_chunk_size=8)
+            self.assertEqual(len(chunks), 4)
+            self.assertEqual(sum(chunks, []), items)
+        finally:
+            pool.close()
+    
+    def test_ocr_chunks_run_in_parallel(self):
+        """测试未识别的格子分块后并发OCR"""
+        self.remove_red_templates()
+        recognizer = StubRecognizer(pawn_text)
+        self.scanner.ocr_service.set_recognizer(recognizer)
+        self.scanner.set_recognition_workers(4)
+        
+        self.assertEqual(self.scanner.scan_board(), self.expected_ocr_board())
+        self.assertEqual(len(recognizer.montages), 2, "16个格子应分为两次OCR调用")
+    
+    def test_process_workers(self):
+        """测试OCR分块在进程池中执行"""
+        self.remove_red_templates()
+        self.scanner.ocr_service.set_recognizer(StubRecognizer(pawn_text))
+        self.scanner.set_recognition_workers(2, mode='process')
+        
+        self.assertEqual(self.scanner.scan_board(), self.expected_ocr_board())
+
+
+if __name__ == '__main__':
+    unittest.main()